@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from medicalpro.accounts.retention import ARCHIVE_CHUNK_SIZE, archive_notifications
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications older than the retention period to the notifications archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90))
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        moved = archive_notifications(
+            older_than=timezone.now() - timedelta(days=options['days']),
+            chunk_size=options['chunk_size'],
+            pause=options['pause']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} notifications'))
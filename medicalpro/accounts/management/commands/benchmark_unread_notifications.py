@@ -0,0 +1,95 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medicalpro.accounts.models import Notification
+from medicalpro.accounts.notifications import _unread
+from medicalpro.accounts.retention import archive_notifications
+from medicalpro.core.testing import create_user, reset_process_caches, timed
+
+HISTORY_DAYS = 365
+
+# Notifications younger than this are unread one time in UNREAD_SHARE, older ones are all read
+UNREAD_DAYS = 30
+UNREAD_SHARE = 4
+
+INSERT_BATCH = 5000
+
+
+def _legacy_unread(user_id):
+    # Unread lookup before notifications.UNREAD: compiles to NOT is_read, which the index cannot serve
+    return Notification.objects.filter(user_id=user_id, is_read=False)
+
+
+def _mark_all_read(unread):
+    with transaction.atomic():
+        unread.update(is_read=True)
+        transaction.set_rollback(True)
+
+
+QUERIES = (
+    ('unread count', lambda unread: unread.count()),
+    ('newest 20 unread', lambda unread: list(unread.order_by('-created_at')[:20])),
+    ('mark all read', _mark_all_read),
+)
+
+
+class Command(BaseCommand):
+    help = ('Measure the unread notification lookups on a synthetic history, before and after archiving '
+            'old read notifications, rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notifications', type=int, default=1000000, help='Rows in the history')
+        parser.add_argument('--users', type=int, default=500, help='Users sharing the rows')
+        parser.add_argument('--sample', type=int, default=200, help='Users whose lookups are timed')
+        parser.add_argument('--retention-days', type=int, default=90, help='Age of the read rows archived')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['notifications'], options['users'], options['sample'], options['retention_days'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, total, user_count, sample, retention_days):
+        rng = random.Random(0)
+        user_ids = [create_user().id for _ in range(user_count)]
+        now = timezone.now()
+        started = time.perf_counter()
+        batches = (total + INSERT_BATCH - 1) // INSERT_BATCH
+        for batch in range(batches):
+            # Oldest first, so ids grow with created_at as they do in production
+            created_at = now - timedelta(days=HISTORY_DAYS * (1 - (batch + 0.5) / batches))
+            recent = now - created_at < timedelta(days=UNREAD_DAYS)
+            rows = Notification.objects.bulk_create([
+                Notification(user_id=rng.choice(user_ids), title='Appointment Reminder', message='Hi',
+                             type='appointment', is_read=not recent or number % UNREAD_SHARE != 0)
+                for number in range(min(INSERT_BATCH, total - batch * INSERT_BATCH))
+            ])
+            # created_at is auto_now_add, so the history is dated after the insert
+            Notification.objects.filter(id__gte=rows[0].id, id__lte=rows[-1].id).update(created_at=created_at)
+        self.stdout.write(f'{total} notifications over {user_count} users and {HISTORY_DAYS} days, '
+                          f'{Notification.objects.filter(is_read=False).count()} unread, '
+                          f'built in {time.perf_counter() - started:.0f} s')
+
+        sampled = rng.sample(user_ids, min(sample, user_count))
+        self.stdout.write(f'Average per user over {len(sampled)} users')
+        self.stdout.write(f'{"":<18} {"NOT is_read":>14} {"is_read = false":>16}')
+        for label, query in QUERIES:
+            legacy = timed(lambda: [query(_legacy_unread(user_id)) for user_id in sampled]) / len(sampled)
+            indexed = timed(lambda: [query(_unread(user_id)) for user_id in sampled]) / len(sampled)
+            self.stdout.write(f'{label:<18} {legacy:11.3f} ms {indexed:13.3f} ms')
+
+        moved = []
+        elapsed_ms = timed(lambda: moved.append(
+            archive_notifications(older_than=now - timedelta(days=retention_days))
+        ))
+        self.stdout.write(f'Archived {moved[0]} read notifications older than {retention_days} days in '
+                          f'{elapsed_ms / 1000:.1f} s ({moved[0] * 1000 / elapsed_ms:.0f} rows/s), '
+                          f'{Notification.objects.count()} rows left')
+        for label, query in QUERIES:
+            indexed = timed(lambda: [query(_unread(user_id)) for user_id in sampled]) / len(sampled)
+            self.stdout.write(f'{label:<18} {"":>14} {indexed:13.3f} ms')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from medicalpro.accounts.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user unread notification counters from the notifications table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_unread_counts(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Corrected {fixed} unread notification counters'))
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 
+from medicalpro.core.lookups import permissions
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -69,6 +71,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     email_verified = models.BooleanField(default=False)
+    # Denormalized, kept up to date by medicalpro.accounts.notifications
+    unread_notification_count = models.PositiveIntegerField(default=0)
     last_login = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -83,7 +87,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def has_permission(self, permission_name):
         """Check if user has a specific permission through their role"""
-        return self.role.permissions.filter(permission__name=permission_name).exists()
+        return self.role.permissions.filter(permission_id__in=permissions.ids([permission_name])).exists()
     
     def get_full_name(self):
         try:
@@ -151,6 +155,9 @@ class AuditLog(models.Model):
     class Meta:
         db_table = 'audit_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='audit_log_keyset_idx'),
+        ]
 
 
 class Notification(models.Model):
@@ -162,10 +169,40 @@ class Notification(models.Model):
     related_entity = models.CharField(max_length=50, blank=True, null=True)
     related_id = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by send_notifications_bulk to find bulk-inserted rows on backends that do not return their ids
+    batch_key = models.CharField(max_length=40, blank=True, null=True, db_index=True)
     
     def __str__(self):
         return f"{self.title} for {self.user}"
     
     class Meta:
         db_table = 'notifications'
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_keyset_idx'),
+            # Unread lookups and counts of the hot path
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_unread_idx'),
+        ]
+
+
+class ArchivedNotification(models.Model):
+    """Read notifications moved out of ``notifications`` by archive_notifications, keeping their ids."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    type = models.CharField(max_length=50, blank=True, null=True)
+    related_entity = models.CharField(max_length=50, blank=True, null=True)
+    related_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.title} for {self.user} (archived)"
+    
+    class Meta:
+        db_table = 'notifications_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_archive_keyset_idx'),
+        ] 
\ No newline at end of file
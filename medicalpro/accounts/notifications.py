@@ -0,0 +1,284 @@
+import asyncio
+import weakref
+from collections import Counter, defaultdict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from medicalpro.accounts.models import Notification, User
+
+UNREAD_KEY = 'accounts:unread_notifications:{user_id}'
+
+# Most notification ids accepted by one mark-read request
+MAX_MARK_READ_BATCH = 1000
+
+# is_read=False compiles to ``NOT is_read``, which SQLite and MySQL cannot look up in
+# notification_unread_idx; an explicit comparison can
+UNREAD = Q(is_read=Value(False))
+
+_db_limiters = weakref.WeakKeyDictionary()
+_count_loaders = weakref.WeakKeyDictionary()
+
+
+def _key(user_id):
+    return UNREAD_KEY.format(user_id=user_id)
+
+
+def _timeout():
+    # Finite, so a counter that drifted from the column heals on its own
+    return getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 10 * 60)
+
+
+def _stored_counts(user_ids):
+    stored = dict(User.objects.filter(id__in=user_ids).values_list('id', 'unread_notification_count'))
+    return {user_id: stored.get(user_id, 0) for user_id in user_ids}
+
+
+def _load_counts(user_ids):
+    """
+    Cache the ``unread_notification_count`` column of users whose counter is not cached.
+
+    ``cache.add`` never overwrites the value a committing writer stored in
+    the meantime (see ``_refresh_cached``), so a count read just before
+    that commit cannot replace the newer one.
+    """
+    counts = _stored_counts(user_ids)
+    for user_id, count in counts.items():
+        cache.add(_key(user_id), count, timeout=_timeout())
+    return counts
+
+
+def get_unread_count(user_id):
+    """
+    Number of unread notifications of a user, without a COUNT query.
+
+    Served from the cache, falling back to the ``unread_notification_count``
+    column of the user row on a miss.
+    """
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = _load_counts([user_id])[user_id]
+    return count
+
+
+def get_unread_counts(user_ids):
+    """Unread counts of many users, with one cache round trip and at most one query."""
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    counts = {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+    missing = [user_id for user_id in keys.values() if user_id not in counts]
+    if missing:
+        counts.update(_load_counts(missing))
+    return counts
+
+
+def _db_limiter():
+    """
+    Semaphore of the running event loop bounding the notification database calls in flight.
+
+    At most ``NOTIFICATION_DB_CONCURRENCY`` (4 by default) calls of the
+    consumers of one process hold the database thread and connection at
+    once; the others wait on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _db_limiters.get(loop)
+    if limiter is None:
+        limiter = _db_limiters[loop] = asyncio.Semaphore(getattr(settings, 'NOTIFICATION_DB_CONCURRENCY', 4))
+    return limiter
+
+
+def _limited(function):
+    """Async version of a sync helper, run in one database_sync_to_async call under the limiter."""
+    function = database_sync_to_async(function)
+
+    async def wrapper(*args, **kwargs):
+        async with _db_limiter():
+            return await function(*args, **kwargs)
+    return wrapper
+
+
+class UnreadCountLoader:
+    """
+    Batches the unread count lookups of the consumers of one event loop.
+
+    Lookups made while the previous batch holds the limiter are served
+    together by one get_unread_counts call, so a reconnect storm of N
+    sockets costs a handful of cache round trips instead of N.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.task = None
+
+    def load(self, user_id):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(user_id, []).append(future)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.dispatch())
+        return future
+
+    async def dispatch(self):
+        async with _db_limiter():
+            pending, self.pending = self.pending, {}
+            self.task = None
+            try:
+                counts = await database_sync_to_async(get_unread_counts)(list(pending))
+            except Exception as e:
+                counts, error = {}, e
+            else:
+                error = None
+        for user_id, futures in pending.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(counts[user_id])
+
+
+async def aget_unread_count(user_id):
+    """Async get_unread_count, batched with the concurrent lookups of other consumers."""
+    loop = asyncio.get_running_loop()
+    loader = _count_loaders.get(loop)
+    if loader is None:
+        loader = _count_loaders[loop] = UnreadCountLoader()
+    return await loader.load(user_id)
+
+
+def _refresh_cached(user_ids):
+    """
+    Copy the committed counters of ``user_ids`` into the cache.
+
+    Storing the column rather than incrementing the cached value means a
+    reader that cached the count between the commit and this call, or
+    before the commit, is simply overwritten instead of counted twice or
+    left stale.
+    """
+    cache.set_many({_key(user_id): count for user_id, count in _stored_counts(user_ids).items()},
+                   timeout=_timeout())
+
+
+def adjust_unread_counts(deltas):
+    """
+    Apply ``{user_id: delta}`` changes to the unread counters.
+
+    The column is updated in the caller's transaction with one UPDATE per
+    distinct delta; the cached values are reloaded from it once it commits.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    users_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        User.objects.filter(id__in=user_ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, Value(0))
+        )
+    transaction.on_commit(lambda: _refresh_cached(list(deltas)))
+
+
+def count_new_notifications(notifications):
+    """Add freshly created unread notifications to their users' counters."""
+    adjust_unread_counts(Counter(
+        notification.user_id for notification in notifications if not notification.is_read
+    ))
+
+
+def parse_before(value):
+    """Parse the ``before`` bound of a mark-all-read request, raising ValueError if malformed."""
+    if not value:
+        return None
+    before = parse_datetime(value)
+    if before is None:
+        raise ValueError(f'Invalid timestamp: {value}')
+    return timezone.make_aware(before) if timezone.is_naive(before) else before
+
+
+def _unread(user_id, notification_ids=None, before=None):
+    notifications = Notification.objects.filter(UNREAD, user_id=user_id)
+    if notification_ids is not None:
+        notifications = notifications.filter(id__in=list(notification_ids))
+    if before is not None:
+        notifications = notifications.filter(created_at__lte=before)
+    return notifications
+
+
+def mark_notifications_read(user_id, notification_ids=None, before=None):
+    """
+    Mark a user's notifications read with a single UPDATE.
+
+    Used by MarkNotificationsReadView; the websocket consumer goes through
+    amark_notifications_read.
+
+    Args:
+        user_id (int): Owner of the notifications
+        notification_ids (iterable, optional): Notifications to mark; every unread one when None
+        before (datetime, optional): Only mark notifications created at or before this moment
+
+    Returns:
+        tuple: ``(marked, unread_count)``, the number of notifications that
+            changed and the user's remaining unread count
+    """
+    with transaction.atomic():
+        marked = _unread(user_id, notification_ids, before).update(is_read=True)
+        adjust_unread_counts({user_id: -marked})
+        # From the column: the cache only follows once the outermost transaction commits
+        unread_count = _stored_counts([user_id])[user_id]
+    return marked, unread_count
+
+
+def mark_notification_read(user_id, notification_id):
+    """
+    Mark one notification read.
+
+    Returns:
+        tuple: ``(success, unread_count)``; notifications that were already read count as a success
+    """
+    marked, count = mark_notifications_read(user_id, notification_ids=[notification_id])
+    return bool(marked) or Notification.objects.filter(user_id=user_id, id=notification_id).exists(), count
+
+
+amark_notification_read = _limited(mark_notification_read)
+amark_notifications_read = _limited(mark_notifications_read)
+
+
+def reconcile_unread_counts(user_ids=None, chunk_size=1000):
+    """
+    Recompute the counters from the notifications table, fixing any drift.
+
+    Run it periodically (see the ``reconcile_unread_notifications`` command):
+    rows written without going through this module, such as those inserted
+    by the SQL procedures, are only counted from then on.
+
+    Returns:
+        int: Number of users whose stored counter was wrong
+    """
+    users = User.objects.order_by('id')
+    if user_ids is not None:
+        users = users.filter(id__in=list(user_ids))
+
+    fixed = 0
+    last_id = 0
+    while True:
+        chunk = list(users.filter(id__gt=last_id).values_list('id', 'unread_notification_count')[:chunk_size])
+        if not chunk:
+            return fixed
+        last_id = chunk[-1][0]
+        actual = dict(Notification.objects.filter(
+            UNREAD, user_id__in=[user_id for user_id, stored in chunk]
+        ).order_by().values_list('user_id').annotate(total=Count('id')))
+        with transaction.atomic():
+            for user_id, stored in chunk:
+                count = actual.get(user_id, 0)
+                if count != stored:
+                    User.objects.filter(id=user_id).update(unread_notification_count=count)
+                    fixed += 1
+        # Reloaded from the corrected column on the next read
+        cache.delete_many([_key(user_id) for user_id, stored in chunk])
@@ -0,0 +1,65 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from medicalpro.accounts.models import ArchivedNotification, Notification
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CHUNK_SIZE = 1000
+
+
+def archive_notifications(older_than=None, chunk_size=ARCHIVE_CHUNK_SIZE, pause=0):
+    """
+    Move read notifications older than a cutoff to the archive table, one chunk at a time.
+
+    Each chunk of ``chunk_size`` rows is copied and deleted in its own short
+    transaction, walking the primary key so no chunk rescans the rows before
+    it; ``pause`` seconds between chunks leave room for other writers. Unread
+    notifications are never moved, so the unread counters do not change.
+
+    Args:
+        older_than (datetime, optional): Cutoff, ``NOTIFICATION_RETENTION_DAYS`` (90) days ago by default
+        chunk_size (int): Rows per transaction
+        pause (float): Seconds to sleep between chunks
+
+    Returns:
+        int: Number of notifications archived
+    """
+    if older_than is None:
+        older_than = timezone.now() - timedelta(days=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90))
+
+    candidates = Notification.objects.filter(is_read=True, created_at__lt=older_than).order_by('id')
+    moved = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Read notifications never become unread again, so the chunk can be moved as read
+            rows = list(candidates.filter(id__gt=last_id)[:chunk_size])
+            if not rows:
+                break
+            ArchivedNotification.objects.bulk_create([
+                ArchivedNotification(
+                    id=row.id,
+                    user_id=row.user_id,
+                    title=row.title,
+                    message=row.message,
+                    type=row.type,
+                    related_entity=row.related_entity,
+                    related_id=row.related_id,
+                    created_at=row.created_at
+                )
+                for row in rows
+            ], ignore_conflicts=True)
+            Notification.objects.filter(id__in=[row.id for row in rows]).delete()
+        last_id = rows[-1].id
+        moved += len(rows)
+        if pause:
+            time.sleep(pause)
+    if moved:
+        logger.info(f"Archived {moved} notifications older than {older_than:%Y-%m-%d}")
+    return moved
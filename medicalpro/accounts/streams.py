@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from medicalpro.accounts.models import Notification
+
+# Most stored notifications replayed to a client catching up
+MAX_REPLAY = 100
+
+
+async def authenticate_stream(request):
+    """Resolve the user of a streaming request from the session or a DRF token header, or None."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def notifications_after(user_id, last_id):
+    """
+    Notifications of a user stored after ``last_id``, oldest first.
+
+    Returns:
+        tuple: ``(notifications, latest_id)``. Without a ``last_id`` nothing is
+            replayed and ``latest_id`` is the id of the newest notification, so
+            the client starts from now.
+    """
+    from medicalpro.core.utils import notification_event
+
+    notifications = Notification.objects.filter(user_id=user_id)
+    if last_id is None:
+        return [], notifications.order_by('-id').values_list('id', flat=True).first() or 0
+    rows = list(notifications.filter(id__gt=last_id).order_by('id')[:MAX_REPLAY])
+    return [notification_event(row)['message'] for row in rows], rows[-1].id if rows else last_id
+
+
+class NotificationSubscription:
+    """
+    Subscribes a temporary channel to a user's notification group, like NotificationConsumer does.
+
+    Use as an async context manager; events with an id at or below the one
+    given to ``skip_until`` are dropped so replayed rows are not sent twice.
+    """
+
+    def __init__(self, user_id):
+        from medicalpro.core.utils import notification_group
+
+        self.group = notification_group(user_id)
+        self.channel_layer = get_channel_layer()
+        self.last_id = 0
+
+    async def __aenter__(self):
+        self.channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, self.channel)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.channel_layer.group_discard(self.group, self.channel)
+
+    def skip_until(self, last_id):
+        self.last_id = max(self.last_id, last_id)
+
+    async def receive(self, timeout):
+        """Next new notification, or None if none arrives within ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(self.channel_layer.receive(self.channel), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if event.get('type') != 'notification_message':
+                continue
+            message = event['message']
+            if message['id'] is None or message['id'] > self.last_id:
+                self.skip_until(message['id'] or 0)
+                return message
+
+
+async def wait_for_notifications(user_id, last_id, timeout):
+    """
+    Long-poll: return the notifications after ``last_id`` as soon as there are any.
+
+    Stored ones are returned at once; otherwise the request waits up to
+    ``timeout`` seconds on the notification group, then keeps collecting for
+    ``NOTIFICATION_BURST_WINDOW`` seconds so a burst comes back in one response.
+
+    Returns:
+        tuple: ``(notifications, last_id)`` for the client's next request
+    """
+    async with NotificationSubscription(user_id) as subscription:
+        notifications, last_id = await database_sync_to_async(notifications_after)(user_id, last_id)
+        subscription.skip_until(last_id)
+        if notifications:
+            return notifications, last_id
+        message = await subscription.receive(timeout)
+        window = getattr(settings, 'NOTIFICATION_BURST_WINDOW', 0.05)
+        while message is not None:
+            notifications.append(message)
+            last_id = subscription.last_id
+            message = await subscription.receive(window) if len(notifications) < MAX_REPLAY else None
+    return notifications, last_id
+
+
+def _sse(message):
+    event_id = f'id: {message["id"]}\n' if message['id'] is not None else ''
+    return f'{event_id}event: notification\ndata: {json.dumps(message)}\n\n'
+
+
+async def notification_events(user_id, last_id):
+    """
+    Server-Sent Events stream of a user's new notifications.
+
+    Replays what was stored after ``last_id`` (the client's ``Last-Event-ID``),
+    then relays the group events. A comment line goes out every
+    ``NOTIFICATION_STREAM_HEARTBEAT`` seconds (15) to keep proxies from closing
+    the connection, and the stream ends after ``NOTIFICATION_STREAM_MAX_AGE``
+    seconds (300); the browser reconnects with the last id it saw.
+    """
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    closes_at = time.monotonic() + getattr(settings, 'NOTIFICATION_STREAM_MAX_AGE', 300)
+    async with NotificationSubscription(user_id) as subscription:
+        # Starting from now: hand the client the newest id to resume from
+        resume = last_id is None
+        notifications, last_id = await database_sync_to_async(notifications_after)(user_id, last_id)
+        yield f'retry: 3000\nid: {last_id}\n\n' if resume else 'retry: 3000\n\n'
+        while notifications:
+            for message in notifications:
+                yield _sse(message)
+            if len(notifications) < MAX_REPLAY:
+                break
+            notifications, last_id = await database_sync_to_async(notifications_after)(user_id, last_id)
+        subscription.skip_until(last_id)
+        while time.monotonic() < closes_at:
+            message = await subscription.receive(min(heartbeat, closes_at - time.monotonic()))
+            yield _sse(message) if message is not None else ': keep-alive\n\n'
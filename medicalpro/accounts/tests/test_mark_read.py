@@ -0,0 +1,81 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.accounts.models import Notification
+from medicalpro.accounts.notifications import get_unread_count
+from medicalpro.accounts.views import MarkNotificationsReadView
+from medicalpro.core.consumers import NotificationConsumer
+from medicalpro.core.testing import create_user
+from medicalpro.core.utils import send_notifications_bulk
+
+
+class NotificationsMixin:
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            results = send_notifications_bulk(
+                [{'user_id': self.user.id, 'title': f'Notice {number}', 'message': 'Hi'} for number in range(4)]
+                + [{'user_id': self.other.id, 'title': 'Notice', 'message': 'Hi'}]
+            )
+        self.ids = [result['notification'].id for result in results]
+
+    def unread_ids(self):
+        return set(Notification.objects.filter(is_read=False).values_list('id', flat=True))
+
+
+class MarkNotificationsReadViewTests(NotificationsMixin, TestCase):
+    def mark(self, data):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return MarkNotificationsReadView.as_view()(request)
+
+    def test_rest_batch_only_marks_own_notifications(self):
+        response = self.mark({'notification_ids': [self.ids[0], self.ids[1], self.ids[4]]})
+        self.assertEqual(response.data['marked'], 2)
+        self.assertEqual(self.unread_ids(), {self.ids[2], self.ids[3], self.ids[4]})
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+        self.assertEqual(self.mark({'notification_ids': 'all'}).status_code, 400)
+        self.assertEqual(self.mark({}).status_code, 400)
+
+    def test_rest_mark_all_read_up_to_a_timestamp(self):
+        Notification.objects.filter(id=self.ids[3]).update(created_at=timezone.now() + timedelta(hours=1))
+        response = self.mark({'all': True, 'before': timezone.now().isoformat()})
+        self.assertEqual(response.data['marked'], 3)
+        self.assertEqual(self.unread_ids(), {self.ids[3], self.ids[4]})
+        self.assertEqual(self.mark({'all': True, 'before': 'yesterday'}).status_code, 400)
+
+
+# database_sync_to_async closes the connection after each call, which would end the test transaction
+@mock.patch('channels.db.close_old_connections')
+class NotificationConsumerMarkReadTests(NotificationsMixin, TestCase):
+    async def receive(self, message):
+        consumer = NotificationConsumer()
+        consumer.user = self.user
+        consumer.send = mock.AsyncMock()
+        await consumer.receive(json.dumps(message))
+        return [json.loads(call.kwargs['text_data']) for call in consumer.send.call_args_list]
+
+    async def test_batch_sends_one_response_and_one_count(self, close_old_connections):
+        frames = await self.receive({'type': 'mark_read_batch', 'notification_ids': self.ids[:3]})
+        self.assertEqual(frames, [
+            {'type': 'mark_read_batch_response', 'marked': 3, 'notification_ids': self.ids[:3]},
+            {'type': 'unread_count', 'count': 1},
+        ])
+
+    async def test_mark_all_read(self, close_old_connections):
+        frames = await self.receive({'type': 'mark_all_read'})
+        self.assertEqual(frames, [
+            {'type': 'mark_all_read_response', 'marked': 4}, {'type': 'unread_count', 'count': 0},
+        ])
+
+    async def test_malformed_batches_are_rejected(self, close_old_connections):
+        frames = await self.receive({'type': 'mark_read_batch', 'notification_ids': ['x']})
+        self.assertEqual(frames[0]['type'], 'error')
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase
+
+from medicalpro.accounts import notifications
+from medicalpro.accounts.models import User
+from medicalpro.accounts.notifications import get_unread_count, get_unread_counts, mark_notifications_read
+from medicalpro.core.testing import create_user
+from medicalpro.core.utils import send_notifications_bulk
+
+
+class UnreadCountTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        cache.delete(notifications._key(self.user.id))
+
+    def notify(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            send_notifications_bulk({'user_id': self.user.id, 'title': 'Hello', 'message': 'Hi'}
+                                    for _ in range(count))
+
+    def test_counts_follow_new_and_read_notifications(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.notify(3)
+        self.assertEqual(get_unread_count(self.user.id), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(mark_notifications_read(self.user.id)[0], 3)
+        other = create_user()
+        self.assertEqual(get_unread_counts([self.user.id, other.id]), {self.user.id: 0, other.id: 0})
+
+    def test_commit_around_a_cache_fill_is_counted_once(self):
+        add = cache.add
+
+        def commit_then_add(key, value, timeout):
+            # Another request's transaction commits after this reader loaded the column
+            User.objects.filter(id=self.user.id).update(unread_notification_count=F('unread_notification_count') + 1)
+            notifications._refresh_cached([self.user.id])
+            return add(key, value, timeout)
+
+        with mock.patch.object(cache, 'add', side_effect=commit_then_add):
+            get_unread_count(self.user.id)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        # A reader that sees the committed column before the on-commit update of the cache
+        cache.delete(notifications._key(self.user.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications.adjust_unread_counts({self.user.id: 1})
+            self.assertEqual(get_unread_count(self.user.id), 2)
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+    def test_cached_counts_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            get_unread_count(self.user.id)
+        self.assertIsNotNone(add.call_args.kwargs['timeout'])
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.accounts.models import ArchivedNotification, Notification
+from medicalpro.accounts.notifications import _unread
+from medicalpro.accounts.retention import archive_notifications
+from medicalpro.accounts.views import ArchivedNotificationListView
+from medicalpro.core.testing import create_user
+
+
+class ArchiveNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        old = timezone.now() - timedelta(days=120)
+        self.old_read = [Notification.objects.create(user=self.user, title=f'Old {number}', message='Hi',
+                                                     is_read=True) for number in range(5)]
+        self.old_unread = Notification.objects.create(user=self.user, title='Old unread', message='Hi')
+        self.recent_read = Notification.objects.create(user=self.user, title='Recent', message='Hi', is_read=True)
+        Notification.objects.exclude(id=self.recent_read.id).update(created_at=old)
+
+    def test_moves_only_old_read_notifications_in_chunks(self):
+        self.assertEqual(archive_notifications(chunk_size=2), 5)
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)),
+                         {self.old_unread.id, self.recent_read.id})
+        self.assertEqual(sorted(ArchivedNotification.objects.values_list('id', flat=True)),
+                         [notification.id for notification in self.old_read])
+        self.assertEqual(archive_notifications(), 0)
+
+    def test_archive_is_listed_to_its_owner_only(self):
+        archive_notifications()
+        create_user()
+
+        def listed(user):
+            request = APIRequestFactory().get('/')
+            force_authenticate(request, user=user)
+            return [row['id'] for row in ArchivedNotificationListView.as_view()(request).data['results']]
+
+        self.assertEqual(listed(self.user), [notification.id for notification in reversed(self.old_read)])
+        self.assertEqual(listed(create_user()), [])
+
+    def test_unread_lookups_use_their_index(self):
+        for lookup in (_unread(self.user.id), _unread(self.user.id, before=timezone.now())):
+            self.assertIn('notification_unread_idx', lookup.order_by().explain())
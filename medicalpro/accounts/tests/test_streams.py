@@ -0,0 +1,116 @@
+import asyncio
+import json
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from medicalpro.accounts.models import Notification
+from medicalpro.accounts.views import NotificationPollView, NotificationStreamView
+from medicalpro.core.testing import create_user
+from medicalpro.core.utils import notification_group
+
+
+def event(notification_id):
+    return {'type': 'notification_message', 'message': {'id': notification_id, 'title': f'Notice {notification_id}'}}
+
+
+# database_sync_to_async closes the connection after each call, which would end the test transaction
+@mock.patch('channels.db.close_old_connections')
+@mock.patch('medicalpro.accounts.streams.MAX_REPLAY', 2)
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.ids = [
+            Notification.objects.create(user=self.user, title=f'Notice {number}', message='Hi').id
+            for number in range(4)
+        ]
+        Notification.objects.create(user=create_user(), title='Not yours', message='Hi')
+
+    def request(self, token=None, headers=None, **params):
+        headers = dict(headers or {})
+        if token is not False:
+            headers['Authorization'] = f'Token {token or self.token.key}'
+        request = AsyncRequestFactory().get('/', params, headers=headers)
+        # The session and user attributes the middleware would set, anonymous without a session cookie
+        SessionMiddleware(lambda request: None).process_request(request)
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        return request
+
+    async def poll(self, **kwargs):
+        response = await NotificationPollView.as_view()(self.request(**kwargs))
+        return response.status_code, json.loads(response.content)
+
+    async def stream(self, **kwargs):
+        response = await NotificationStreamView.as_view()(self.request(**kwargs))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def next_event(self, stream):
+        return (await asyncio.wait_for(anext(stream), 5)).decode()
+
+    async def group_send(self, *notification_ids):
+        for notification_id in notification_ids:
+            await get_channel_layer().group_send(notification_group(self.user.id), event(notification_id))
+
+    async def test_requests_need_a_session_or_a_token(self, close_old_connections):
+        for view in (NotificationPollView, NotificationStreamView):
+            for token in (False, 'not-a-token'):
+                with self.subTest(view=view.__name__, token=token):
+                    response = await view.as_view()(self.request(token=token))
+                    self.assertEqual(response.status_code, 401)
+        self.assertEqual((await self.poll())[0], 200)
+
+    async def test_malformed_parameters_are_rejected(self, close_old_connections):
+        for params in ({'last_id': 'abc'}, {'last_id': '1', 'timeout': 'soon'}):
+            with self.subTest(params=params):
+                self.assertEqual((await self.poll(**params))[0], 400)
+        response = await NotificationStreamView.as_view()(self.request(headers={'Last-Event-ID': 'abc'}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_poll_without_last_id_starts_from_now(self, close_old_connections):
+        self.assertEqual(await self.poll(timeout='30'), (200, {'notifications': [], 'last_id': self.ids[-1]}))
+
+    async def test_poll_replays_at_most_max_replay(self, close_old_connections):
+        status, data = await self.poll(last_id=str(self.ids[0]))
+        self.assertEqual(status, 200)
+        self.assertEqual([message['id'] for message in data['notifications']], self.ids[1:3])
+        self.assertEqual(data['last_id'], self.ids[2])
+
+    async def test_poll_times_out_with_an_empty_list(self, close_old_connections):
+        self.assertEqual(await self.poll(last_id=str(self.ids[-1]), timeout='0.05'),
+                         (200, {'notifications': [], 'last_id': self.ids[-1]}))
+
+    async def test_poll_answers_with_live_notifications_it_has_not_returned(self, close_old_connections):
+        async def send_later():
+            await asyncio.sleep(0.05)
+            await self.group_send(self.ids[-1], self.ids[-1] + 100)
+
+        sender = asyncio.ensure_future(send_later())
+        status, data = await self.poll(last_id=str(self.ids[-1]), timeout='5')
+        await sender
+        self.assertEqual([message['id'] for message in data['notifications']], [self.ids[-1] + 100])
+        self.assertEqual(data['last_id'], self.ids[-1] + 100)
+
+    async def test_stream_without_last_event_id_starts_from_now(self, close_old_connections):
+        stream = await self.stream()
+        self.assertEqual(await self.next_event(stream), f'retry: 3000\nid: {self.ids[-1]}\n\n')
+
+        await self.group_send(self.ids[-1], self.ids[-1] + 100)
+        self.assertIn(f'id: {self.ids[-1] + 100}\n', await self.next_event(stream))
+
+    async def test_stream_replays_in_pages_then_skips_replayed_live_events(self, close_old_connections):
+        stream = await self.stream(headers={'Last-Event-ID': str(self.ids[0])})
+        self.assertEqual(await self.next_event(stream), 'retry: 3000\n\n')
+        # Pages of MAX_REPLAY rows until the stored notifications run out
+        for notification_id in self.ids[1:]:
+            self.assertTrue((await self.next_event(stream)).startswith(f'id: {notification_id}\nevent: notification\n'))
+
+        await self.group_send(self.ids[2], self.ids[-1], self.ids[-1] + 100)
+        self.assertTrue((await self.next_event(stream)).startswith(f'id: {self.ids[-1] + 100}\n'))
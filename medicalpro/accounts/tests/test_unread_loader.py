@@ -0,0 +1,23 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, mock
+
+from medicalpro.accounts.notifications import aget_unread_count
+
+
+@mock.patch('channels.db.close_old_connections')
+class UnreadCountLoaderTests(IsolatedAsyncioTestCase):
+    async def test_concurrent_lookups_share_a_few_batches(self, close_old_connections):
+        with mock.patch('medicalpro.accounts.notifications.get_unread_counts',
+                        side_effect=lambda user_ids: {user_id: user_id * 10 for user_id in user_ids}) as load:
+            counts = await asyncio.gather(*(aget_unread_count(user_id) for user_id in [*range(1, 201), 1, 2]))
+        self.assertEqual(counts, [user_id * 10 for user_id in [*range(1, 201), 1, 2]])
+        # The first lookup runs alone, everything queued behind it shares the second batch
+        self.assertLessEqual(load.call_count, 2)
+
+    async def test_a_failed_batch_fails_its_lookups(self, close_old_connections):
+        with mock.patch('medicalpro.accounts.notifications.get_unread_counts', side_effect=RuntimeError('down')):
+            results = await asyncio.gather(aget_unread_count(1), aget_unread_count(2), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+        with mock.patch('medicalpro.accounts.notifications.get_unread_counts', return_value={3: 4}):
+            self.assertEqual(await aget_unread_count(3), 4)
@@ -22,10 +22,13 @@ urlpatterns = [
     path('notifications/', views.NotificationListView.as_view(), name='notification_list'),
     path('notifications/<int:pk>/', views.NotificationDetailView.as_view(), name='notification_detail'),
     path('notifications/mark-read/', views.MarkNotificationsReadView.as_view(), name='mark_notifications_read'),
+    path('notifications/stream/', views.NotificationStreamView.as_view(), name='notification_stream'),
+    path('notifications/poll/', views.NotificationPollView.as_view(), name='notification_poll'),
+    path('notifications/archived/', views.ArchivedNotificationListView.as_view(), name='archived_notification_list'),
     
     # Admin routes
     path('users/', views.UserListView.as_view(), name='user_list'),
     path('users/<int:pk>/', views.UserDetailView.as_view(), name='user_detail'),
     path('roles/', views.RoleListView.as_view(), name='role_list'),
     path('permissions/', views.PermissionListView.as_view(), name='permission_list'),
-] 
\ No newline at end of file
+] 
\ No newline at end of file
@@ -0,0 +1,133 @@
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from medicalpro.accounts.models import ArchivedNotification
+from medicalpro.accounts.notifications import MAX_MARK_READ_BATCH, mark_notifications_read, parse_before
+from medicalpro.accounts.streams import authenticate_stream, notification_events, wait_for_notifications
+from medicalpro.core.pagination import KeysetPagination
+
+# Longest a long-poll request may wait, below common proxy read timeouts
+MAX_POLL_TIMEOUT = 55
+
+
+class MarkNotificationsReadView(APIView):
+    """
+    Mark notifications of the current user read with one UPDATE.
+
+    Body: either ``notification_ids`` (a list of ids) or ``all: true`` with an
+    optional ``before`` timestamp. Same code path as the websocket
+    ``mark_read_batch`` and ``mark_all_read`` messages.
+    """
+
+    def post(self, request):
+        notification_ids = request.data.get('notification_ids')
+        try:
+            before = parse_before(request.data.get('before'))
+            if notification_ids is not None:
+                if not isinstance(notification_ids, list) or len(notification_ids) > MAX_MARK_READ_BATCH:
+                    raise ValueError
+                notification_ids = [int(notification_id) for notification_id in notification_ids]
+            elif not request.data.get('all'):
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({'error': f'Send notification_ids (at most {MAX_MARK_READ_BATCH}) or all, '
+                                      'with an optional ISO 8601 before timestamp.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        marked, unread_count = mark_notifications_read(request.user.id, notification_ids=notification_ids,
+                                                       before=before)
+        return Response({'marked': marked, 'unread_count': unread_count})
+
+
+def _last_id(request):
+    """Client's last seen notification id, from Last-Event-ID or ``last_id``; raises ValueError if malformed."""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+    return int(value) if value else None
+
+
+class NotificationStreamView(View):
+    """
+    Server-Sent Events stream of new notifications, for networks that block websockets.
+
+    Needs an ASGI server. Subscribes to the same channel group as
+    NotificationConsumer and sends only notifications after the client's
+    ``Last-Event-ID`` (or ``?last_id=``), never the whole list. Notifications
+    created by other processes only arrive live through a shared channel
+    layer (``CHANNEL_LAYER_DB``, see the ``core.W002`` system check).
+    """
+
+    async def get(self, request):
+        user = await authenticate_stream(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            last_id = _last_id(request)
+        except ValueError:
+            return JsonResponse({'error': 'last_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(notification_events(user.id, last_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class NotificationPollView(View):
+    """
+    Long-poll for new notifications: answers as soon as there are notifications after ``last_id``.
+
+    Query parameters: ``last_id`` (omit it on the first request to start from
+    now) and ``timeout`` in seconds (25 by default, at most 55). Responds with
+    ``{'notifications', 'last_id'}``; pass ``last_id`` back on the next request.
+    Like the SSE stream, it needs a shared channel layer to answer early for
+    notifications created by other processes.
+    """
+
+    async def get(self, request):
+        user = await authenticate_stream(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            last_id = _last_id(request)
+            timeout = min(max(float(request.GET.get('timeout', 25)), 0), MAX_POLL_TIMEOUT)
+        except ValueError:
+            return JsonResponse({'error': 'last_id must be an integer and timeout a number.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        if last_id is None:
+            timeout = 0
+        notifications, last_id = await wait_for_notifications(user.id, last_id, timeout)
+        return JsonResponse({'notifications': notifications, 'last_id': last_id})
+
+
+class ArchivedNotificationListView(APIView):
+    """
+    Notifications of the current user moved to the archive, newest first.
+
+    Served from the archive table with keyset pagination, so it never slows
+    down the hot notifications table.
+    """
+    pagination_class = KeysetPagination
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        rows = paginator.paginate_queryset(
+            ArchivedNotification.objects.filter(user=request.user), request, view=self
+        )
+        return paginator.get_paginated_response([
+            {
+                'id': row.id,
+                'title': row.title,
+                'message': row.message,
+                'type': row.type,
+                'related_entity': row.related_entity,
+                'related_id': row.related_id,
+                'created_at': row.created_at.isoformat(),
+                'archived_at': row.archived_at.isoformat(),
+            }
+            for row in rows
+        ])
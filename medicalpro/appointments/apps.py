@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class AppointmentsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'medicalpro.appointments'
+    label = 'appointments'
+
+    def ready(self):
+        # Register signal handlers
+        from medicalpro.appointments import signals  # noqa: F401
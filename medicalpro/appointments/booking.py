@@ -0,0 +1,330 @@
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, time
+
+from django.core.exceptions import PermissionDenied
+from django.db import connection, transaction
+from django.db.models import Q
+
+from medicalpro.appointments.calendar_tiles import refresh_doctor_days
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES, DoctorDayIndex, conflict_index
+from medicalpro.appointments.holds import held_intervals
+from medicalpro.appointments.models import Appointment, DoctorDayLock
+from medicalpro.appointments.permissions import manages_appointments
+from medicalpro.appointments.rollups import apply_deltas, appointment_deltas
+from medicalpro.appointments.search import index_appointments
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import Doctor
+from medicalpro.doctors.slots import parse_slot_time
+from medicalpro.patients.models import Patient
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = 500
+
+# Statuses a bulk booking may give its appointments
+BULK_BOOKING_STATUSES = ('Scheduled', 'Confirmed')
+
+
+class LocalLockManager:
+    """
+    In-process locks per doctor-day, for databases without SELECT ... FOR UPDATE.
+
+    Locks are created on demand and dropped once no thread holds or waits
+    for them. Keys are always acquired in sorted order to avoid deadlocks.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    @contextmanager
+    def hold(self, keys):
+        keys = sorted(set(keys))
+        with self._guard:
+            entries = []
+            for key in keys:
+                entry = self._locks.setdefault(key, [threading.Lock(), 0])
+                entry[1] += 1
+                entries.append(entry)
+        acquired = []
+        try:
+            for entry in entries:
+                entry[0].acquire()
+                acquired.append(entry)
+            yield
+        finally:
+            for entry in reversed(acquired):
+                entry[0].release()
+            with self._guard:
+                for key, entry in zip(keys, entries):
+                    entry[1] -= 1
+                    if not entry[1]:
+                        del self._locks[key]
+
+
+local_locks = LocalLockManager()
+
+
+@contextmanager
+def lock_doctor_days(keys):
+    """
+    Serialize writes to the given ``(doctor_id, date)`` pairs inside a transaction.
+
+    On databases supporting it, one DoctorDayLock row per pair is locked with
+    SELECT ... FOR UPDATE until the transaction ends. Different doctor-days
+    never wait for each other.
+
+    Otherwise (SQLite) an in-process lock is held around the whole
+    transaction. It only serializes the threads of one process: two worker
+    processes booking the same slot are kept apart by SQLite's own writer
+    lock, and only if transactions start with ``BEGIN IMMEDIATE``
+    (``'transaction_mode': 'IMMEDIATE'`` in the database OPTIONS). Without
+    it the later writer fails with "database is locked" instead of seeing
+    the conflict. The ``core.W001`` system check reports that configuration.
+
+    Open this outside any atomic block: with the local fallback the lock is
+    released when this transaction block exits, not when an outer one commits.
+    """
+    keys = sorted(set(keys))
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            DoctorDayLock.objects.bulk_create(
+                [DoctorDayLock(doctor_id=doctor_id, date=day) for doctor_id, day in keys],
+                ignore_conflicts=True
+            )
+            condition = Q()
+            for doctor_id, day in keys:
+                condition |= Q(doctor_id=doctor_id, date=day)
+            list(DoctorDayLock.objects.select_for_update().filter(condition).order_by('doctor_id', 'date'))
+            yield
+    else:
+        if connection.in_atomic_block:
+            logger.warning("lock_doctor_days() used inside an atomic block; the local lock "
+                           "is released before the outer transaction commits")
+        with local_locks.hold(keys), transaction.atomic():
+            yield
+
+
+def book_appointment(appointment):
+    """
+    Save a new or moved appointment while holding its doctor-day lock.
+
+    ``clean()`` checks for overlaps under the lock, so two concurrent
+    requests for the same slot can never both pass it.
+
+    Raises:
+        ValidationError: If the slot conflicts with another appointment
+    """
+    with lock_doctor_days([(appointment.doctor_id, appointment.appointment_date)]):
+        appointment.save()
+    return appointment
+
+
+def book_requested_appointment(row, created_by):
+    """
+    Book one appointment from request data through ``book_appointment``.
+
+    Unless ``created_by`` manages appointments, they must be the patient or
+    the doctor of the appointment.
+
+    Args:
+        row (dict): ``patient``, ``doctor``, ``appointment_date``, ``start_time``,
+            ``end_time`` and optional ``reason`` / ``notes``
+        created_by (User): The user booking the appointment
+
+    Returns:
+        Appointment: The new appointment, with the Scheduled status
+
+    Raises:
+        KeyError, TypeError, ValueError: If the request data is malformed
+        Doctor.DoesNotExist, Patient.DoesNotExist: If the doctor or patient is unknown
+        PermissionDenied: If the user may not book this appointment
+        ValidationError: If the slot is taken or held by another user
+    """
+    values = _coerce_row(row)
+    doctor_user_id = Doctor.objects.filter(id=values['doctor_id']).values_list('user_id', flat=True).first()
+    if doctor_user_id is None:
+        raise Doctor.DoesNotExist('Doctor not found.')
+    patient_user_id = Patient.objects.filter(id=values['patient_id']).values_list('user_id', flat=True).first()
+    if patient_user_id is None:
+        raise Patient.DoesNotExist('Patient not found.')
+    if not manages_appointments(created_by) and created_by.id not in (patient_user_id, doctor_user_id):
+        raise PermissionDenied('You may only book your own appointments.')
+
+    return book_appointment(Appointment(
+        status=appointment_statuses.get_by_name('Scheduled'),
+        created_by=created_by,
+        **values
+    ))
+
+
+def _coerce_id(row, field):
+    value = row[field]
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError(f'{field} must be an id.')
+    return int(value)
+
+
+def _coerce_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    raise TypeError('appointment_date must be a YYYY-MM-DD string.')
+
+
+def _coerce_time(value, field):
+    if isinstance(value, str):
+        return parse_slot_time(value)
+    if isinstance(value, time):
+        return value
+    raise TypeError(f'{field} must be a HH:MM string.')
+
+
+def _coerce_text(value, field):
+    if value is not None and not isinstance(value, str):
+        raise TypeError(f'{field} must be a string.')
+    return value
+
+
+def _coerce_row(row):
+    """Normalize one requested appointment, raising TypeError or ValueError on malformed input."""
+    if not isinstance(row, dict):
+        raise TypeError('Each appointment must be an object.')
+    values = {
+        'patient_id': _coerce_id(row, 'patient'),
+        'doctor_id': _coerce_id(row, 'doctor'),
+        'appointment_date': _coerce_date(row['appointment_date']),
+        'start_time': _coerce_time(row['start_time'], 'start_time'),
+        'end_time': _coerce_time(row['end_time'], 'end_time'),
+        'reason': _coerce_text(row.get('reason'), 'reason'),
+        'notes': _coerce_text(row.get('notes'), 'notes'),
+    }
+    if values['start_time'] >= values['end_time']:
+        raise ValueError('Start time must be before end time.')
+    return values
+
+
+def _load_day_indexes(doctor_days):
+    """Load the active appointments of every affected doctor-day in one query."""
+    day_rows = {key: [] for key in doctor_days}
+    if not doctor_days:
+        return {}
+
+    by_doctor = {}
+    for doctor_id, appointment_date in doctor_days:
+        by_doctor.setdefault(doctor_id, set()).add(appointment_date)
+    condition = Q()
+    for doctor_id, dates in by_doctor.items():
+        condition |= Q(doctor_id=doctor_id, appointment_date__in=dates)
+
+    active_status_ids = appointment_statuses.ids(ACTIVE_STATUSES)
+    rows = Appointment.objects.filter(condition, status_id__in=active_status_ids).values_list(
+        'id', 'doctor_id', 'appointment_date', 'start_time', 'end_time'
+    )
+    for pk, doctor_id, appointment_date, start_time, end_time in rows:
+        day_rows[(doctor_id, appointment_date)].append((pk, start_time, end_time))
+    return {key: DoctorDayIndex(intervals, 0) for key, intervals in day_rows.items()}
+
+
+def bulk_book_appointments(rows, created_by, status_name='Scheduled', chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validate and insert many appointments at once.
+
+    Existing bookings of the affected doctor-days are read once, and every
+    requested row is checked in memory against them and against the rows
+    accepted before it in the same batch. Accepted rows are inserted with
+    ``bulk_create`` in chunks inside one transaction that holds the locks of
+    every affected doctor-day. Unless ``created_by`` manages appointments,
+    only rows where they are the patient or the doctor are accepted.
+
+    Args:
+        rows (list): Dicts with ``patient``, ``doctor``, ``appointment_date``,
+            ``start_time``, ``end_time`` and optional ``reason`` / ``notes``
+        created_by (User): The user booking the appointments
+        status_name (str): Status given to accepted appointments, one of ``BULK_BOOKING_STATUSES``
+        chunk_size (int): Number of rows per INSERT statement
+
+    Returns:
+        list: One ``{'index', 'accepted', 'id', 'error'}`` dict per requested row, in order.
+            ``id`` stays None on backends that do not return ids from bulk inserts.
+
+    Raises:
+        ValueError: If ``status_name`` is not a booking status
+    """
+    if status_name not in BULK_BOOKING_STATUSES:
+        raise ValueError(f'status must be one of: {", ".join(BULK_BOOKING_STATUSES)}.')
+    results = [{'index': i, 'accepted': False, 'id': None, 'error': None} for i in range(len(rows))]
+    status = appointment_statuses.get_by_name(status_name)
+
+    parsed = {}
+    for i, row in enumerate(rows):
+        try:
+            parsed[i] = _coerce_row(row)
+        except KeyError as e:
+            results[i]['error'] = f'Missing field: {e.args[0]}'
+        except (TypeError, ValueError) as e:
+            results[i]['error'] = str(e)
+
+    # Users behind the requested doctors and patients, for the existence and ownership checks
+    doctor_users = dict(Doctor.objects.filter(
+        id__in={values['doctor_id'] for values in parsed.values()}
+    ).values_list('id', 'user_id'))
+    patient_users = dict(Patient.objects.filter(
+        id__in={values['patient_id'] for values in parsed.values()}
+    ).values_list('id', 'user_id'))
+    books_for_anyone = manages_appointments(created_by)
+
+    doctor_days = {
+        (values['doctor_id'], values['appointment_date'])
+        for values in parsed.values() if values['doctor_id'] in doctor_users
+    }
+    accepted = {}
+    with lock_doctor_days(doctor_days):
+        indexes = _load_day_indexes(doctor_days)
+        # Slots other users hold on the booking page count as taken
+        held = held_intervals(doctor_days, exclude_user_id=created_by.id)
+        for i, values in parsed.items():
+            if values['doctor_id'] not in doctor_users:
+                results[i]['error'] = 'Doctor not found.'
+                continue
+            if values['patient_id'] not in patient_users:
+                results[i]['error'] = 'Patient not found.'
+                continue
+            if not books_for_anyone and created_by.id not in (
+                    patient_users[values['patient_id']], doctor_users[values['doctor_id']]):
+                results[i]['error'] = 'You may only book your own appointments.'
+                continue
+            index = indexes[(values['doctor_id'], values['appointment_date'])]
+            if index.conflicts(values['start_time'], values['end_time']) is not None:
+                results[i]['error'] = 'This time slot conflicts with another appointment.'
+                continue
+            if any(start_time < values['end_time'] and end_time > values['start_time']
+                   for start_time, end_time in held.get((values['doctor_id'], values['appointment_date']), ())):
+                results[i]['error'] = 'This time slot is temporarily held by another user.'
+                continue
+            # Negative keys stand for rows of this batch that have no id yet
+            index.add(-(i + 1), values['start_time'], values['end_time'])
+            accepted[i] = Appointment(status_id=status.id, created_by_id=created_by.id, **values)
+
+        Appointment.objects.bulk_create(list(accepted.values()), batch_size=chunk_size)
+        # bulk_create skips save() signals, so update the rollups and indexes explicitly
+        deltas = Counter()
+        for appointment in accepted.values():
+            deltas.update(appointment_deltas(appointment.doctor_id, appointment.patient_id,
+                                             appointment.appointment_date, appointment.status_id, 1))
+        apply_deltas(deltas)
+        touched = {(appointment.doctor_id, appointment.appointment_date) for appointment in accepted.values()}
+        transaction.on_commit(lambda: conflict_index.invalidate_many(touched))
+        transaction.on_commit(lambda: refresh_doctor_days(touched))
+        # Backends that do not return ids from bulk inserts need rebuild_appointment_search_index
+        created_ids = [appointment.pk for appointment in accepted.values() if appointment.pk]
+        transaction.on_commit(lambda: index_appointments(created_ids))
+
+    for i, appointment in accepted.items():
+        results[i]['accepted'] = True
+        results[i]['id'] = appointment.pk
+    return results
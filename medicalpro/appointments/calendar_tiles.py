@@ -0,0 +1,226 @@
+import calendar
+import hashlib
+import json
+import logging
+import threading
+import time as clock
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import DoctorUnavailability
+
+logger = logging.getLogger(__name__)
+
+CELL_KEY = 'appointments:calendar:{doctor_id}:{date}'
+VERSION_KEY = 'appointments:calendar_version:{doctor_id}:{date}'
+
+# Occupancy resolution of a day cell
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Longest unavailability spread over day cells when it changes
+MAX_REFRESH_DAYS = 62
+
+
+class TileStats:
+    """Process-local hit ratio and rebuild latency of the calendar tile cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.rebuild_seconds = 0.0
+
+    def record_lookup(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def record_rebuild(self, seconds):
+        with self._lock:
+            self.rebuilds += 1
+            self.rebuild_seconds += seconds
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'rebuilds': self.rebuilds,
+            'avg_rebuild_ms': self.rebuild_seconds * 1000 / self.rebuilds if self.rebuilds else None,
+        }
+
+
+tile_stats = TileStats()
+
+
+def _cell_key(doctor_id, day):
+    return CELL_KEY.format(doctor_id=doctor_id, date=day.isoformat())
+
+
+def _version_key(doctor_id, day):
+    return VERSION_KEY.format(doctor_id=doctor_id, date=day.isoformat())
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+        return cache.get(key, 1)
+
+
+def _timeout():
+    return getattr(settings, 'CALENDAR_TILE_TIMEOUT', 24 * 60 * 60)
+
+
+def _mark(bits, start_minute, end_minute):
+    first = max(start_minute // SLOT_MINUTES, 0)
+    last = min((end_minute + SLOT_MINUTES - 1) // SLOT_MINUTES, SLOTS_PER_DAY)
+    for slot in range(first, last):
+        bits |= 1 << slot
+    return bits
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute + (1 if value.second else 0)
+
+
+def build_day_cells(doctor_id, days):
+    """
+    Compute the calendar cells of a doctor for the given days from the database.
+
+    Each cell holds the number of active appointments, a count per status and
+    two occupancy bitmaps (booked and unavailable) at ``SLOT_MINUTES``
+    resolution, hex encoded.
+
+    Returns:
+        dict: Cells keyed by date
+    """
+    started = clock.perf_counter()
+    days = sorted(days)
+    cells = {day: {'count': 0, 'statuses': {}, 'booked': 0, 'unavailable': 0} for day in days}
+    if not days:
+        return {}
+
+    appointments = Appointment.objects.filter(
+        doctor_id=doctor_id, appointment_date__in=days
+    ).values_list('appointment_date', 'start_time', 'end_time', 'status_id')
+    for appointment_date, start_time, end_time, status_id in appointments:
+        status_name = appointment_statuses.name_for(status_id)
+        cell = cells[appointment_date]
+        cell['statuses'][status_name] = cell['statuses'].get(status_name, 0) + 1
+        if status_name in ACTIVE_STATUSES:
+            cell['count'] += 1
+            cell['booked'] = _mark(cell['booked'], _minutes(start_time), _minutes(end_time))
+
+    current_tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(days[0], time.min), current_tz)
+    range_end = timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min), current_tz)
+    unavailability = DoctorUnavailability.objects.filter(
+        doctor_id=doctor_id, start_datetime__lt=range_end, end_datetime__gt=range_start
+    ).values_list('start_datetime', 'end_datetime')
+    for start_datetime, end_datetime in unavailability:
+        start_local = timezone.localtime(start_datetime, current_tz)
+        end_local = timezone.localtime(end_datetime, current_tz)
+        for day in days:
+            if start_local.date() <= day <= end_local.date():
+                first = _minutes(start_local) if day == start_local.date() else 0
+                last = _minutes(end_local) if day == end_local.date() else 24 * 60
+                cells[day]['unavailable'] = _mark(cells[day]['unavailable'], first, last)
+
+    for cell in cells.values():
+        cell['booked'] = f"{cell['booked']:0{SLOTS_PER_DAY // 4}x}"
+        cell['unavailable'] = f"{cell['unavailable']:0{SLOTS_PER_DAY // 4}x}"
+
+    elapsed = clock.perf_counter() - started
+    tile_stats.record_rebuild(elapsed)
+    logger.debug(f"Rebuilt {len(days)} calendar cells for doctor {doctor_id} in {elapsed * 1000:.1f}ms")
+    return cells
+
+
+def get_month_tile(doctor_id, year, month):
+    """
+    Return the calendar tile of a doctor for one month.
+
+    Day cells and their versions are read from the shared cache in one round
+    trip; missing days are rebuilt together and written back. Each cell is
+    stored with the day's version as read before the rebuild, and
+    ``refresh_days`` bumps that version, so a cell built from data a
+    concurrent commit has since changed is never served.
+
+    Returns:
+        tuple: ``(tile, etag)``
+    """
+    days = [date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+    cell_keys = {_cell_key(doctor_id, day): day for day in days}
+    version_keys = {_version_key(doctor_id, day): day for day in days}
+    cached = cache.get_many(list(cell_keys) + list(version_keys))
+    versions = {day: cached.get(key, 0) for key, day in version_keys.items()}
+    cells = {}
+    for key, day in cell_keys.items():
+        if key in cached and cached[key][0] == versions[day]:
+            cells[day] = cached[key][1]
+
+    missing = [day for day in days if day not in cells]
+    tile_stats.record_lookup(len(days) - len(missing), len(missing))
+    if missing:
+        built = build_day_cells(doctor_id, missing)
+        cache.set_many({
+            _cell_key(doctor_id, day): (versions[day], cell) for day, cell in built.items()
+        }, _timeout())
+        cells.update(built)
+
+    tile = {
+        'doctor_id': doctor_id,
+        'month': f'{year:04d}-{month:02d}',
+        'slot_minutes': SLOT_MINUTES,
+        'days': {day.isoformat(): cells[day] for day in days},
+    }
+    etag = hashlib.md5(json.dumps(tile, sort_keys=True).encode()).hexdigest()
+    return tile, etag
+
+
+def refresh_days(doctor_id, days):
+    """
+    Rebuild the cached cells of the given days that are currently cached.
+
+    Bumps the version of every day first, which also discards cells a
+    concurrent ``get_month_tile`` built before the change was committed.
+    """
+    versions = {day: _bump_version(_version_key(doctor_id, day)) for day in days}
+    keys = {_cell_key(doctor_id, day): day for day in days}
+    cached_days = [keys[key] for key in cache.get_many(keys.keys())]
+    if cached_days:
+        built = build_day_cells(doctor_id, cached_days)
+        cache.set_many({
+            _cell_key(doctor_id, day): (versions[day], cell) for day, cell in built.items()
+        }, _timeout())
+
+
+def refresh_doctor_days(doctor_days):
+    """``refresh_days`` for a set of ``(doctor_id, date)`` pairs spread over several doctors."""
+    by_doctor = defaultdict(set)
+    for doctor_id, day in doctor_days:
+        by_doctor[doctor_id].add(day)
+    for doctor_id, days in by_doctor.items():
+        refresh_days(doctor_id, sorted(days))
+
+
+def unavailability_days(start_datetime, end_datetime):
+    """Local dates covered by an unavailability period, capped to ``MAX_REFRESH_DAYS``."""
+    first = timezone.localtime(start_datetime).date()
+    last = min(timezone.localtime(end_datetime).date(), first + timedelta(days=MAX_REFRESH_DAYS))
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
@@ -0,0 +1,106 @@
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.db import transaction
+
+from medicalpro.appointments.models import Appointment, CancellationReason
+from medicalpro.appointments.rollups import UNCOUNTED_STATUSES
+from medicalpro.appointments.waiting_list import waiting_list_paused
+from medicalpro.core.lookups import appointment_statuses, roles
+
+
+def _when(appointment):
+    return f'{appointment.appointment_date:%B %d, %Y} at {appointment.start_time:%I:%M %p}'
+
+
+def notify_cancelled(appointments):
+    """
+    Tell patients and doctors about cancelled appointments with one bulk fan-out.
+
+    Every patient gets the message of the ``CancelAppointment`` procedure;
+    each doctor gets a single notification listing all their cancelled
+    appointments.
+    """
+    from medicalpro.core.utils import send_notifications_bulk
+
+    notifications = [
+        {
+            'user_id': appointment.patient.user_id,
+            'title': 'Appointment Cancelled',
+            'message': f'Your appointment on {_when(appointment)} has been cancelled.',
+            'notification_type': 'appointment',
+            'related_entity': 'appointments',
+            'related_id': appointment.id,
+        }
+        for appointment in appointments
+    ]
+
+    by_doctor = defaultdict(list)
+    for appointment in appointments:
+        by_doctor[appointment.doctor.user_id].append(appointment)
+    for user_id, cancelled in by_doctor.items():
+        if len(cancelled) == 1:
+            appointment = cancelled[0]
+            message = (f'Your appointment with {appointment.patient.user.get_full_name()} on '
+                       f'{_when(appointment)} has been cancelled.')
+        else:
+            lines = [f'{len(cancelled)} of your appointments have been cancelled:']
+            lines.extend(
+                f'- {appointment.patient.user.get_full_name()} on {_when(appointment)}'
+                for appointment in sorted(cancelled, key=lambda a: (a.appointment_date, a.start_time))
+            )
+            message = '\n'.join(lines)
+        notifications.append({
+            'user_id': user_id,
+            'title': 'Appointment Cancelled' if len(cancelled) == 1 else 'Appointments Cancelled',
+            'message': message,
+            'notification_type': 'appointment',
+            'related_entity': 'appointments',
+            'related_id': cancelled[0].id if len(cancelled) == 1 else None,
+        })
+    return send_notifications_bulk(notifications)
+
+
+def cancel_appointments(appointment_ids, cancelled_by, reason, offer_to_waiting_list=True):
+    """
+    Cancel appointments the way the ``CancelAppointment`` procedure does, in one transaction.
+
+    Each appointment gets the Cancelled status, a note naming the role of
+    the canceller and a CancellationReason row, which offers the freed slot
+    to the waiting list unless ``offer_to_waiting_list`` is False.
+    Notifications go out in bulk once the transaction commits. Appointments
+    that are already cancelled, declined or marked no-show are skipped.
+
+    Returns:
+        list: The cancelled appointments
+    """
+    cancelled_status = appointment_statuses.get_by_name('Cancelled')
+    role = roles.name_for(cancelled_by.role_id) if cancelled_by.role_id else 'User'
+    note = f'\nCancelled by {role}. Reason: {reason}'
+
+    with transaction.atomic(), (nullcontext() if offer_to_waiting_list else waiting_list_paused()):
+        appointments = list(Appointment.objects.filter(id__in=list(appointment_ids)).exclude(
+            status_id__in=appointment_statuses.ids(UNCOUNTED_STATUSES)
+        ).select_related('patient__user__profile', 'doctor'))
+        for appointment in appointments:
+            appointment.status = cancelled_status
+            appointment.notes = (appointment.notes or '') + note
+            appointment.save()
+            CancellationReason.objects.update_or_create(
+                appointment=appointment,
+                defaults={'reason': reason, 'cancelled_by': cancelled_by}
+            )
+        transaction.on_commit(lambda: notify_cancelled(appointments))
+    return appointments
+
+
+def cancel_doctor_day(doctor_id, date, cancelled_by, reason):
+    """
+    Cancel every remaining appointment a doctor has on ``date``, e.g. when the doctor is out.
+
+    The freed slots are not offered to the waiting list, the doctor won't be there to see anyone.
+    """
+    return cancel_appointments(
+        Appointment.objects.filter(doctor_id=doctor_id, appointment_date=date).values_list('id', flat=True),
+        cancelled_by, reason, offer_to_waiting_list=False
+    )
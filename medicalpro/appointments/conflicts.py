@@ -0,0 +1,214 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from medicalpro.core.lookups import appointment_statuses
+
+# Statuses that hold a doctor's time slot
+ACTIVE_STATUSES = ('Scheduled', 'Confirmed', 'Waiting', 'In Progress')
+
+VERSION_KEY = 'appointments:conflict_index:{doctor_id}:{date}'
+
+
+def overlapping_appointments(doctor_id, date, start, end, exclude_id=None):
+    """Active appointments of a doctor overlapping [start, end) on ``date``."""
+    from medicalpro.appointments.models import Appointment
+
+    appointments = Appointment.objects.filter(
+        doctor_id=doctor_id,
+        appointment_date=date,
+        status_id__in=appointment_statuses.ids(ACTIVE_STATUSES),
+        start_time__lt=end,
+        end_time__gt=start
+    )
+    if exclude_id is not None:
+        appointments = appointments.exclude(id=exclude_id)
+    return appointments
+
+
+class DoctorDayIndex:
+    """
+    Booked intervals of one doctor on one date, sorted by start time.
+
+    ``max_ends[i]`` is the latest end time among the first ``i + 1`` intervals,
+    which lets overlap checks stop as soon as no earlier interval can reach
+    the requested start, even when legacy rows overlap each other.
+    """
+
+    __slots__ = ('version', 'entries', 'starts', 'max_ends')
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.entries = sorted((start, end, pk) for pk, start, end in rows)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.starts = [start for start, end, pk in self.entries]
+        self.max_ends = []
+        latest = None
+        for start, end, pk in self.entries:
+            latest = end if latest is None or end > latest else latest
+            self.max_ends.append(latest)
+
+    def add(self, pk, start, end):
+        # Only the running maximum from the insertion point on can change
+        i = bisect_right(self.entries, (start, end, pk))
+        self.entries.insert(i, (start, end, pk))
+        self.starts.insert(i, start)
+        latest = self.max_ends[i - 1] if i else None
+        del self.max_ends[i:]
+        for entry_start, entry_end, entry_pk in self.entries[i:]:
+            latest = entry_end if latest is None or entry_end > latest else latest
+            self.max_ends.append(latest)
+
+    def remove(self, pk):
+        self.entries = [entry for entry in self.entries if entry[2] != pk]
+        self._rebuild()
+
+    def conflicts(self, start, end, exclude_id=None):
+        """Return the id of an interval overlapping [start, end), or None."""
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_ends[i] > start:
+            entry_start, entry_end, pk = self.entries[i]
+            if entry_end > start and pk != exclude_id:
+                return pk
+            i -= 1
+        return None
+
+
+class ConflictIndex:
+    """
+    Process-local cache of per doctor-day interval indexes.
+
+    Indexes are loaded lazily from the database on first use and kept up to
+    date by the Appointment signal handlers. Every change also bumps a version
+    counter in the shared Django cache, so other worker processes drop their
+    copy and reload it on their next check. Cross-process invalidation
+    therefore requires a shared cache backend (Redis, Memcached, database).
+    Changes reach the index after their commit, so it only serves read paths:
+    ``Appointment.clean()`` validates writes with ``overlapping_appointments``,
+    a single indexed query that a cache hit could not save.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'APPOINTMENT_CONFLICT_INDEX_SIZE', 5000)
+        self._indexes = OrderedDict()
+        self._locations = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _version_key(doctor_id, date):
+        return VERSION_KEY.format(doctor_id=doctor_id, date=date.isoformat())
+
+    def _shared_version(self, doctor_id, date):
+        return cache.get(self._version_key(doctor_id, date), 0)
+
+    def _bump_version(self, doctor_id, date):
+        key = self._version_key(doctor_id, date)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+            return cache.get(key, 1)
+
+    def _load(self, doctor_id, date, version):
+        from medicalpro.appointments.models import Appointment
+
+        rows = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            appointment_date=date,
+            status_id__in=appointment_statuses.ids(ACTIVE_STATUSES)
+        ).values_list('id', 'start_time', 'end_time')
+        return DoctorDayIndex(rows, version)
+
+    def get(self, doctor_id, date, fresh=False):
+        """
+        Return the up-to-date index for a doctor-day, loading it if needed.
+
+        ``fresh=True`` always reloads from the database. Callers holding a
+        doctor-day lock use it, because other workers only bump the shared
+        version after their commit has released the lock.
+        """
+        key = (doctor_id, date)
+        version = self._shared_version(doctor_id, date)
+        if not fresh:
+            with self._lock:
+                index = self._indexes.get(key)
+                if index is not None and index.version == version:
+                    self._indexes.move_to_end(key)
+                    return index
+
+        index = self._load(doctor_id, date, version)
+        with self._lock:
+            self._drop(key)
+            self._indexes[key] = index
+            for start, end, pk in index.entries:
+                self._locations[pk] = key
+            while len(self._indexes) > self.max_size:
+                self._drop(next(iter(self._indexes)))
+        return index
+
+    def find_conflict(self, doctor_id, date, start, end, exclude_id=None):
+        """Return the id of an active appointment overlapping the slot, or None."""
+        return self.get(doctor_id, date).conflicts(start, end, exclude_id=exclude_id)
+
+    def has_conflict(self, doctor_id, date, start, end, exclude_id=None):
+        return self.find_conflict(doctor_id, date, start, end, exclude_id) is not None
+
+    def record(self, pk, doctor_id, date, start, end, is_active):
+        """Apply a saved appointment to the index and invalidate other workers."""
+        keys = {(doctor_id, date)}
+        with self._lock:
+            old_key = self._locations.pop(pk, None)
+            if old_key is not None:
+                keys.add(old_key)
+                old_index = self._indexes.get(old_key)
+                if old_index is not None:
+                    old_index.remove(pk)
+
+        for key_doctor_id, key_date in keys:
+            version = self._bump_version(key_doctor_id, key_date)
+            with self._lock:
+                index = self._indexes.get((key_doctor_id, key_date))
+                if index is None:
+                    continue
+                if index.version == version - 1:
+                    index.version = version
+                else:
+                    # Another worker changed this doctor-day in the meantime
+                    self._drop((key_doctor_id, key_date))
+
+        if is_active:
+            with self._lock:
+                index = self._indexes.get((doctor_id, date))
+                if index is not None:
+                    index.add(pk, start, end)
+                    self._locations[pk] = (doctor_id, date)
+
+    def forget(self, pk, doctor_id, date):
+        """Remove a deleted appointment from the index."""
+        self.record(pk, doctor_id, date, None, None, is_active=False)
+
+    def invalidate_many(self, keys):
+        """Force every worker to reload the given ``(doctor_id, date)`` indexes."""
+        for doctor_id, date in keys:
+            self._bump_version(doctor_id, date)
+            with self._lock:
+                self._drop((doctor_id, date))
+
+    def _drop(self, key):
+        index = self._indexes.pop(key, None)
+        if index is not None:
+            for start, end, pk in index.entries:
+                self._locations.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._locations.clear()
+
+
+conflict_index = ConflictIndex()
@@ -0,0 +1,233 @@
+import threading
+import time as clock
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+
+HOLDS_KEY = 'appointments:holds:{doctor_id}:{date}'
+# Expiry time per hold token of a user, to enforce SLOT_HOLD_MAX_PER_USER
+USER_HOLDS_KEY = 'appointments:user_holds:{user_id}'
+
+Hold = namedtuple('Hold', 'token doctor_id date start_time end_time user_id expires_at')
+
+
+class HoldStats:
+    """Process-local counters of how slot holds are used by bookings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.created = 0
+        self.released = 0
+        self.expired = 0
+        self.booked_with_hold = 0
+        self.booked_without_hold = 0
+        self.conflicts_avoided = 0
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def as_dict(self):
+        bookings = self.booked_with_hold + self.booked_without_hold
+        return {
+            'created': self.created,
+            'released': self.released,
+            'expired': self.expired,
+            'booked_with_hold': self.booked_with_hold,
+            'booked_without_hold': self.booked_without_hold,
+            'hit_rate': self.booked_with_hold / bookings if bookings else None,
+            'conflicts_avoided': self.conflicts_avoided,
+        }
+
+
+hold_stats = HoldStats()
+
+
+def _key(doctor_id, day):
+    return HOLDS_KEY.format(doctor_id=doctor_id, date=day.isoformat())
+
+
+def _live(entries, now=None):
+    """Filter out expired entries; they leave the cache the next time the doctor-day is written."""
+    now = now or clock.time()
+    return {token: entry for token, entry in entries.items() if entry[3] > now}
+
+
+def _reclaim(doctor_id, day):
+    """Load the live holds of a doctor-day for a write, counting the expired ones dropped."""
+    entries = cache.get(_key(doctor_id, day)) or {}
+    live = _live(entries)
+    if len(live) != len(entries):
+        hold_stats.increment('expired', len(entries) - len(live))
+    return live
+
+
+def _store(doctor_id, day, entries):
+    key = _key(doctor_id, day)
+    if entries:
+        cache.set(key, entries, timeout=max(entry[3] for entry in entries.values()) - clock.time() + 1)
+    else:
+        cache.delete(key)
+
+
+def _as_hold(token, doctor_id, day, entry):
+    start_time, end_time, user_id, expires = entry
+    return Hold(token, doctor_id, day, start_time, end_time, user_id,
+                datetime.fromtimestamp(expires, dt_timezone.utc))
+
+
+def _overlaps(entry, start_time, end_time):
+    return entry[0] < end_time and entry[1] > start_time
+
+
+def get_holds(doctor_id, day):
+    """Return the unexpired holds on a doctor-day."""
+    entries = _live(cache.get(_key(doctor_id, day)) or {})
+    return [_as_hold(token, doctor_id, day, entry) for token, entry in entries.items()]
+
+
+def held_intervals(doctor_days, exclude_user_id=None):
+    """
+    Held ``(start_time, end_time)`` intervals of many doctor-days, read in one cache round trip.
+
+    Returns:
+        dict: Intervals per ``(doctor_id, date)``, only for doctor-days with holds
+    """
+    keys = {_key(doctor_id, day): (doctor_id, day) for doctor_id, day in doctor_days}
+    now = clock.time()
+    intervals = {}
+    for key, entries in cache.get_many(list(keys)).items():
+        held = [
+            (entry[0], entry[1]) for entry in _live(entries, now).values()
+            if exclude_user_id is None or entry[2] != exclude_user_id
+        ]
+        if held:
+            intervals[keys[key]] = held
+    return intervals
+
+
+def _user_holds(user_id):
+    """
+    Expiry time per live hold token of a user.
+
+    Tokens are checked against their doctor-days, so released holds drop out
+    without ``release_hold`` having to update the user's entry.
+    """
+    now = clock.time()
+    tokens = {
+        token: expires
+        for token, expires in (cache.get(USER_HOLDS_KEY.format(user_id=user_id)) or {}).items() if expires > now
+    }
+    keys = {token: _key(*parse_token(token)) for token in tokens}
+    stored = cache.get_many(set(keys.values()))
+    return {token: expires for token, expires in tokens.items() if token in stored.get(keys[token], {})}
+
+
+def hold_slot(doctor_id, day, start_time, end_time, user_id, ttl=None):
+    """
+    Reserve a slot for ``user_id`` for ``ttl`` seconds (``SLOT_HOLD_TTL``, 5 minutes by default).
+
+    Holding a slot again refreshes the hold instead of creating a second one.
+    A user may hold at most ``SLOT_HOLD_MAX_PER_USER`` slots (5) at a time.
+
+    Holds live in the default cache, which must be shared by every worker
+    process (system check ``core.E001``): with a process-local cache the
+    other workers neither see nor respect them. The per-user limit is
+    enforced under an in-process lock, so simultaneous requests of one user
+    landing on different worker processes may briefly exceed it.
+
+    Raises:
+        ValidationError: If the slot is booked or held by another user, or the user holds too many slots
+    """
+    from medicalpro.appointments.booking import local_locks, lock_doctor_days
+    from medicalpro.appointments.conflicts import conflict_index
+
+    ttl = ttl or getattr(settings, 'SLOT_HOLD_TTL', 5 * 60)
+    max_holds = getattr(settings, 'SLOT_HOLD_MAX_PER_USER', 5)
+    with local_locks.hold([f'slot_holds:user:{user_id}']), lock_doctor_days([(doctor_id, day)]):
+        if conflict_index.get(doctor_id, day, fresh=True).conflicts(start_time, end_time) is not None:
+            raise ValidationError(_('This time slot conflicts with another appointment.'))
+        entries = _reclaim(doctor_id, day)
+        token = None
+        for existing, entry in entries.items():
+            if not _overlaps(entry, start_time, end_time):
+                continue
+            if entry[2] != user_id:
+                hold_stats.increment('conflicts_avoided')
+                raise ValidationError(_('This time slot is temporarily held by another user.'))
+            if (entry[0], entry[1]) == (start_time, end_time):
+                token = existing
+        user_holds = _user_holds(user_id)
+        if token is None and len(user_holds) >= max_holds:
+            raise ValidationError(_('You already hold the maximum number of slots.'))
+        token = token or f'{doctor_id}.{day.isoformat()}.{uuid.uuid4().hex}'
+        entries[token] = (start_time, end_time, user_id, clock.time() + ttl)
+        _store(doctor_id, day, entries)
+        user_holds[token] = entries[token][3]
+        cache.set(USER_HOLDS_KEY.format(user_id=user_id), user_holds,
+                  timeout=max(user_holds.values()) - clock.time() + 1)
+    hold_stats.increment('created')
+    return _as_hold(token, doctor_id, day, entries[token])
+
+
+def parse_token(token):
+    """Return the ``(doctor_id, date)`` a hold token belongs to, raising ValueError if malformed."""
+    doctor_id, day, suffix = token.split('.')
+    return int(doctor_id), date.fromisoformat(day)
+
+
+def release_hold(token, user_id=None):
+    """
+    Drop a hold, optionally only if ``user_id`` owns it.
+
+    Returns:
+        bool: Whether a hold was released
+    """
+    try:
+        doctor_id, day = parse_token(token)
+    except ValueError:
+        return False
+    from medicalpro.appointments.booking import lock_doctor_days
+
+    with lock_doctor_days([(doctor_id, day)]):
+        entries = _reclaim(doctor_id, day)
+        entry = entries.get(token)
+        if entry is None or (user_id is not None and entry[2] != user_id):
+            return False
+        del entries[token]
+        _store(doctor_id, day, entries)
+    hold_stats.increment('released')
+    return True
+
+
+def release_user_holds(doctor_id, day, start_time, end_time, user_id):
+    """Drop the holds ``user_id`` has on a slot, once it has been booked."""
+    for hold in get_holds(doctor_id, day):
+        if hold.user_id == user_id and hold.start_time < end_time and hold.end_time > start_time:
+            release_hold(hold.token)
+
+
+def check_booking(doctor_id, day, start_time, end_time, user_id):
+    """
+    Reject a new booking that overlaps another user's hold, and count hold hits.
+
+    Raises:
+        ValidationError: If another user holds part of the slot
+    """
+    own = False
+    for hold in get_holds(doctor_id, day):
+        if hold.start_time >= end_time or hold.end_time <= start_time:
+            continue
+        if hold.user_id != user_id:
+            hold_stats.increment('conflicts_avoided')
+            raise ValidationError(_('This time slot is temporarily held by another user.'))
+        own = True
+    hold_stats.increment('booked_with_hold' if own else 'booked_without_hold')
@@ -0,0 +1,194 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import Doctor
+from medicalpro.patients.models import Patient
+
+# Feed subjects and the appointment field that selects their appointments
+FEED_SUBJECTS = {
+    'doctor': 'doctor_id',
+    'patient': 'patient_id',
+}
+
+FEED_MODELS = {
+    'doctor': Doctor,
+    'patient': Patient,
+}
+
+FEED_TOKEN_SALT = 'medicalpro.appointments.ics.feed_token'
+
+# iCalendar STATUS of each appointment status, TENTATIVE otherwise
+EVENT_STATUSES = {
+    'Confirmed': 'CONFIRMED',
+    'In Progress': 'CONFIRMED',
+    'Completed': 'CONFIRMED',
+    'Cancelled': 'CANCELLED',
+    'Declined': 'CANCELLED',
+    'No-show': 'CANCELLED',
+}
+
+EVENT_FIELDS = (
+    'id', 'appointment_date', 'start_time', 'end_time', 'status_id', 'reason', 'updated_at',
+    'doctor__user__profile__first_name', 'doctor__user__profile__last_name',
+    'patient__user__profile__first_name', 'patient__user__profile__last_name',
+)
+
+# Longest content line allowed by RFC 5545, in octets
+MAX_LINE_OCTETS = 75
+
+
+def _appointments(kind, subject_id):
+    return Appointment.objects.filter(**{FEED_SUBJECTS[kind]: subject_id})
+
+
+def feed_owner(kind, subject_id):
+    """Return the id of the user a doctor or patient feed belongs to, or None if the subject is unknown."""
+    return FEED_MODELS[kind].objects.filter(id=subject_id).values_list('user_id', flat=True).first()
+
+
+def _feed_secret(kind, subject_id):
+    # The owner's password hash is mixed in, so changing the password revokes old feed links
+    row = FEED_MODELS[kind].objects.filter(id=subject_id).values_list('user_id', 'user__password').first()
+    if row is None:
+        return None
+    return f'{kind}:{subject_id}:{row[0]}:{row[1]}'
+
+
+def feed_token(kind, subject_id):
+    """
+    Secret token of a feed, for the URL handed to calendar clients.
+
+    Calendar clients cannot send credentials, so the token is what grants
+    access to the feed. It is derived from ``SECRET_KEY`` and the owner's
+    password hash; changing either revokes every link issued before.
+
+    Returns:
+        str: The token, or None if the subject is unknown
+    """
+    secret = _feed_secret(kind, subject_id)
+    if secret is None:
+        return None
+    return salted_hmac(FEED_TOKEN_SALT, secret, algorithm='sha256').hexdigest()[:40]
+
+
+def check_feed_token(kind, subject_id, token):
+    expected = feed_token(kind, subject_id)
+    return expected is not None and constant_time_compare(expected, token or '')
+
+
+def feed_state(kind, subject_id):
+    """
+    Validators of a feed, read with one aggregate over the subject's appointments.
+
+    The aggregate only reads the subject's ``(subject, updated_at)`` index.
+    Renaming a participant touches the ``updated_at`` of their appointments
+    (see ``touch_participant_appointments``), so names shown in events need
+    no join to the profiles. The row count is part of the ETag so deleted
+    appointments change it even though they leave the latest ``updated_at``
+    untouched.
+
+    Returns:
+        tuple: ``(etag, last_modified)``; ``last_modified`` is None for an empty feed
+    """
+    state = _appointments(kind, subject_id).order_by().aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    last_modified = state['last_modified']
+    digest = hashlib.md5(
+        f"{kind}:{subject_id}:{last_modified.isoformat() if last_modified else ''}:{state['total']}".encode()
+    ).hexdigest()
+    return digest, last_modified
+
+
+def escape_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+
+
+def fold(line):
+    """Fold a content line into CRLF-terminated chunks of at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + '\r\n'
+    chunks = []
+    start = 0
+    limit = MAX_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(encoded[start:end].decode())
+        start = end
+        limit = MAX_LINE_OCTETS - 1  # continuation lines start with a space
+    return '\r\n '.join(chunks) + '\r\n'
+
+
+def _utc(value):
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(day, clock):
+    return _utc(datetime.combine(day, clock))
+
+
+def _name(row, participant):
+    return f"{row[f'{participant}__user__profile__first_name'] or ''} " \
+           f"{row[f'{participant}__user__profile__last_name'] or ''}".strip()
+
+
+def event_lines(row, kind):
+    status_name = appointment_statuses.name_for(row['status_id'])
+    if kind == 'doctor':
+        summary = f"Appointment with {_name(row, 'patient')}"
+    else:
+        summary = f"Appointment with Dr. {_name(row, 'doctor')}"
+    domain = getattr(settings, 'ICS_UID_DOMAIN', 'medicalpro')
+    yield 'BEGIN:VEVENT'
+    yield f"UID:appointment-{row['id']}@{domain}"
+    yield f"DTSTAMP:{_utc(row['updated_at'])}"
+    yield f"LAST-MODIFIED:{_utc(row['updated_at'])}"
+    yield f"DTSTART:{_local(row['appointment_date'], row['start_time'])}"
+    yield f"DTEND:{_local(row['appointment_date'], row['end_time'])}"
+    yield f"SUMMARY:{escape_text(summary)}"
+    if row['reason']:
+        yield f"DESCRIPTION:{escape_text(row['reason'])}"
+    yield f"STATUS:{EVENT_STATUSES.get(status_name, 'TENTATIVE')}"
+    yield 'END:VEVENT'
+
+
+def iter_calendar(kind, subject_id, chunk_size=None):
+    """
+    Yield the iCalendar feed of a doctor or patient piece by piece.
+
+    Appointments are read in id order, one keyset page of ``chunk_size``
+    rows per query, and each page is emitted as one string. MySQL and SQLite
+    buffer a whole result set even with ``iterator()``, so paging is what
+    keeps memory use from growing with the length of the history.
+    """
+    chunk_size = chunk_size or getattr(settings, 'ICS_FEED_CHUNK_SIZE', 500)
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//MedicalPro//Appointments//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+    ))
+
+    rows = _appointments(kind, subject_id).order_by('id').values(*EVENT_FIELDS)
+    last_id = 0
+    while True:
+        page = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if page:
+            yield ''.join(fold(line) for row in page for line in event_lines(row, kind))
+        if len(page) < chunk_size:
+            break
+        last_id = page[-1]['id']
+    yield fold('END:VCALENDAR')
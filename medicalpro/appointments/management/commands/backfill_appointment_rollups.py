@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from medicalpro.appointments.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily doctor and patient appointment rollups from the appointments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        except ValueError:
+            raise CommandError('Dates must use the YYYY-MM-DD format.')
+
+        written = backfill_rollups(start_date, end_date, chunk_size=options['chunk_size'])
+        for kind, count in written.items():
+            self.stdout.write(self.style.SUCCESS(f'Wrote {count} {kind} rollup rows'))
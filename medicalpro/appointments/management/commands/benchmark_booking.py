@@ -0,0 +1,109 @@
+import random
+import threading
+import time as clock
+from datetime import date, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from medicalpro.accounts.models import Role, User
+from medicalpro.appointments.booking import book_requested_appointment
+from medicalpro.appointments.models import Appointment, AppointmentStatus
+from medicalpro.doctors.models import Specialty
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches
+
+
+def _at(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class Command(BaseCommand):
+    help = ('Book overlapping slots from many threads through the booking endpoint code and check that '
+            'no doctor-day ends up double booked. The synthetic rows are committed, so every thread sees '
+            'them, and everything the run creates is deleted at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent booking threads')
+        parser.add_argument('--requests', type=int, default=250, help='Booking requests per thread')
+        parser.add_argument('--doctors', type=int, default=4, help='Doctors sharing the requests')
+        parser.add_argument('--days', type=int, default=5, help='Days of each doctor sharing the requests')
+
+    def handle(self, *args, **options):
+        # Lookup rows the builders may add, deleted at the end unless they existed before
+        existing = {model: set(model.objects.values_list('id', flat=True))
+                    for model in (AppointmentStatus, Specialty, Role)}
+        doctors, patients = [], []
+        try:
+            create_statuses()
+            reset_process_caches()
+            for _ in range(options['doctors']):
+                doctors.append(create_doctor())
+            for _ in range(options['threads']):
+                patients.append(create_patient())
+            self.run(doctors, patients, options['requests'], options['days'])
+        finally:
+            # Appointments first, their delete signals update the doctor and patient rollups. Deleting
+            # the users cascades to their doctor and patient rows, profiles, availability and rollups
+            Appointment.objects.filter(doctor__in=doctors).delete()
+            User.objects.filter(id__in=[person.user_id for person in doctors + patients]).delete()
+            for model, ids in existing.items():
+                model.objects.exclude(id__in=ids).delete()
+            reset_process_caches()
+
+    def run(self, doctors, patients, requests, day_count):
+        days = [date(2030, 1, 7) + timedelta(days=offset) for offset in range(day_count)]
+        barrier = threading.Barrier(len(patients) + 1)
+        outcomes = {'booked': 0, 'conflicts': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def book(patient, seed):
+            rng = random.Random(seed)
+            counts = {'booked': 0, 'conflicts': 0, 'errors': 0}
+            try:
+                barrier.wait()
+                for _ in range(requests):
+                    start = rng.randrange(9 * 60, 17 * 60, 15)
+                    try:
+                        book_requested_appointment({
+                            'patient': patient.id, 'doctor': rng.choice(doctors).id,
+                            'appointment_date': rng.choice(days), 'start_time': _at(start),
+                            'end_time': _at(start + 30),
+                        }, patient.user)
+                        counts['booked'] += 1
+                    except ValidationError:
+                        counts['conflicts'] += 1
+                    except Exception as e:
+                        counts['errors'] += 1
+                        self.stderr.write(f'{type(e).__name__}: {e}')
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        outcomes[key] += value
+
+        workers = [threading.Thread(target=book, args=(patient, seed)) for seed, patient in enumerate(patients)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = clock.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = clock.perf_counter() - started
+
+        double_booked = 0
+        rows = Appointment.objects.filter(doctor__in=doctors).order_by(
+            'doctor_id', 'appointment_date', 'start_time'
+        ).values_list('doctor_id', 'appointment_date', 'start_time', 'end_time')
+        previous = None
+        for doctor_id, day, start_time, end_time in rows:
+            if previous and previous[:2] == (doctor_id, day) and previous[2] > start_time:
+                double_booked += 1
+            previous = (doctor_id, day, end_time)
+
+        total = len(patients) * requests
+        self.stdout.write(f'{total} requests from {len(patients)} threads over {len(doctors) * len(days)} '
+                          f'doctor-days in {elapsed:.2f} s ({total / elapsed:.0f} requests/s)')
+        self.stdout.write(f"booked {outcomes['booked']} ({outcomes['booked'] / elapsed:.0f}/s), "
+                          f"rejected as conflicts {outcomes['conflicts']}, errors {outcomes['errors']}")
+        self.stdout.write(f'appointments stored {len(rows)}, double-booked {double_booked}')
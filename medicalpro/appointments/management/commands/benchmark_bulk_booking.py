@@ -0,0 +1,76 @@
+import random
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from medicalpro.appointments import booking
+from medicalpro.appointments.booking import BULK_CHUNK_SIZE, bulk_book_appointments
+from medicalpro.appointments.models import DoctorAppointmentRollup
+from medicalpro.core.testing import (
+    create_doctor, create_patient, create_statuses, create_user, reset_process_caches, timed
+)
+
+
+def _at(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput of bulk_book_appointments() and the share of it spent updating the '
+            'rollups, on synthetic data rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=20000, help='Rows in the bulk request')
+        parser.add_argument('--doctors', type=int, default=100, help='Doctors sharing the rows')
+        parser.add_argument('--patients', type=int, default=200, help='Patients sharing the rows')
+        parser.add_argument('--per-day', type=int, default=32, help='Appointments per doctor-day')
+        parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE, help='Rows per INSERT statement')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['appointments'], options['doctors'], options['patients'], options['per_day'],
+                     options['chunk_size'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, total, doctor_count, patient_count, per_day, chunk_size):
+        create_statuses()
+        reset_process_caches()
+        doctors = [create_doctor() for _ in range(doctor_count)]
+        patients = [create_patient() for _ in range(patient_count)]
+        staff = create_user(role='admin', is_staff=True)
+
+        rng = random.Random(0)
+        first_day = date(2030, 1, 7)
+        rows = []
+        for number in range(total):
+            slot = number // doctor_count
+            rows.append({
+                'doctor': doctors[number % doctor_count].id,
+                'patient': rng.choice(patients).id,
+                'appointment_date': (first_day + timedelta(days=slot // per_day)).isoformat(),
+                'start_time': _at(8 * 60 + (slot % per_day) * 15).strftime('%H:%M'),
+                'end_time': _at(8 * 60 + (slot % per_day) * 15 + 15).strftime('%H:%M'),
+            })
+
+        rollup_ms = []
+
+        def timed_apply_deltas(deltas):
+            rollup_ms.append(timed(lambda: apply_deltas(deltas)))
+
+        apply_deltas = booking.apply_deltas
+        results = []
+        with mock.patch.object(booking, 'apply_deltas', timed_apply_deltas):
+            elapsed_ms = timed(lambda: results.extend(bulk_book_appointments(rows, staff, chunk_size=chunk_size)))
+
+        accepted = sum(result['accepted'] for result in results)
+        counted = sum(DoctorAppointmentRollup.objects.filter(
+            doctor__in=doctors).values_list('count', flat=True))
+        self.stdout.write(f'{total} rows over {doctor_count} doctors and {patient_count} patients, '
+                          f'{accepted} accepted, {counted} counted in the doctor rollups')
+        self.stdout.write(f'bulk_book_appointments {elapsed_ms:9.0f} ms  {accepted * 1000 / elapsed_ms:7.0f} '
+                          f'appointments/s')
+        self.stdout.write(f'of which apply_deltas  {sum(rollup_ms):9.0f} ms')
+        self.stdout.write('Search indexing and index invalidation run after commit and are not included.')
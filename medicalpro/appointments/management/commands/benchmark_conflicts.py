@@ -0,0 +1,86 @@
+import random
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from medicalpro.appointments.conflicts import conflict_index, overlapping_appointments
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches, timed
+
+
+def _at(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class Command(BaseCommand):
+    help = ('Compare the conflict check of Appointment.clean() before and after it switched to cached status '
+            'ids, next to a lookup in the doctor-day index, on synthetic data rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=10000,
+                            help='Appointments of the benchmark doctor, spread over consecutive days')
+        parser.add_argument('--per-day', type=int, default=32, help='Appointments per doctor-day')
+        parser.add_argument('--checks', type=int, default=2000, help='Conflict checks timed per path')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['appointments'], options['per_day'], options['checks'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, total, per_day, checks):
+        create_statuses()
+        reset_process_caches()
+        doctor = create_doctor()
+        patient = create_patient()
+        first_day = date(2030, 1, 7)
+        days = [first_day + timedelta(days=offset) for offset in range((total + per_day - 1) // per_day)]
+        scheduled = appointment_statuses.id_for('Scheduled')
+        Appointment.objects.bulk_create([
+            Appointment(doctor=doctor, patient=patient, appointment_date=days[number // per_day],
+                        start_time=_at(8 * 60 + (number % per_day) * 15),
+                        end_time=_at(8 * 60 + (number % per_day) * 15 + 15),
+                        status_id=scheduled, created_by_id=patient.user_id)
+            for number in range(total)
+        ], batch_size=1000)
+
+        rng = random.Random(0)
+        candidates = []
+        for _ in range(checks):
+            start = rng.randrange(7 * 60, 18 * 60, 5)
+            candidates.append((rng.choice(days), _at(start), _at(start + 20)))
+        samples = iter(candidates * 3)
+
+        def original_clean():
+            # The query Appointment.clean() ran originally, joining the status table
+            day, start, end = next(samples)
+            Appointment.objects.filter(
+                doctor=doctor, appointment_date=day,
+                status__name__in=['Scheduled', 'Confirmed', 'Waiting', 'In Progress']
+            ).filter(
+                Q(start_time__lt=end, end_time__gt=start) | Q(start_time=start, end_time=end)
+            ).exists()
+
+        def current_clean():
+            day, start, end = next(samples)
+            overlapping_appointments(doctor.id, day, start, end).exists()
+
+        def index_only():
+            # Read paths only; clean() does not consult the index
+            day, start, end = next(samples)
+            conflict_index.find_conflict(doctor.id, day, start, end)
+
+        warm_ms = timed(lambda: [conflict_index.get(doctor.id, day) for day in days])
+
+        results = [
+            ('original clean() query', timed(original_clean, checks)),
+            ('current clean() query', timed(current_clean, checks)),
+            ('index lookup (not used by clean)', timed(index_only, checks)),
+        ]
+        self.stdout.write(f'{total} appointments over {len(days)} doctor-days, {checks} checks per path; '
+                          f'loading every index took {warm_ms:.0f} ms')
+        for label, per_check in results:
+            self.stdout.write(f'{label:32} {per_check * 1000:9.1f} us/check')
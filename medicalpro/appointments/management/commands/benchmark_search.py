@@ -0,0 +1,103 @@
+import random
+import string
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.appointments.search import rebuild_index, search_appointments, tokenize
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import (
+    create_doctor, create_patient, create_statuses, create_user, reset_process_caches, timed
+)
+
+NAMES = ('Ana', 'Bruno', 'Carla', 'Dmitri', 'Elena', 'Farid', 'Greta', 'Hugo', 'Ines', 'Jonas', 'Keiko', 'Liam')
+
+# Distinct words of the synthetic reasons and notes, drawn with a Zipf-like skew
+VOCABULARY_SIZE = 5000
+
+# Fields the pre-index search view filtered with icontains
+ICONTAINS_FIELDS = (
+    'reason', 'notes', 'patient__user__profile__first_name', 'patient__user__profile__last_name',
+    'doctor__user__profile__first_name', 'doctor__user__profile__last_name',
+)
+
+
+def _vocabulary(rng):
+    return [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+            for _ in range(VOCABULARY_SIZE)]
+
+
+def _sentence(rng, words, length):
+    return ' '.join(words[min(int(rng.paretovariate(1.0)) - 1, len(words) - 1)] for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = ('Compare the appointment search index with icontains filtering over the same fields, '
+            'on synthetic data rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=20000, help='Appointments to search')
+        parser.add_argument('--queries', type=int, default=200, help='Queries timed per path')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['appointments'], options['queries'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, total, queries):
+        create_statuses()
+        reset_process_caches()
+        rng = random.Random(0)
+        words = _vocabulary(rng)
+        doctors = [create_doctor(first_name=name) for name in NAMES[:4]]
+        patients = [create_patient(first_name=name) for name in NAMES]
+        scheduled = appointment_statuses.id_for('Scheduled')
+        first_day = date(2030, 1, 7)
+        Appointment.objects.bulk_create([
+            Appointment(doctor=rng.choice(doctors), patient=rng.choice(patients),
+                        appointment_date=first_day + timedelta(days=number // 32),
+                        start_time=time(8 + number % 32 // 4, number % 4 * 15),
+                        end_time=time(8 + number % 32 // 4, number % 4 * 15 + 14),
+                        reason=_sentence(rng, words, 3),
+                        notes=_sentence(rng, words, 8) if number % 3 else None,
+                        status_id=scheduled, created_by_id=doctors[0].user_id)
+            for number in range(total)
+        ], batch_size=1000)
+        indexed = rebuild_index()
+
+        # Word prefixes, from the few words in most appointments and from the long tail
+        used = set()
+        for reason, notes in Appointment.objects.values_list('reason', 'notes'):
+            used.update(tokenize(reason), tokenize(notes))
+        tail = sorted(used - set(words[:20]))
+        query_sets = {
+            'common words': [rng.choice(words[:20])[:rng.randint(3, 6)] for _ in range(queries)],
+            'rare words': [rng.choice(tail)[:rng.randint(4, 8)] for _ in range(queries)],
+        }
+        staff = create_user(role='admin', is_staff=True)
+        patient_user = patients[0].user
+
+        def icontains_search(query):
+            appointments = Appointment.objects.all()
+            for token in tokenize(query):
+                condition = Q()
+                for field in ICONTAINS_FIELDS:
+                    condition |= Q(**{f'{field}__icontains': token})
+                appointments = appointments.filter(condition)
+            list(appointments.order_by('-appointment_date', '-start_time')[:20])
+
+        paths = [
+            ('icontains filter', icontains_search),
+            ('search index', lambda query: search_appointments(query, limit=20, user=staff)),
+            ('search index, one patient', lambda query: search_appointments(query, limit=20, user=patient_user)),
+        ]
+        self.stdout.write(f'{indexed} appointments indexed, {queries} queries per path and set')
+        for set_name, samples in query_sets.items():
+            for label, search in paths:
+                pending = iter(samples)
+                per_query = timed(lambda: search(next(pending)), queries)
+                self.stdout.write(f'{set_name:13} {label:28} {per_query:8.2f} ms/query')
@@ -0,0 +1,21 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from medicalpro.appointments.reminders import ReminderDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Run the appointment reminder dispatcher until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Maximum number of reminders sent per batch')
+
+    def handle(self, *args, **options):
+        dispatcher = ReminderDispatcher(batch_size=options['batch_size'])
+        self.stdout.write('Dispatching appointment reminders...')
+        try:
+            asyncio.run(dispatcher.run())
+        except KeyboardInterrupt:
+            self.stdout.write('Reminder dispatcher stopped.')
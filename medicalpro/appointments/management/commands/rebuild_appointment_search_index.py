@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from medicalpro.appointments.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the appointment full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of appointments read and indexed per batch; the whole rebuild '
+                                 'runs in one transaction')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} appointments'))
@@ -1,8 +1,9 @@
 from django.db import models
-from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from medicalpro.accounts.models import User
+from medicalpro.appointments.conflicts import overlapping_appointments
+from medicalpro.appointments.holds import check_booking
 from medicalpro.patients.models import Patient
 from medicalpro.doctors.models import Doctor
 
@@ -48,18 +49,15 @@ class Appointment(models.Model):
         if self.start_time and self.end_time and self.start_time >= self.end_time:
             raise ValidationError(_('Start time must be before end time.'))
         
-        # Check for time slot conflicts
-        conflicts = Appointment.objects.filter(
-            doctor=self.doctor,
-            appointment_date=self.appointment_date,
-            status__name__in=['Scheduled', 'Confirmed', 'Waiting', 'In Progress']
-        ).exclude(id=self.id).filter(
-            Q(start_time__lt=self.end_time, end_time__gt=self.start_time) |
-            Q(start_time=self.start_time, end_time=self.end_time)
-        )
-        
-        if conflicts.exists():
+        # Check for time slot conflicts in the database, which also sees this transaction's writes
+        if overlapping_appointments(self.doctor_id, self.appointment_date,
+                                    self.start_time, self.end_time, exclude_id=self.id).exists():
             raise ValidationError(_('This time slot conflicts with another appointment.'))
+        
+        # New bookings may not take a slot another user is holding
+        if self._state.adding:
+            check_booking(self.doctor_id, self.appointment_date, self.start_time, self.end_time,
+                          self.created_by_id)
     
     def save(self, *args, **kwargs):
         self.clean()
@@ -68,6 +66,76 @@ class Appointment(models.Model):
     class Meta:
         db_table = 'appointments'
         ordering = ['-appointment_date', '-start_time']
+        indexes = [
+            # Matches the ordering plus id tiebreaker used by KeysetPagination
+            models.Index(fields=['-appointment_date', '-start_time', '-id'], name='appointment_keyset_idx'),
+            # Let the calendar feeds read their validators from the index alone
+            models.Index(fields=['doctor', 'updated_at'], name='appt_doctor_updated_idx'),
+            models.Index(fields=['patient', 'updated_at'], name='appt_patient_updated_idx'),
+        ]
+
+
+class DoctorDayLock(models.Model):
+    """Row locked with SELECT ... FOR UPDATE to serialize bookings of one doctor-day."""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='day_locks')
+    date = models.DateField()
+    
+    def __str__(self):
+        return f"Booking lock for {self.doctor_id} on {self.date}"
+    
+    class Meta:
+        db_table = 'doctor_day_locks'
+        unique_together = ('doctor', 'date')
+
+
+class AppointmentRollup(models.Model):
+    """Number of appointments per day and status, maintained incrementally."""
+    date = models.DateField()
+    status = models.ForeignKey(AppointmentStatus, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+
+class DoctorAppointmentRollup(AppointmentRollup):
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointment_rollups')
+    
+    def __str__(self):
+        return f"{self.count} {self.status} appointments for {self.doctor_id} on {self.date}"
+    
+    class Meta:
+        db_table = 'doctor_appointment_rollups'
+        unique_together = ('doctor', 'date', 'status')
+        ordering = ['date']
+
+
+class PatientAppointmentRollup(AppointmentRollup):
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointment_rollups')
+    
+    def __str__(self):
+        return f"{self.count} {self.status} appointments for {self.patient_id} on {self.date}"
+    
+    class Meta:
+        db_table = 'patient_appointment_rollups'
+        unique_together = ('patient', 'date', 'status')
+        ordering = ['date']
+
+
+class AppointmentSearchTerm(models.Model):
+    """Inverted index entry: one normalized term found in an appointment or its participants."""
+    term = models.CharField(max_length=64)
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.term} -> {self.appointment_id}"
+    
+    class Meta:
+        db_table = 'appointment_search_terms'
+        indexes = [
+            models.Index(fields=['term', 'appointment'], name='appointment_search_term_idx'),
+        ]
 
 
 class AppointmentDocument(models.Model):
@@ -98,6 +166,12 @@ class AppointmentReminder(models.Model):
     reminder_type = models.CharField(max_length=5, choices=REMINDER_TYPE_CHOICES, default='Email')
     is_sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Delivery of each channel, so a retry only repeats the ones that failed
+    email_sent_at = models.DateTimeField(null=True, blank=True)
+    notification_sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=255, blank=True, null=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -146,4 +220,4 @@ class WaitingList(models.Model):
     
     class Meta:
         db_table = 'waiting_list'
-        ordering = ['-priority', 'created_at'] 
\ No newline at end of file
+        ordering = ['-priority', 'created_at'] 
\ No newline at end of file
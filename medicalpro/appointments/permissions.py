@@ -0,0 +1,22 @@
+from django.db.models import Q
+
+
+def manages_appointments(user):
+    """Staff allowed to act on any appointment: superusers, staff and roles with ``manage_appointments``."""
+    return user.is_superuser or user.is_staff or user.has_permission('manage_appointments')
+
+
+def participant_filter(user, prefix=''):
+    """
+    Q matching the appointments a user takes part in, as the patient or the doctor.
+
+    ``prefix`` is the path to the appointment from another model, e.g. ``'appointment__'``.
+    """
+    return Q(**{f'{prefix}patient__user_id': user.id}) | Q(**{f'{prefix}doctor__user_id': user.id})
+
+
+def visible_appointments(queryset, user):
+    """Restrict an appointment queryset to what ``user`` may see and act on."""
+    if manages_appointments(user):
+        return queryset
+    return queryset.filter(participant_filter(user))
@@ -0,0 +1,299 @@
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES
+from medicalpro.appointments.models import AppointmentReminder
+from medicalpro.core.lookups import appointment_statuses
+
+logger = logging.getLogger(__name__)
+
+# Channel layer group the dispatcher listens on for new and moved reminders
+REMINDER_GROUP = 'appointment_reminders'
+
+
+def _max_attempts():
+    return getattr(settings, 'REMINDER_MAX_ATTEMPTS', 5)
+
+
+def _pending_reminders():
+    """Unsent reminders of appointments that still take place, short of the attempt limit."""
+    return AppointmentReminder.objects.filter(
+        is_sent=False,
+        attempts__lt=_max_attempts(),
+        appointment__status_id__in=appointment_statuses.ids(ACTIVE_STATUSES)
+    )
+
+
+def _still_claimed(reminders):
+    """The rows of ``reminders`` whose claim has not passed to another dispatcher."""
+    return AppointmentReminder.objects.filter(
+        id__in=[reminder.id for reminder in reminders],
+        claimed_by__in={reminder.claimed_by for reminder in reminders}
+    )
+
+
+class ReminderDispatcher:
+    """
+    Long-running sender of AppointmentReminder rows.
+
+    Unsent reminders due within the next ``window`` are loaded into a
+    min-heap keyed by ``reminder_time``. The dispatcher sleeps until the head
+    is due, sends every due reminder as one batch and marks the successful
+    ones sent with a single UPDATE. Reminders created or moved while it runs
+    arrive through the ``REMINDER_GROUP`` channel layer group (see
+    ``announce_reminder``), so the table is only queried once per window.
+
+    The in-memory channel layer does not reach other processes, so with it
+    the dispatcher instead reloads the window every ``REMINDER_POLL_INTERVAL``
+    seconds (30). A failed reminder is retried ``REMINDER_RETRY_DELAY``
+    seconds (300) later, also when a window reload reads it again meanwhile,
+    and given up after ``REMINDER_MAX_ATTEMPTS`` (5) attempts.
+
+    Several dispatchers may run at once: each batch is claimed with a
+    conditional UPDATE, as the email outbox does, so a reminder is only sent
+    by the dispatcher holding its claim. A claim expires after
+    ``REMINDER_LOCK_TIMEOUT`` seconds (300).
+    """
+
+    def __init__(self, window=None, batch_size=None, retry_delay=None, poll_interval=None, worker_id=None):
+        self.window = window or timedelta(
+            seconds=getattr(settings, 'REMINDER_DISPATCH_WINDOW', 60 * 60))
+        self.batch_size = batch_size or getattr(settings, 'REMINDER_BATCH_SIZE', 100)
+        self.retry_delay = retry_delay or timedelta(
+            seconds=getattr(settings, 'REMINDER_RETRY_DELAY', 5 * 60))
+        self.poll_interval = poll_interval or timedelta(
+            seconds=getattr(settings, 'REMINDER_POLL_INTERVAL', 30))
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.heap = []
+        # Current due time of every queued reminder; heap entries with another time are stale
+        self.queued = {}
+        self.retry_at = {}
+        self.loaded_until = None
+        self.next_poll = None
+        self.channel_layer = get_channel_layer()
+        if isinstance(self.channel_layer, InMemoryChannelLayer):
+            logger.warning("The in-memory channel layer does not reach the web processes, "
+                           "polling for new reminders instead")
+            self.channel_layer = None
+        self.channel_name = None
+
+    def push(self, reminder_id, reminder_time):
+        """Queue a reminder, or move a queued one, if it falls inside the loaded window."""
+        retry_at = self.retry_at.get(reminder_id)
+        if retry_at is not None and retry_at > reminder_time:
+            reminder_time = retry_at
+        if self.queued.get(reminder_id) == reminder_time:
+            return
+        if self.loaded_until is not None and reminder_time > self.loaded_until:
+            # Picked up by the next window load
+            self.queued.pop(reminder_id, None)
+            return
+        heapq.heappush(self.heap, (reminder_time, reminder_id))
+        self.queued[reminder_id] = reminder_time
+
+    def load_window(self):
+        now = timezone.now()
+        self.loaded_until = now + self.window
+        self.next_poll = now + self.poll_interval
+        rows = _pending_reminders().filter(reminder_time__lte=self.loaded_until).values_list(
+            'id', 'reminder_time', 'locked_until'
+        )
+        for reminder_id, reminder_time, locked_until in rows:
+            # A reminder claimed or waiting for a retry elsewhere is due once that ends
+            self.push(reminder_id, max(reminder_time, locked_until or reminder_time))
+
+    def pop_due(self):
+        now = timezone.now()
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < self.batch_size:
+            reminder_time, reminder_id = heapq.heappop(self.heap)
+            if self.queued.get(reminder_id) != reminder_time:
+                # Moved since it was queued
+                continue
+            del self.queued[reminder_id]
+            due.append(reminder_id)
+        return due
+
+    def requeue_failed(self, reminder_ids, failed):
+        """Forget the retry times of a sent batch and queue its failed reminders again after the retry delay."""
+        retry_at = timezone.now() + self.retry_delay
+        failed = set(failed)
+        for reminder_id in reminder_ids:
+            if reminder_id in failed:
+                self.retry_at[reminder_id] = retry_at
+                self.push(reminder_id, retry_at)
+            else:
+                self.retry_at.pop(reminder_id, None)
+
+    def _lock_expiry(self, now):
+        return now + timedelta(seconds=getattr(settings, 'REMINDER_LOCK_TIMEOUT', 5 * 60))
+
+    def claim(self, reminder_ids):
+        """
+        Claim the due reminders among ``reminder_ids`` for this dispatcher.
+
+        Reminders whose appointment was cancelled meanwhile, which were moved
+        to a later time, or which another dispatcher holds are left out.
+
+        Returns:
+            list: The claimed AppointmentReminder rows
+        """
+        now = timezone.now()
+        claim = f'{self.worker_id}:{uuid.uuid4().hex[:8]}'
+        _pending_reminders().filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+            id__in=reminder_ids,
+            reminder_time__lte=now
+        ).update(claimed_by=claim, locked_until=self._lock_expiry(now))
+        return list(AppointmentReminder.objects.filter(claimed_by=claim, is_sent=False).select_related(
+            'appointment__patient__user__profile',
+            'appointment__doctor__user__profile',
+            'appointment__doctor__specialty',
+        ))
+
+    def send_batch(self, reminder_ids):
+        """
+        Claim and send a batch of reminders, then mark the delivered ones sent in one UPDATE.
+
+        Each channel is recorded as delivered in the same transaction that
+        queues its email or notification, so a retry after a partial failure
+        only repeats the channels that failed. Every update is conditional on
+        the claim, which is renewed before each reminder.
+
+        Returns:
+            list: IDs of the reminders that failed and should be retried
+        """
+        from medicalpro.core.utils import send_email_notification, send_notification
+
+        sent, failed = [], []
+        for reminder in self.claim(reminder_ids):
+            claimed = AppointmentReminder.objects.filter(id=reminder.id, claimed_by=reminder.claimed_by)
+            if not claimed.update(locked_until=self._lock_expiry(timezone.now())):
+                logger.warning(f"Skipping reminder {reminder.id}: its claim expired and another dispatcher took it")
+                continue
+            appointment = reminder.appointment
+            patient_user = appointment.patient.user
+            delivered = True
+            if reminder.reminder_type in ('Email', 'Both') and reminder.email_sent_at is None:
+                with transaction.atomic():
+                    email_sent = send_email_notification(
+                        patient_user.email,
+                        'Appointment Reminder',
+                        'appointment_reminder',
+                        {
+                            'patient_name': patient_user.get_full_name(),
+                            'doctor_name': appointment.doctor.full_name,
+                            'specialty': appointment.doctor.specialty.name,
+                            'appointment_date': appointment.appointment_date.strftime('%B %d, %Y'),
+                            'appointment_time': appointment.start_time.strftime('%I:%M %p'),
+                            'location': getattr(settings, 'CLINIC_LOCATION', ''),
+                            'manage_url': getattr(settings, 'APPOINTMENTS_URL', ''),
+                            'current_year': timezone.now().year,
+                        }
+                    )
+                    if email_sent:
+                        claimed.update(email_sent_at=timezone.now())
+                delivered = email_sent
+            if reminder.reminder_type in ('SMS', 'Both') and reminder.notification_sent_at is None:
+                # No SMS gateway is configured, fall back to an in-app notification
+                with transaction.atomic():
+                    notification = send_notification(
+                        patient_user.id,
+                        'Appointment Reminder',
+                        f'Reminder: your appointment with {appointment.doctor.full_name} is on '
+                        f'{appointment.appointment_date:%B %d, %Y} at {appointment.start_time:%I:%M %p}.',
+                        notification_type='reminder',
+                        related_entity='appointments',
+                        related_id=appointment.id
+                    )
+                    if notification is not None:
+                        claimed.update(notification_sent_at=timezone.now())
+                delivered = delivered and notification is not None
+            (sent if delivered else failed).append(reminder)
+
+        now = timezone.now()
+        if sent:
+            _still_claimed(sent).update(is_sent=True, sent_at=now, claimed_by=None, locked_until=None)
+        if failed:
+            # The lock doubles as the retry delay, so other dispatchers wait for it too
+            _still_claimed(failed).update(attempts=F('attempts') + 1, claimed_by=None,
+                                          locked_until=now + self.retry_delay)
+        retry = []
+        for reminder in failed:
+            if reminder.attempts + 1 >= _max_attempts():
+                logger.error(f"Giving up on reminder {reminder.id} after {reminder.attempts + 1} attempts")
+            else:
+                retry.append(reminder.id)
+        return retry
+
+    def seconds_until_next(self):
+        now = timezone.now()
+        wake_at = self.loaded_until
+        if self.channel_layer is None and self.next_poll < wake_at:
+            wake_at = self.next_poll
+        if self.heap and self.heap[0][0] < wake_at:
+            wake_at = self.heap[0][0]
+        return max((wake_at - now).total_seconds(), 0)
+
+    async def wait_for_announcements(self, timeout):
+        """Sleep up to ``timeout`` seconds, queueing reminders announced meanwhile."""
+        if self.channel_layer is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            message = await asyncio.wait_for(self.channel_layer.receive(self.channel_name), timeout)
+        except asyncio.TimeoutError:
+            return
+        if message.get('type') == 'reminder.saved':
+            self.push(message['reminder_id'], datetime.fromisoformat(message['reminder_time']))
+
+    async def run(self, stop_event=None):
+        """Dispatch reminders until ``stop_event`` is set."""
+        if self.channel_layer is not None:
+            self.channel_name = await self.channel_layer.new_channel()
+            await self.channel_layer.group_add(REMINDER_GROUP, self.channel_name)
+        try:
+            while stop_event is None or not stop_event.is_set():
+                now = timezone.now()
+                if (self.loaded_until is None or now >= self.loaded_until
+                        or (self.channel_layer is None and now >= self.next_poll)):
+                    await sync_to_async(self.load_window)()
+
+                due = self.pop_due()
+                if due:
+                    failed = await sync_to_async(self.send_batch)(due)
+                    self.requeue_failed(due, failed)
+                    logger.info(f"Sent {len(due) - len(failed)} appointment reminders, {len(failed)} failed")
+                    continue
+
+                await self.wait_for_announcements(self.seconds_until_next())
+        finally:
+            if self.channel_layer is not None:
+                await self.channel_layer.group_discard(REMINDER_GROUP, self.channel_name)
+
+
+def announce_reminder(reminder):
+    """Hand a new or moved reminder to running dispatchers."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(REMINDER_GROUP, {
+            'type': 'reminder.saved',
+            'reminder_id': reminder.id,
+            'reminder_time': reminder.reminder_time.isoformat(),
+        })
+    except Exception as e:
+        logger.error(f"Failed to announce reminder {reminder.id}: {str(e)}")
@@ -0,0 +1,269 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from medicalpro.appointments.booking import _coerce_date, _coerce_id, _coerce_time, lock_doctor_days
+from medicalpro.appointments.calendar_tiles import refresh_days
+from medicalpro.appointments.conflicts import DoctorDayIndex, conflict_index
+from medicalpro.appointments.holds import held_intervals
+from medicalpro.appointments.models import Appointment, AppointmentReminder
+from medicalpro.appointments.permissions import manages_appointments
+from medicalpro.appointments.reminders import announce_reminder
+from medicalpro.appointments.rollups import UNCOUNTED_STATUSES, apply_deltas, appointment_deltas
+from medicalpro.appointments.search import index_appointments
+from medicalpro.core.lookups import appointment_statuses, roles
+from medicalpro.doctors.availability import check_availability
+
+RESCHEDULED_FIELDS = ['appointment_date', 'start_time', 'end_time', 'notes', 'updated_at']
+
+
+def _coerce_move(move):
+    """Normalize one requested move, raising TypeError or ValueError on malformed input."""
+    if not isinstance(move, dict):
+        raise TypeError('Each move must be an object.')
+    values = {
+        'appointment_id': _coerce_id(move, 'appointment'),
+        'appointment_date': _coerce_date(move['appointment_date']),
+        'start_time': _coerce_time(move['start_time'], 'start_time'),
+        'end_time': _coerce_time(move['end_time'], 'end_time'),
+    }
+    if values['start_time'] >= values['end_time']:
+        raise ValueError('Start time must be before end time.')
+    return values
+
+
+def _check_found(targets, found):
+    missing = [pk for pk in targets if pk not in found]
+    if missing:
+        raise ValidationError({str(pk): 'Appointment not found.' for pk in missing})
+
+
+def _check_final_state(appointments, targets, held):
+    """
+    Validate the layout the doctor-days would have once every move is applied.
+
+    Moved appointments are checked against the weekly schedule, time off and
+    the appointments that stay in place, exactly like ``RescheduleAppointment``,
+    then against the slots other users hold and against each other at their
+    new positions. Their current positions are ignored, which is what lets two
+    appointments trade slots.
+
+    Returns:
+        dict: Error message per appointment id, empty when the moves are valid
+    """
+    errors = {}
+    moved_ids = list(targets)
+    candidates = [
+        (appointments[pk].doctor_id, target['appointment_date'], target['start_time'], target['end_time'])
+        for pk, target in targets.items()
+    ]
+    for pk, available in zip(moved_ids, check_availability(candidates, exclude_ids=moved_ids)):
+        if not available:
+            errors[pk] = 'The new time is outside the schedule or overlaps time off or another appointment.'
+
+    for pk, target in targets.items():
+        if any(start_time < target['end_time'] and end_time > target['start_time']
+               for start_time, end_time in held.get((appointments[pk].doctor_id, target['appointment_date']), ())):
+            errors.setdefault(pk, 'The new time is temporarily held by another user.')
+
+    uncounted = set(appointment_statuses.ids(UNCOUNTED_STATUSES))
+    days = defaultdict(lambda: DoctorDayIndex([], 0))
+    for pk, target in targets.items():
+        if appointments[pk].status_id in uncounted:
+            continue
+        index = days[(appointments[pk].doctor_id, target['appointment_date'])]
+        other = index.conflicts(target['start_time'], target['end_time'])
+        if other is not None:
+            errors.setdefault(pk, f'The new time overlaps appointment {other}, which is also being moved.')
+        index.add(pk, target['start_time'], target['end_time'])
+    return errors
+
+
+def _shift_reminders(appointments, starts):
+    """
+    Move the unsent reminders of rescheduled appointments by as much as the appointments moved.
+
+    ``starts`` maps appointment ids to their start before the move.
+
+    Returns:
+        list: The moved reminders, to announce once the transaction commits
+    """
+    reminders = list(AppointmentReminder.objects.filter(appointment_id__in=starts, is_sent=False))
+    for reminder in reminders:
+        appointment = appointments[reminder.appointment_id]
+        moved_by = datetime.combine(appointment.appointment_date, appointment.start_time) - starts[appointment.id]
+        reminder.reminder_time += moved_by
+    AppointmentReminder.objects.bulk_update(reminders, ['reminder_time'])
+    return reminders
+
+
+def _rescheduled_message(appointments):
+    if len(appointments) == 1:
+        appointment = appointments[0]
+        return (f'Your appointment has been rescheduled to {appointment.appointment_date:%B %d, %Y} '
+                f'at {appointment.start_time:%I:%M %p}')
+    lines = [f'{len(appointments)} of your appointments have been rescheduled:']
+    lines.extend(
+        f'- {appointment.appointment_date:%B %d, %Y} at {appointment.start_time:%I:%M %p}'
+        for appointment in sorted(appointments, key=lambda a: (a.appointment_date, a.start_time))
+    )
+    return '\n'.join(lines)
+
+
+def notify_rescheduled(appointments):
+    """Send one notification per affected patient or doctor, however many of their appointments moved."""
+    from medicalpro.core.utils import send_notifications_bulk
+
+    by_user = defaultdict(list)
+    for appointment in appointments:
+        by_user[appointment.patient.user_id].append(appointment)
+        by_user[appointment.doctor.user_id].append(appointment)
+    return send_notifications_bulk(
+        {
+            'user_id': user_id,
+            'title': 'Appointment Rescheduled' if len(moved) == 1 else 'Appointments Rescheduled',
+            'message': _rescheduled_message(moved),
+            'notification_type': 'appointment',
+            'related_entity': 'appointments',
+            'related_id': moved[0].id if len(moved) == 1 else None,
+        }
+        for user_id, moved in by_user.items()
+    )
+
+
+def reschedule_appointments(moves, rescheduled_by, reason=None):
+    """
+    Move one or more appointments to new dates and times in a single transaction.
+
+    Only the final state is validated, so appointments may swap slots or a
+    whole day may shift in one call. Either every move is applied or none is.
+    The locks of every old and new doctor-day are held while validating and
+    writing, unsent reminders move along with their appointments, and
+    patients and doctors get one coalesced notification each once the
+    transaction commits. Staff may move any appointment, other users only
+    those they are the patient or the doctor of.
+
+    Args:
+        moves (list): Dicts with ``appointment`` (id), ``appointment_date``,
+            ``start_time`` and ``end_time``. The doctor never changes.
+        rescheduled_by (User): The user moving the appointments
+        reason (str, optional): Reason appended to each appointment's notes
+
+    Returns:
+        list: The rescheduled appointments
+
+    Raises:
+        ValidationError: With one message per rejected appointment id
+        PermissionDenied: If the user may not move one of the appointments
+    """
+    try:
+        targets = {}
+        for move in moves:
+            values = _coerce_move(move)
+            pk = values.pop('appointment_id')
+            if pk in targets:
+                raise ValidationError({str(pk): 'Appointment listed more than once.'})
+            targets[pk] = values
+    except KeyError as e:
+        raise ValidationError(f'Missing field: {e.args[0]}')
+    except (TypeError, ValueError) as e:
+        raise ValidationError(str(e))
+    if not targets:
+        return []
+
+    current, participants = {}, {}
+    for pk, doctor_id, appointment_date, patient_user_id, doctor_user_id in Appointment.objects.filter(
+        id__in=targets
+    ).values_list('id', 'doctor_id', 'appointment_date', 'patient__user_id', 'doctor__user_id'):
+        current[pk] = (doctor_id, appointment_date)
+        participants[pk] = (patient_user_id, doctor_user_id)
+    _check_found(targets, current)
+    if not manages_appointments(rescheduled_by) and any(
+            rescheduled_by.id not in users for users in participants.values()):
+        raise PermissionDenied('You may only reschedule your own appointments.')
+    old_days = set(current.values())
+    new_days = {(current[pk][0], target['appointment_date']) for pk, target in targets.items()}
+
+    with lock_doctor_days(old_days | new_days):
+        appointments = Appointment.objects.select_related('patient', 'doctor').in_bulk(list(targets))
+        # An appointment may have been deleted before the locks were taken
+        _check_found(targets, appointments)
+        if any((a.doctor_id, a.appointment_date) not in old_days for a in appointments.values()):
+            raise ValidationError('Some appointments were moved concurrently, please retry.')
+
+        # Slots other users hold on the booking page count as taken, as for new bookings
+        held = held_intervals(new_days, exclude_user_id=rescheduled_by.id)
+        errors = _check_final_state(appointments, targets, held)
+        if errors:
+            raise ValidationError({str(pk): message for pk, message in errors.items()})
+
+        role = roles.name_for(rescheduled_by.role_id) if rescheduled_by.role_id else 'User'
+        note = f'\nRescheduled by {role}. Reason: {reason or ""}'
+        now = timezone.now()
+        deltas = Counter()
+        moved = []
+        starts = {}
+        for pk, target in targets.items():
+            appointment = appointments[pk]
+            starts[pk] = datetime.combine(appointment.appointment_date, appointment.start_time)
+            deltas.update(appointment_deltas(appointment.doctor_id, appointment.patient_id,
+                                             appointment.appointment_date, appointment.status_id, -1))
+            appointment.appointment_date = target['appointment_date']
+            appointment.start_time = target['start_time']
+            appointment.end_time = target['end_time']
+            appointment.notes = (appointment.notes or '') + note
+            appointment.updated_at = now
+            deltas.update(appointment_deltas(appointment.doctor_id, appointment.patient_id,
+                                             appointment.appointment_date, appointment.status_id, 1))
+            moved.append(appointment)
+
+        # bulk_update skips save(), whose clean() would reject the intermediate states of a swap,
+        # and its signals, so the rollups, indexes and reminder announcements are handled here
+        Appointment.objects.bulk_update(moved, RESCHEDULED_FIELDS)
+        apply_deltas(deltas)
+        reminders = _shift_reminders(appointments, starts)
+
+        touched = old_days | new_days
+        moved_ids = list(targets)
+        transaction.on_commit(lambda: conflict_index.invalidate_many(touched))
+        transaction.on_commit(lambda: index_appointments(moved_ids))
+        for doctor_id, day in touched:
+            transaction.on_commit(lambda doctor_id=doctor_id, day=day: refresh_days(doctor_id, [day]))
+        transaction.on_commit(lambda: notify_rescheduled(moved))
+        for reminder in reminders:
+            transaction.on_commit(lambda reminder=reminder: announce_reminder(reminder))
+
+    for appointment in moved:
+        # Later saves must diff against the new values
+        appointment._origin = (appointment.doctor_id, appointment.patient_id,
+                               appointment.appointment_date, appointment.status_id)
+        appointment._search_origin = (appointment.patient_id, appointment.doctor_id,
+                                      appointment.reason, appointment.notes)
+    return moved
+
+
+def swap_appointments(first_id, second_id, rescheduled_by, reason=None):
+    """Exchange the dates and times of two appointments of the same doctor."""
+    first, second = (Appointment.objects.get(id=first_id), Appointment.objects.get(id=second_id))
+    return reschedule_appointments([
+        {'appointment': first.id, 'appointment_date': second.appointment_date,
+         'start_time': second.start_time, 'end_time': second.end_time},
+        {'appointment': second.id, 'appointment_date': first.appointment_date,
+         'start_time': first.start_time, 'end_time': first.end_time},
+    ], rescheduled_by, reason)
+
+
+def move_doctor_day(doctor_id, from_date, to_date, rescheduled_by, reason=None):
+    """Move every appointment a doctor has on ``from_date`` to the same times on ``to_date``."""
+    rows = Appointment.objects.filter(
+        doctor_id=doctor_id, appointment_date=from_date
+    ).exclude(
+        status_id__in=appointment_statuses.ids(UNCOUNTED_STATUSES)
+    ).values_list('id', 'start_time', 'end_time')
+    return reschedule_appointments([
+        {'appointment': pk, 'appointment_date': to_date, 'start_time': start_time, 'end_time': end_time}
+        for pk, start_time, end_time in rows
+    ], rescheduled_by, reason)
@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from medicalpro.appointments.models import Appointment, DoctorAppointmentRollup, PatientAppointmentRollup
+from medicalpro.core.lookups import appointment_statuses
+
+# Statuses left out of appointment counts, as in CountDoctorAppointments()
+UNCOUNTED_STATUSES = ('Cancelled', 'Declined', 'No-show')
+
+ROLLUPS = {
+    'doctor': (DoctorAppointmentRollup, 'doctor_id'),
+    'patient': (PatientAppointmentRollup, 'patient_id'),
+}
+
+# Keys of one kind above which deltas are applied in batched statements
+BATCH_DELTAS_THRESHOLD = 8
+
+# Rollup rows per batched statement, below the SQLite parameter limit
+DELTA_CHUNK_SIZE = 500
+
+
+def appointment_deltas(doctor_id, patient_id, date, status_id, delta):
+    """Rollup changes caused by adding (``delta=1``) or removing (``-1``) one appointment."""
+    return Counter({
+        ('doctor', doctor_id, date, status_id): delta,
+        ('patient', patient_id, date, status_id): delta,
+    })
+
+
+def apply_deltas(deltas):
+    """
+    Add ``deltas`` to the rollup rows, creating missing rows.
+
+    Each key is ``(kind, subject_id, date, status_id)`` where ``kind`` is
+    ``'doctor'`` or ``'patient'``. Counts are changed with ``F()`` updates so
+    concurrent writers never overwrite each other. A few keys, as written by
+    one ``save()``, take one UPDATE each; larger sets, as written by bulk
+    booking, go through ``_apply_batched``.
+    """
+    by_kind = defaultdict(dict)
+    for (kind, subject_id, date, status_id), delta in deltas.items():
+        if delta and None not in (subject_id, date, status_id):
+            by_kind[kind][(subject_id, date, status_id)] = delta
+
+    for kind, kind_deltas in by_kind.items():
+        model, subject_field = ROLLUPS[kind]
+        if len(kind_deltas) > BATCH_DELTAS_THRESHOLD:
+            # Sorted so each chunk covers few subjects and dates
+            keys = sorted(kind_deltas)
+            for start in range(0, len(keys), DELTA_CHUNK_SIZE):
+                _apply_batched(model, subject_field, {key: kind_deltas[key]
+                                                      for key in keys[start:start + DELTA_CHUNK_SIZE]})
+            continue
+        for (subject_id, date, status_id), delta in kind_deltas.items():
+            lookup = {subject_field: subject_id, 'date': date, 'status_id': status_id}
+            if model.objects.filter(**lookup).update(count=F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    model.objects.create(count=delta, **lookup)
+            except IntegrityError:
+                # Created concurrently, apply the delta to that row
+                model.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def _apply_batched(model, subject_field, deltas):
+    """
+    Apply ``{(subject_id, date, status_id): delta}`` to one rollup table in a few statements.
+
+    Missing rows are inserted with a zero count, ignoring the ones that
+    already exist or are created concurrently, then the rows are read back
+    with one query and updated with one ``F()`` UPDATE per distinct delta.
+    """
+    model.objects.bulk_create(
+        [model(**{subject_field: subject_id}, date=date, status_id=status_id, count=0)
+         for subject_id, date, status_id in deltas],
+        ignore_conflicts=True
+    )
+    # Filtering on each column separately over-selects, the exact keys are matched below
+    rows = model.objects.filter(**{
+        f'{subject_field}__in': {subject_id for subject_id, date, status_id in deltas},
+        'date__in': {date for subject_id, date, status_id in deltas},
+        'status_id__in': {status_id for subject_id, date, status_id in deltas},
+    }).values_list('id', subject_field, 'date', 'status_id')
+    ids_by_delta = defaultdict(list)
+    for pk, subject_id, date, status_id in rows:
+        delta = deltas.get((subject_id, date, status_id))
+        if delta:
+            ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(id__in=ids).update(count=F('count') + delta)
+
+
+def backfill_rollups(start_date=None, end_date=None, chunk_size=1000):
+    """
+    Recompute the rollup rows of a date range from the appointments table.
+
+    Appointments written while the backfill runs may be counted twice or
+    missed, so run it when bookings are quiet.
+
+    Returns:
+        dict: Number of rollup rows written per kind
+    """
+    appointments = Appointment.objects.all()
+    if start_date:
+        appointments = appointments.filter(appointment_date__gte=start_date)
+    if end_date:
+        appointments = appointments.filter(appointment_date__lte=end_date)
+
+    written = {}
+    for kind, (model, subject_field) in ROLLUPS.items():
+        rows = model.objects.all()
+        if start_date:
+            rows = rows.filter(date__gte=start_date)
+        if end_date:
+            rows = rows.filter(date__lte=end_date)
+
+        totals = appointments.order_by().values(subject_field, 'appointment_date', 'status_id').annotate(
+            total=Count('id')
+        )
+        with transaction.atomic():
+            rows.delete()
+            model.objects.bulk_create(
+                (model(**{subject_field: row[subject_field]}, date=row['appointment_date'],
+                       status_id=row['status_id'], count=row['total'])
+                 for row in totals.iterator(chunk_size=chunk_size)),
+                batch_size=chunk_size
+            )
+        written[kind] = rows.count()
+    return written
+
+
+def appointment_analytics(kind, subject_id, start_date, end_date):
+    """
+    Appointment counts of a doctor or patient over a date range, read from the rollups.
+
+    Returns:
+        dict: ``total`` (excluding cancelled, declined and no-show, like the
+            SQL Count*Appointments functions), ``by_status`` and a ``daily`` series
+    """
+    model, subject_field = ROLLUPS[kind]
+    rows = model.objects.filter(**{subject_field: subject_id}, date__range=(start_date, end_date))
+
+    by_status = Counter()
+    daily = Counter()
+    uncounted = set(appointment_statuses.ids(UNCOUNTED_STATUSES))
+    total = 0
+    for date, status_id, count in rows.values_list('date', 'status_id', 'count'):
+        if not count:
+            continue
+        by_status[appointment_statuses.name_for(status_id)] += count
+        if status_id not in uncounted:
+            daily[date] += count
+            total += count
+
+    return {
+        'total': total,
+        'by_status': dict(by_status),
+        'daily': [{'date': date.isoformat(), 'count': daily[date]} for date in sorted(daily)],
+    }
+
+
+def count_appointments(kind, subject_id, start_date, end_date):
+    """Python equivalent of CountDoctorAppointments / CountPatientAppointments."""
+    model, subject_field = ROLLUPS[kind]
+    return model.objects.filter(
+        **{subject_field: subject_id}, date__range=(start_date, end_date)
+    ).exclude(status_id__in=appointment_statuses.ids(UNCOUNTED_STATUSES)).aggregate(
+        total=Sum('count')
+    )['total'] or 0
@@ -0,0 +1,181 @@
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+
+from medicalpro.appointments.models import Appointment, AppointmentSearchTerm
+from medicalpro.appointments.permissions import manages_appointments, participant_filter
+
+# Relative weight of a term depending on where it was found
+FIELD_WEIGHTS = {
+    'patient_name': 3,
+    'doctor_name': 3,
+    'reason': 2,
+    'notes': 1,
+}
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = AppointmentSearchTerm._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 8
+
+# Appointments ranked at most per query; above it, only the newest appointments are searched
+MAX_SEARCH_CANDIDATES = 2000
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Select the names indexed with each appointment in one query
+INDEX_RELATED = ('patient__user__profile', 'doctor__user__profile')
+
+
+def tokenize(text):
+    """Split text into lowercase, accent-free terms."""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text) if len(token) >= MIN_TERM_LENGTH]
+
+
+def _profile_name(user):
+    try:
+        return f"{user.profile.first_name} {user.profile.last_name}"
+    except Exception:
+        return ''
+
+
+def appointment_terms(appointment):
+    """Return the weighted terms of an appointment, as a ``{term: weight}`` dict."""
+    fields = {
+        'patient_name': _profile_name(appointment.patient.user),
+        'doctor_name': _profile_name(appointment.doctor.user),
+        'reason': appointment.reason,
+        'notes': appointment.notes,
+    }
+    weights = Counter()
+    for field, text in fields.items():
+        for term in tokenize(text):
+            weights[term] += FIELD_WEIGHTS[field]
+    return weights
+
+
+def _terms_for(appointments):
+    return [
+        AppointmentSearchTerm(appointment_id=appointment.id, term=term, weight=min(weight, 32767))
+        for appointment in appointments
+        for term, weight in appointment_terms(appointment).items()
+    ]
+
+
+def index_appointments(appointment_ids):
+    """Replace the index entries of the given appointments."""
+    appointment_ids = list(appointment_ids)
+    appointments = Appointment.objects.filter(id__in=appointment_ids).select_related(*INDEX_RELATED)
+    with transaction.atomic():
+        AppointmentSearchTerm.objects.filter(appointment_id__in=appointment_ids).delete()
+        AppointmentSearchTerm.objects.bulk_create(_terms_for(appointments), batch_size=1000)
+
+
+def rebuild_index(chunk_size=1000):
+    """
+    Rebuild the whole search index in one transaction.
+
+    Searches keep reading the old index until the new one is committed.
+    Appointments are read ``chunk_size`` at a time to bound memory.
+
+    Returns:
+        int: Number of appointments indexed
+    """
+    indexed = 0
+    last_id = 0
+    with transaction.atomic():
+        AppointmentSearchTerm.objects.all().delete()
+        while True:
+            chunk = list(Appointment.objects.filter(id__gt=last_id).order_by('id').select_related(
+                *INDEX_RELATED
+            )[:chunk_size])
+            if not chunk:
+                return indexed
+            AppointmentSearchTerm.objects.bulk_create(_terms_for(chunk), batch_size=chunk_size)
+            indexed += len(chunk)
+            last_id = chunk[-1].id
+
+
+def _prefix_q(token):
+    # A range instead of LIKE 'token%' so every backend can use the term index
+    return Q(term__gte=token, term__lt=token + '\uffff')
+
+
+def _any_prefix_q(tokens):
+    condition = Q()
+    for token in tokens:
+        condition |= _prefix_q(token)
+    return condition
+
+
+def _matches(condition):
+    """Number of index entries matching ``condition``, counted up to ``MAX_SEARCH_CANDIDATES + 1``."""
+    return AppointmentSearchTerm.objects.filter(condition)[:MAX_SEARCH_CANDIDATES + 1].count()
+
+
+def _candidate_filter(tokens):
+    """
+    Q restricting the ranking when the query matches too many index entries, or None to rank every match.
+
+    Every result must match every token, so ranking only the matches of the
+    rarest token loses nothing while it has at most ``MAX_SEARCH_CANDIDATES``
+    entries. When even the rarest token is that common, only the newest
+    ``MAX_SEARCH_CANDIDATES`` appointments are ranked. The counts stop past
+    that limit, so the checks stay cheap.
+    """
+    if _matches(_any_prefix_q(tokens)) <= MAX_SEARCH_CANDIDATES:
+        return None
+    counts = {token: _matches(_prefix_q(token)) for token in tokens}
+    rarest = min(tokens, key=counts.get)
+    if counts[rarest] <= MAX_SEARCH_CANDIDATES:
+        return Q(appointment_id__in=list(AppointmentSearchTerm.objects.filter(_prefix_q(rarest)).values_list(
+            'appointment_id', flat=True
+        ).distinct()))
+    oldest = Appointment.objects.order_by('-id').values_list('id', flat=True)[MAX_SEARCH_CANDIDATES - 1:].first()
+    return Q(appointment_id__gte=oldest) if oldest is not None else None
+
+
+def search_appointments(query, limit=20, offset=0, user=None):
+    """
+    Ranked prefix search over appointment text and participant names.
+
+    Every query term must match the prefix of an indexed term; results are
+    ordered by the summed weights of the matching terms, newest first on ties.
+    With ``user``, only appointments they may see are searched. Searches over
+    every appointment made only of very common terms rank the newest
+    ``MAX_SEARCH_CANDIDATES`` appointments instead of all of them (see
+    ``_candidate_filter``); searches of one user's appointments are already
+    bounded by them.
+
+    Returns:
+        list: ``(appointment_id, score)`` tuples
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return []
+
+    matches = {
+        f'match_{i}': Max(Case(When(_prefix_q(token), then=Value(1)), default=Value(0),
+                               output_field=IntegerField()))
+        for i, token in enumerate(tokens)
+    }
+
+    terms = AppointmentSearchTerm.objects.filter(_any_prefix_q(tokens))
+    if user is not None and not manages_appointments(user):
+        # Joined per matching term rather than as an IN over the user's appointments
+        terms = terms.filter(participant_filter(user, prefix='appointment__'))
+    else:
+        candidates = _candidate_filter(tokens)
+        if candidates is not None:
+            terms = terms.filter(candidates)
+
+    rows = terms.values('appointment_id').annotate(
+        score=Sum('weight'), **matches
+    ).filter(**{name: 1 for name in matches}).order_by('-score', '-appointment_id')
+    return [(row['appointment_id'], row['score']) for row in rows[offset:offset + limit]]
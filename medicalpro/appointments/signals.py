@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from medicalpro.appointments.calendar_tiles import refresh_days, unavailability_days
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES, conflict_index
+from medicalpro.appointments.holds import release_user_holds
+from medicalpro.appointments.models import Appointment, AppointmentReminder, CancellationReason, WaitingList
+from medicalpro.appointments.reminders import announce_reminder
+from medicalpro.appointments.rollups import apply_deltas, appointment_deltas
+from medicalpro.appointments.search import index_appointments
+from medicalpro.appointments.waiting_list import handle_cancellation, is_waiting_list_paused, waiting_index
+from medicalpro.accounts.models import UserProfile
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import DoctorUnavailability
+
+
+@receiver(post_save, sender=Appointment)
+def update_conflict_index(sender, instance, **kwargs):
+    """Keep the in-memory conflict index in sync once the write is committed."""
+    pk = instance.pk
+    doctor_id = instance.doctor_id
+    date = instance.appointment_date
+    start, end = instance.start_time, instance.end_time
+    is_active = appointment_statuses.name_for(instance.status_id) in ACTIVE_STATUSES
+    transaction.on_commit(
+        lambda: conflict_index.record(pk, doctor_id, date, start, end, is_active)
+    )
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_from_conflict_index(sender, instance, **kwargs):
+    pk = instance.pk
+    doctor_id = instance.doctor_id
+    date = instance.appointment_date
+    transaction.on_commit(lambda: conflict_index.forget(pk, doctor_id, date))
+
+
+@receiver(post_save, sender=Appointment)
+def release_booked_holds(sender, instance, created, **kwargs):
+    """A hold has done its job once its owner booked the slot."""
+    if created:
+        args = (instance.doctor_id, instance.appointment_date, instance.start_time, instance.end_time,
+                instance.created_by_id)
+        transaction.on_commit(lambda: release_user_holds(*args))
+
+
+@receiver(post_save, sender=CancellationReason)
+def match_waiting_list(sender, instance, created, **kwargs):
+    """Offer the freed slot to the waiting list once the cancellation is committed."""
+    if created and not is_waiting_list_paused():
+        appointment_id = instance.appointment_id
+        transaction.on_commit(lambda: handle_cancellation(appointment_id))
+
+
+@receiver(post_save, sender=WaitingList)
+@receiver(post_delete, sender=WaitingList)
+def refresh_waiting_index(sender, instance, **kwargs):
+    doctor_id = instance.doctor_id
+    transaction.on_commit(lambda: waiting_index.invalidate(doctor_id))
+
+
+def _appointment_state(instance):
+    # Read from __dict__ so deferred fields are never loaded just for bookkeeping
+    values = instance.__dict__
+    return (values.get('doctor_id'), values.get('patient_id'),
+            values.get('appointment_date'), values.get('status_id'))
+
+
+def _search_state(instance):
+    values = instance.__dict__
+    return (values.get('patient_id'), values.get('doctor_id'), values.get('reason'), values.get('notes'))
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_origin(sender, instance, **kwargs):
+    # Lets handlers undo the stored values when an appointment is moved or changes status
+    instance._origin = _appointment_state(instance) if instance.pk else None
+    instance._search_origin = _search_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_appointment_calendar(sender, instance, **kwargs):
+    """Rebuild the calendar cells touched by an appointment change."""
+    affected = {(instance.doctor_id, instance.appointment_date)}
+    if instance._origin:
+        affected.add((instance._origin[0], instance._origin[2]))
+    for doctor_id, day in affected:
+        if doctor_id is not None and day is not None:
+            transaction.on_commit(lambda doctor_id=doctor_id, day=day: refresh_days(doctor_id, [day]))
+
+
+@receiver(post_save, sender=Appointment)
+def update_appointment_rollups(sender, instance, **kwargs):
+    """Move the appointment between daily rollup rows in the same transaction."""
+    state = _appointment_state(instance)
+    if state == instance._origin:
+        return
+    deltas = appointment_deltas(*state, 1)
+    if instance._origin:
+        deltas.update(appointment_deltas(*instance._origin, -1))
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_from_appointment_rollups(sender, instance, **kwargs):
+    apply_deltas(appointment_deltas(*(instance._origin or _appointment_state(instance)), -1))
+
+
+@receiver(post_save, sender=Appointment)
+def update_search_index(sender, instance, **kwargs):
+    """Reindex an appointment whose text or participants changed."""
+    if _search_state(instance) != instance._search_origin:
+        pk = instance.pk
+        transaction.on_commit(lambda: index_appointments([pk]))
+
+
+@receiver(post_save, sender=UserProfile)
+def reindex_participant_appointments(sender, instance, created, **kwargs):
+    """Names are indexed with each appointment, so reindex them when a profile changes."""
+    if created:
+        return
+    user_id = instance.user_id
+
+    def reindex():
+        appointment_ids = list(Appointment.objects.filter(
+            Q(patient__user_id=user_id) | Q(doctor__user_id=user_id)
+        ).values_list('id', flat=True))
+        for start in range(0, len(appointment_ids), 1000):
+            index_appointments(appointment_ids[start:start + 1000])
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_name(sender, instance, **kwargs):
+    values = instance.__dict__
+    instance._name_origin = (values.get('first_name'), values.get('last_name'))
+
+
+@receiver(post_save, sender=UserProfile)
+def touch_participant_appointments(sender, instance, created, **kwargs):
+    """
+    Calendar events show the participants' names, so renaming someone
+    modifies their appointments' events. Touching ``updated_at`` keeps the
+    feeds' validators and each event's LAST-MODIFIED right without feeds
+    joining the profiles.
+    """
+    name = (instance.first_name, instance.last_name)
+    if created or name == instance._name_origin:
+        return
+    instance._name_origin = name
+    Appointment.objects.filter(
+        Q(patient__user_id=instance.user_id) | Q(doctor__user_id=instance.user_id)
+    ).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Appointment)
+def reset_appointment_origin(sender, instance, **kwargs):
+    # Registered last so every handler above sees the values loaded from the database
+    instance._origin = _appointment_state(instance)
+    instance._search_origin = _search_state(instance)
+
+
+@receiver(post_init, sender=DoctorUnavailability)
+def remember_unavailability_period(sender, instance, **kwargs):
+    values = instance.__dict__
+    instance._calendar_origin = (values.get('doctor_id'), values.get('start_datetime'), values.get('end_datetime'))
+
+
+@receiver(post_save, sender=DoctorUnavailability)
+@receiver(post_delete, sender=DoctorUnavailability)
+def refresh_unavailability_calendar(sender, instance, **kwargs):
+    """Rebuild the calendar cells covered by the old and new unavailability periods."""
+    periods = {(instance.doctor_id, instance.start_datetime, instance.end_datetime), instance._calendar_origin}
+    instance._calendar_origin = (instance.doctor_id, instance.start_datetime, instance.end_datetime)
+    for doctor_id, start_datetime, end_datetime in periods:
+        if doctor_id is not None and start_datetime and end_datetime:
+            days = unavailability_days(start_datetime, end_datetime)
+            transaction.on_commit(lambda doctor_id=doctor_id, days=days: refresh_days(doctor_id, days))
+
+
+@receiver(post_save, sender=AppointmentReminder)
+def queue_reminder(sender, instance, created, **kwargs):
+    """Hand new and edited reminders to the running dispatcher instead of having it poll."""
+    if not instance.is_sent:
+        transaction.on_commit(lambda: announce_reminder(instance))
@@ -0,0 +1,193 @@
+import random
+import threading
+from datetime import date, time
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.accounts.models import Permission, RolePermission
+from medicalpro.appointments.booking import book_requested_appointment, bulk_book_appointments
+from medicalpro.appointments.models import Appointment
+from medicalpro.appointments.views import AppointmentCreateView, BulkAppointmentCreateView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+def receptionist():
+    user = create_user(role='receptionist')
+    permission = Permission.objects.get_or_create(name='manage_appointments')[0]
+    RolePermission.objects.get_or_create(role=user.role, permission=permission)
+    return user
+
+
+class BulkBookingTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+        self.staff = receptionist()
+
+    def row(self, start, end, **fields):
+        return dict({'patient': self.patient.id, 'doctor': self.doctor.id, 'appointment_date': DAY.isoformat(),
+                     'start_time': start, 'end_time': end}, **fields)
+
+    def test_rows_are_checked_against_the_table_and_the_batch(self):
+        create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+        results = bulk_book_appointments([
+            self.row('09:15', '09:45'),
+            self.row('10:00', '10:30'),
+            self.row('10:15', '10:45'),
+            self.row('10:30', '11:00'),
+        ], self.staff)
+        self.assertEqual([result['accepted'] for result in results], [False, True, False, True])
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 3)
+
+    def test_malformed_rows_are_rejected_one_by_one(self):
+        results = bulk_book_appointments([
+            self.row('09:00', '09:30', appointment_date=20300107),
+            self.row(['09:00'], '09:30'),
+            self.row('09:00', 930),
+            self.row('09:00', '09:30', patient=True),
+            self.row('09:00', '09:30', reason={'text': 'x'}),
+            self.row('09:30', '09:00'),
+            'not an object',
+            {'doctor': self.doctor.id},
+            self.row('23:30', '24:00'),
+        ], self.staff)
+        self.assertEqual([result['accepted'] for result in results], [False] * 8 + [True])
+        self.assertEqual(results[7]['error'], 'Missing field: patient')
+        self.assertEqual(Appointment.objects.get().end_time, time.max)
+
+    def test_only_booking_statuses_are_accepted(self):
+        with self.assertRaises(ValueError):
+            bulk_book_appointments([self.row('09:00', '09:30')], self.staff, status_name='Completed')
+        bulk_book_appointments([self.row('09:00', '09:30')], self.staff, status_name='Confirmed')
+        self.assertEqual(Appointment.objects.get().status.name, 'Confirmed')
+
+    def test_patients_only_book_for_themselves(self):
+        other = create_patient()
+        results = bulk_book_appointments([
+            self.row('09:00', '09:30'),
+            self.row('10:00', '10:30', patient=other.id),
+        ], self.patient.user)
+        self.assertEqual([result['accepted'] for result in results], [True, False])
+        self.assertEqual(results[1]['error'], 'You may only book your own appointments.')
+
+    def test_view(self):
+        request = APIRequestFactory().post('/', {
+            'appointments': [self.row('09:00', '09:30'), self.row('09:00', '09:30')],
+            'status': 'In Progress',
+        }, format='json')
+        force_authenticate(request, user=self.staff)
+        response = BulkAppointmentCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+
+        request = APIRequestFactory().post('/', {
+            'appointments': [self.row('09:00', '09:30'), self.row('09:00', '09:30')],
+        }, format='json')
+        force_authenticate(request, user=self.staff)
+        response = BulkAppointmentCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (1, 1))
+
+    def test_large_batch(self):
+        patients = [self.patient] + [create_patient() for _ in range(3)]
+        doctors = [self.doctor, create_doctor()]
+        rows = [
+            {'patient': patients[number % 4].id, 'doctor': doctors[number % 2].id,
+             'appointment_date': date(2030, 1, 7 + number // 64 % 20).isoformat(),
+             'start_time': f'{8 + number // 2 % 32 // 4:02d}:{number // 2 % 4 * 15:02d}',
+             'end_time': f'{8 + (number // 2 % 32 + 1) // 4:02d}:{(number // 2 % 32 + 1) % 4 * 15:02d}'}
+            for number in range(2000)
+        ]
+        results = bulk_book_appointments(rows, self.staff)
+        self.assertEqual(sum(result['accepted'] for result in results), 1280)
+        self.assertEqual(Appointment.objects.count(), 1280)
+
+
+class AppointmentCreateViewTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+
+    def post(self, user, **fields):
+        request = APIRequestFactory().post('/', dict({
+            'patient': self.patient.id, 'doctor': self.doctor.id, 'appointment_date': DAY.isoformat(),
+            'start_time': '09:00', 'end_time': '09:30',
+        }, **fields), format='json')
+        force_authenticate(request, user=user)
+        return AppointmentCreateView.as_view()(request)
+
+    def test_patient_books_their_own_appointment(self):
+        response = self.post(self.patient.user)
+        self.assertEqual(response.status_code, 201)
+        appointment = Appointment.objects.get(id=response.data['id'])
+        self.assertEqual((appointment.created_by, appointment.status.name), (self.patient.user, 'Scheduled'))
+
+    def test_taken_slots_conflict(self):
+        create_appointment(self.doctor, self.patient, DAY, time(9, 15), time(9, 45))
+        response = self.post(self.patient.user)
+        self.assertEqual(response.status_code, 409)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post(self.patient.user, start_time=None).status_code, 400)
+        self.assertEqual(self.post(self.patient.user, doctor=0).status_code, 400)
+        self.assertEqual(self.post(create_patient().user).status_code, 403)
+        self.assertEqual(self.post(receptionist()).status_code, 201)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Many threads racing for overlapping slots of one doctor-day, each on its own connection."""
+    threads = 8
+    attempts = 15
+
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patients = [create_patient() for _ in range(self.threads)]
+
+    def test_no_double_booking(self):
+        starts = [time(9, minutes) for minutes in range(0, 60, 10)] + [time(10, minutes) for minutes in range(0, 60, 10)]
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def book(patient, seed):
+            rng = random.Random(seed)
+            try:
+                barrier.wait()
+                for _ in range(self.attempts):
+                    start = rng.choice(starts)
+                    end = time(start.hour + (start.minute + 30) // 60, (start.minute + 30) % 60)
+                    try:
+                        book_requested_appointment({
+                            'patient': patient.id, 'doctor': self.doctor.id, 'appointment_date': DAY,
+                            'start_time': start, 'end_time': end,
+                        }, patient.user)
+                        outcomes.append(True)
+                    except ValidationError:
+                        outcomes.append(False)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=book, args=(patient, seed)) for seed, patient in enumerate(self.patients)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(outcomes), self.threads * self.attempts)
+        booked = list(Appointment.objects.filter(doctor=self.doctor, appointment_date=DAY).order_by(
+            'start_time').values_list('start_time', 'end_time'))
+        self.assertEqual(len(booked), outcomes.count(True))
+        self.assertGreater(len(booked), 1)
+        for (first_start, first_end), (second_start, second_end) in zip(booked, booked[1:]):
+            self.assertLessEqual(first_end, second_start)
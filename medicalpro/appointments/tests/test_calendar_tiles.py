@@ -0,0 +1,65 @@
+from datetime import date, time
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.appointments import calendar_tiles
+from medicalpro.appointments.booking import bulk_book_appointments
+from medicalpro.appointments.calendar_tiles import get_month_tile, refresh_days, tile_stats
+from medicalpro.appointments.views import CalendarTileStatsView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+class CalendarTileTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        tile_stats.reset()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+
+    def count(self):
+        tile, etag = get_month_tile(self.doctor.id, DAY.year, DAY.month)
+        return tile['days'][DAY.isoformat()]['count']
+
+    def test_bulk_booking_refreshes_cached_days(self):
+        self.assertEqual(self.count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            results = bulk_book_appointments([{
+                'patient': self.patient.id, 'doctor': self.doctor.id, 'appointment_date': DAY.isoformat(),
+                'start_time': '09:00', 'end_time': '09:30',
+            }], create_user(role='admin', is_staff=True))
+        self.assertTrue(results[0]['accepted'])
+        self.assertEqual(self.count(), 1)
+
+    def test_cells_built_before_a_refresh_are_not_served(self):
+        build_day_cells = calendar_tiles.build_day_cells
+
+        def build_then_commit(doctor_id, days):
+            # Another request books and refreshes while this one still holds pre-commit cells
+            cells = build_day_cells(doctor_id, days)
+            create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+            refresh_days(self.doctor.id, [DAY])
+            return cells
+
+        with mock.patch('medicalpro.appointments.calendar_tiles.build_day_cells', side_effect=build_then_commit):
+            self.assertEqual(self.count(), 0)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(tile_stats.as_dict()['hits'], 61)
+
+    def test_stats_view(self):
+        self.count()
+        self.count()
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=create_user())
+        response = CalendarTileStatsView.as_view()(request)
+        self.assertEqual(response.data['hits'], 31)
+        self.assertEqual(response.data['misses'], 31)
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+        self.assertEqual(response.data['rebuilds'], 1)
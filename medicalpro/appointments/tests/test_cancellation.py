@@ -0,0 +1,38 @@
+from datetime import date, time
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.appointments.views import AppointmentCancelView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+class AppointmentCancelViewTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.patient = create_patient()
+        self.appointment = create_appointment(create_doctor(), self.patient, DAY, time(9), time(9, 30))
+
+    def cancel(self, user, pk=None):
+        request = APIRequestFactory().post('/', {'reason': 'Feeling better'}, format='json')
+        force_authenticate(request, user=user)
+        return AppointmentCancelView.as_view()(request, pk=pk or self.appointment.id)
+
+    def status_name(self):
+        return Appointment.objects.get(id=self.appointment.id).status.name
+
+    def test_other_users_may_not_cancel(self):
+        self.assertEqual(self.cancel(create_patient().user).status_code, 403)
+        self.assertEqual(self.status_name(), 'Scheduled')
+        self.assertEqual(self.cancel(self.patient.user, pk=self.appointment.id + 100).status_code, 404)
+
+    def test_participants_and_staff_cancel(self):
+        self.assertEqual(self.cancel(self.patient.user).status_code, 200)
+        self.assertEqual(self.status_name(), 'Cancelled')
+        self.assertEqual(self.cancel(create_user(role='admin', is_staff=True)).status_code, 409)
@@ -0,0 +1,92 @@
+from datetime import date, time
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from medicalpro.appointments.conflicts import DoctorDayIndex, conflict_index
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+class DoctorDayIndexTests(TestCase):
+    def test_overlaps(self):
+        index = DoctorDayIndex([(1, time(9), time(10)), (2, time(11), time(12))], version=0)
+        self.assertEqual(index.conflicts(time(9, 30), time(10, 30)), 1)
+        self.assertEqual(index.conflicts(time(8), time(13)), 2)
+        self.assertIsNone(index.conflicts(time(10), time(11)))
+        self.assertIsNone(index.conflicts(time(9), time(10), exclude_id=1))
+
+    def test_contained_interval_behind_a_long_one(self):
+        # The long legacy row must still be found behind later, shorter ones
+        index = DoctorDayIndex([(1, time(8), time(16)), (2, time(9), time(9, 30)), (3, time(10), time(10, 30))],
+                               version=0)
+        self.assertEqual(index.conflicts(time(15), time(15, 30)), 1)
+
+    def test_add_and_remove(self):
+        index = DoctorDayIndex([], version=0)
+        index.add(5, time(9), time(10))
+        self.assertEqual(index.conflicts(time(9), time(9, 15)), 5)
+        index.remove(5)
+        self.assertIsNone(index.conflicts(time(9), time(9, 15)))
+
+
+class AppointmentConflictTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+
+    def book(self, start, end, **fields):
+        return create_appointment(self.doctor, self.patient, DAY, start, end, **fields)
+
+    def test_overlapping_booking_is_rejected(self):
+        self.book(time(9), time(9, 30))
+        with self.assertRaises(ValidationError):
+            self.book(time(9, 15), time(9, 45))
+
+    def test_adjacent_and_cancelled_slots_are_free(self):
+        self.book(time(9), time(9, 30))
+        self.book(time(10), time(10, 30), status='Cancelled')
+        self.book(time(9, 30), time(10))
+        self.book(time(10), time(10, 30))
+
+    def test_rescheduling_in_place_does_not_conflict_with_itself(self):
+        appointment = self.book(time(9), time(9, 30))
+        appointment.end_time = time(9, 45)
+        appointment.save()
+
+    def test_writes_of_the_same_transaction_are_seen(self):
+        # The index only learns about these after commit, which never comes in a TestCase
+        self.book(time(9), time(9, 30))
+        conflict_index.get(self.doctor.id, DAY)
+        with self.assertRaises(ValidationError):
+            self.book(time(9), time(9, 30))
+
+    def test_rows_the_index_has_not_seen_are_checked_in_the_database(self):
+        conflict_index.get(self.doctor.id, DAY)
+        # Written by another worker whose version bump never reached this process
+        Appointment.objects.bulk_create([Appointment(
+            doctor=self.doctor, patient=self.patient, appointment_date=DAY, start_time=time(9),
+            end_time=time(9, 30), status_id=appointment_statuses.id_for('Scheduled'),
+            created_by=self.patient.user
+        )])
+        with self.assertRaises(ValidationError):
+            self.book(time(9), time(9, 30))
+
+    def test_conflict_check_is_a_single_query(self):
+        appointment = self.book(time(9), time(9, 30))
+        conflict_index.get(self.doctor.id, DAY)
+        with self.assertNumQueries(1):
+            appointment.clean()
+
+    def test_stale_index_entries_do_not_reject(self):
+        appointment = self.book(time(9), time(9, 30))
+        conflict_index.record(appointment.id, self.doctor.id, DAY, time(9), time(9, 30), is_active=True)
+        Appointment.objects.filter(id=appointment.id).update(status_id=appointment_statuses.id_for('Cancelled'))
+        self.book(time(9), time(9, 30))
@@ -0,0 +1,40 @@
+from datetime import date, time
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from medicalpro.appointments.holds import get_holds, hold_slot, release_hold
+from medicalpro.core.testing import create_doctor, create_statuses, create_user, reset_process_caches
+
+DAY = date(2030, 1, 7)
+
+
+@override_settings(SLOT_HOLD_MAX_PER_USER=2)
+class SlotHoldLimitTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.user = create_user()
+
+    def test_users_hold_a_limited_number_of_slots(self):
+        first = hold_slot(self.doctor.id, DAY, time(9), time(9, 30), self.user.id)
+        hold_slot(create_doctor().id, DAY, time(9), time(9, 30), self.user.id)
+        with self.assertRaisesMessage(ValidationError, 'maximum number of slots'):
+            hold_slot(self.doctor.id, DAY, time(10), time(10, 30), self.user.id)
+
+        # Refreshing a held slot is not a new hold, and other users have their own limit
+        self.assertEqual(hold_slot(self.doctor.id, DAY, time(9), time(9, 30), self.user.id).token, first.token)
+        hold_slot(self.doctor.id, DAY, time(10), time(10, 30), create_user().id)
+
+        self.assertTrue(release_hold(first.token, user_id=self.user.id))
+        hold_slot(self.doctor.id, DAY, time(11), time(11, 30), self.user.id)
+        self.assertEqual(len([hold for hold in get_holds(self.doctor.id, DAY) if hold.user_id == self.user.id]), 1)
+
+    def test_expired_holds_stop_counting(self):
+        with mock.patch('medicalpro.appointments.holds.clock.time', return_value=1000.0):
+            hold_slot(self.doctor.id, DAY, time(9), time(9, 30), self.user.id, ttl=60)
+            hold_slot(self.doctor.id, DAY, time(10), time(10, 30), self.user.id, ttl=60)
+        with mock.patch('medicalpro.appointments.holds.clock.time', return_value=1061.0):
+            hold_slot(self.doctor.id, DAY, time(11), time(11, 30), self.user.id, ttl=60)
@@ -0,0 +1,90 @@
+import re
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.accounts.models import UserProfile
+from medicalpro.appointments.ics import feed_state, feed_token, iter_calendar
+from medicalpro.appointments.views import AppointmentFeedLinkView, DoctorAppointmentFeedView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+class AppointmentFeedTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient(first_name='Ana')
+        create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30), reason='Checkup')
+
+    def feed(self, token, **headers):
+        request = APIRequestFactory().get('/', **headers)
+        return DoctorAppointmentFeedView.as_view()(request, subject_id=self.doctor.id, token=token)
+
+    def link(self, user, kind='doctor', subject_id=None):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=user)
+        with mock.patch('medicalpro.appointments.views.reverse',
+                        side_effect=lambda name, kwargs: f"/feeds/{name}/{kwargs['subject_id']}/{kwargs['token']}.ics"):
+            return AppointmentFeedLinkView.as_view()(request, kind=kind, subject_id=subject_id or self.doctor.id)
+
+    def test_feed_needs_its_token(self):
+        token = feed_token('doctor', self.doctor.id)
+        response = self.feed(token)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('SUMMARY:Appointment with Ana', body)
+
+        for wrong in ('', token[:-1] + ('0' if token[-1] != '0' else '1'), feed_token('doctor', create_doctor().id)):
+            self.assertEqual(self.feed(wrong).status_code, 404)
+
+    def test_changing_the_password_revokes_the_token(self):
+        token = feed_token('doctor', self.doctor.id)
+        self.doctor.user.set_password('another password')
+        self.doctor.user.save()
+        self.assertEqual(self.feed(token).status_code, 404)
+
+    def test_only_owners_and_staff_get_the_link(self):
+        response = self.link(self.doctor.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(feed_token('doctor', self.doctor.id), response.data['url'])
+        self.assertEqual(self.link(self.patient.user).status_code, 403)
+        self.assertEqual(self.link(create_user(role='admin', is_staff=True)).status_code, 200)
+        self.assertEqual(self.link(self.patient.user, kind='patient', subject_id=self.patient.id).status_code, 200)
+        self.assertEqual(self.link(self.doctor.user, kind='nurse').status_code, 404)
+
+    def test_renaming_a_participant_changes_the_etag(self):
+        etag, last_modified = feed_state('doctor', self.doctor.id)
+        profile = UserProfile.objects.get(user=self.patient.user)
+        profile.phone = '555 0100'
+        profile.save()
+        self.assertEqual(feed_state('doctor', self.doctor.id), (etag, last_modified))
+
+        profile.first_name = 'Anna'
+        with mock.patch('medicalpro.appointments.signals.timezone.now',
+                        return_value=timezone.now() + timedelta(seconds=5)):
+            profile.save()
+        renamed_etag, renamed_modified = feed_state('doctor', self.doctor.id)
+        self.assertNotEqual(renamed_etag, etag)
+        self.assertGreater(renamed_modified, last_modified)
+
+        response = self.feed(feed_token('doctor', self.doctor.id), HTTP_IF_NONE_MATCH=f'"{renamed_etag}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_is_read_one_page_per_query(self):
+        for hour in range(10, 15):
+            create_appointment(self.doctor, self.patient, DAY, time(hour), time(hour, 30))
+        create_appointment(create_doctor(), self.patient, DAY, time(9), time(9, 30))
+
+        with self.assertNumQueries(3):
+            body = ''.join(iter_calendar('doctor', self.doctor.id, chunk_size=3))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 6)
+        self.assertEqual(len(set(re.findall(r'UID:appointment-(\d+)@', body))), 6)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
@@ -0,0 +1,133 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from medicalpro.appointments.models import Appointment, AppointmentReminder
+from medicalpro.appointments.reminders import ReminderDispatcher
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+@mock.patch('medicalpro.core.utils.send_email_notification', return_value=True)
+class ReminderDispatcherTests(TestCase):
+    def setUp(self):
+        self.statuses = create_statuses()
+        reset_process_caches()
+        self.appointment = create_appointment(create_doctor(), create_patient(), DAY, time(9), time(9, 30))
+        self.reminder = AppointmentReminder.objects.create(
+            appointment=self.appointment, reminder_time=timezone.now() - timedelta(minutes=1)
+        )
+        self.dispatcher = ReminderDispatcher()
+
+    def test_sends_due_reminders(self, send_email):
+        self.dispatcher.load_window()
+        due = self.dispatcher.pop_due()
+        self.assertEqual(due, [self.reminder.id])
+        self.assertEqual(self.dispatcher.send_batch(due), [])
+        self.reminder.refresh_from_db()
+        self.assertTrue(self.reminder.is_sent)
+        send_email.assert_called_once()
+
+    def test_cancelled_appointments_get_no_reminder(self, send_email):
+        self.dispatcher.load_window()
+        Appointment.objects.filter(id=self.appointment.id).update(status=self.statuses['Cancelled'])
+        self.assertEqual(self.dispatcher.send_batch(self.dispatcher.pop_due()), [])
+        self.reminder.refresh_from_db()
+        self.assertFalse(self.reminder.is_sent)
+        send_email.assert_not_called()
+
+        self.dispatcher.load_window()
+        self.assertEqual(self.dispatcher.pop_due(), [])
+
+    def test_moved_reminders_wait_for_their_new_time(self, send_email):
+        self.dispatcher.load_window()
+        later = timezone.now() + timedelta(minutes=10)
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(reminder_time=later)
+        self.dispatcher.push(self.reminder.id, later)
+        self.assertEqual(self.dispatcher.pop_due(), [])
+        self.assertEqual(self.dispatcher.queued, {self.reminder.id: later})
+
+        # A batch popped before the move reached the dispatcher is checked against the table
+        self.assertEqual(self.dispatcher.send_batch([self.reminder.id]), [])
+        send_email.assert_not_called()
+
+    def test_failed_reminders_keep_their_retry_delay_across_window_loads(self, send_email):
+        send_email.return_value = False
+        self.dispatcher.load_window()
+        due = self.dispatcher.pop_due()
+        failed = self.dispatcher.send_batch(due)
+        self.assertEqual(failed, [self.reminder.id])
+        self.dispatcher.requeue_failed(due, failed)
+
+        self.dispatcher.load_window()
+        self.assertEqual(self.dispatcher.pop_due(), [])
+        self.assertGreater(self.dispatcher.queued[self.reminder.id], timezone.now() + timedelta(minutes=4))
+
+    def test_claimed_reminders_are_not_sent_twice(self, send_email):
+        claimed = self.dispatcher.claim([self.reminder.id])
+        self.assertEqual([reminder.id for reminder in claimed], [self.reminder.id])
+        other = ReminderDispatcher(worker_id='other')
+        self.assertEqual(other.send_batch([self.reminder.id]), [])
+        send_email.assert_not_called()
+
+        # Once the claim expires another dispatcher may take over
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(other.send_batch([self.reminder.id]), [])
+        send_email.assert_called_once()
+        self.reminder.refresh_from_db()
+        self.assertTrue(self.reminder.is_sent)
+        self.assertIsNone(self.reminder.claimed_by)
+
+    def test_retries_only_repeat_the_failed_channel(self, send_email):
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(reminder_type='Both')
+        with mock.patch('medicalpro.core.utils.send_notification', side_effect=[None, object()]) as notify:
+            self.assertEqual(self.dispatcher.send_batch([self.reminder.id]), [self.reminder.id])
+            self.reminder.refresh_from_db()
+            self.assertIsNotNone(self.reminder.email_sent_at)
+            self.assertIsNone(self.reminder.notification_sent_at)
+            # Other dispatchers wait for the retry delay as well
+            self.assertEqual(ReminderDispatcher(worker_id='other').claim([self.reminder.id]), [])
+
+            AppointmentReminder.objects.filter(id=self.reminder.id).update(locked_until=None)
+            self.assertEqual(self.dispatcher.send_batch([self.reminder.id]), [])
+        send_email.assert_called_once()
+        self.assertEqual(notify.call_count, 2)
+        self.reminder.refresh_from_db()
+        self.assertTrue(self.reminder.is_sent)
+        self.assertEqual(self.reminder.attempts, 1)
+
+    @override_settings(REMINDER_MAX_ATTEMPTS=2)
+    def test_gives_up_after_the_attempt_limit(self, send_email):
+        send_email.return_value = False
+        self.assertEqual(self.dispatcher.send_batch([self.reminder.id]), [self.reminder.id])
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(locked_until=None)
+        self.assertEqual(self.dispatcher.send_batch([self.reminder.id]), [])
+        self.assertEqual(send_email.call_count, 2)
+
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(locked_until=None)
+        self.dispatcher.load_window()
+        self.assertEqual(self.dispatcher.pop_due(), [])
+        self.reminder.refresh_from_db()
+        self.assertEqual((self.reminder.attempts, self.reminder.is_sent), (2, False))
+
+    def test_polls_without_a_shared_channel_layer(self, send_email):
+        self.assertIsNone(self.dispatcher.channel_layer)
+        AppointmentReminder.objects.filter(id=self.reminder.id).update(
+            reminder_time=timezone.now() + timedelta(minutes=45)
+        )
+        self.dispatcher.load_window()
+        self.assertLessEqual(self.dispatcher.seconds_until_next(), 30)
+
+    def test_edits_are_announced(self, send_email):
+        with mock.patch('medicalpro.appointments.signals.announce_reminder') as announce, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.reminder.reminder_time += timedelta(hours=1)
+            self.reminder.save()
+        announce.assert_called_once_with(self.reminder)
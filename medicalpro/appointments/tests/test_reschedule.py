@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.appointments import reschedule
+from medicalpro.appointments.holds import hold_slot
+from medicalpro.appointments.models import Appointment, AppointmentReminder
+from medicalpro.appointments.views import RescheduleAppointmentsView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+def move(appointment, start, end, day=DAY):
+    return {'appointment': appointment.id, 'appointment_date': day.isoformat(),
+            'start_time': start, 'end_time': end}
+
+
+class RescheduleAppointmentsTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+        self.first = create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+        self.second = create_appointment(self.doctor, create_patient(), DAY, time(10), time(10, 30))
+
+    def reschedule(self, user, moves):
+        request = APIRequestFactory().post('/', {'moves': moves}, format='json')
+        force_authenticate(request, user=user)
+        return RescheduleAppointmentsView.as_view()(request)
+
+    def test_swaps_two_appointments(self):
+        response = self.reschedule(self.doctor.user, [
+            move(self.first, '10:00', '10:30'), move(self.second, '09:00', '09:30'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.start_time, self.second.start_time), (time(10), time(9)))
+
+    def test_unsent_reminders_move_with_the_appointment(self):
+        reminder_time = timezone.make_aware(datetime.combine(DAY - timedelta(days=1), time(9)))
+        pending = AppointmentReminder.objects.create(appointment=self.first, reminder_time=reminder_time)
+        sent = AppointmentReminder.objects.create(appointment=self.first, reminder_time=reminder_time, is_sent=True)
+
+        with mock.patch('medicalpro.appointments.reschedule.announce_reminder') as announce, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.reschedule(self.patient.user, [move(self.first, '14:00', '14:30', DAY + timedelta(days=1))])
+        self.assertEqual(response.status_code, 200)
+
+        pending.refresh_from_db()
+        sent.refresh_from_db()
+        self.assertEqual(pending.reminder_time, reminder_time + timedelta(days=1, hours=5))
+        self.assertEqual(sent.reminder_time, reminder_time)
+        announce.assert_called_once()
+        self.assertEqual(announce.call_args.args[0].id, pending.id)
+
+    def test_slots_held_by_other_users_are_taken(self):
+        hold_slot(self.doctor.id, DAY, time(14), time(14, 30), create_user().id)
+        response = self.reschedule(self.doctor.user, [move(self.first, '14:00', '14:30')])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('held by another user', response.data['details'][str(self.first.id)][0])
+
+        # The user's own hold does not get in the way
+        hold_slot(self.doctor.id, DAY, time(15), time(15, 30), self.doctor.user.id)
+        self.assertEqual(self.reschedule(self.doctor.user, [move(self.first, '15:00', '15:30')]).status_code, 200)
+
+    def test_duplicate_appointments_are_rejected(self):
+        response = self.reschedule(self.doctor.user, [
+            move(self.first, '14:00', '14:30'), move(self.first, '15:00', '15:30'),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.get(id=self.first.id).start_time, time(9))
+
+    def test_only_participants_and_staff_may_reschedule(self):
+        # The patient of the first appointment is not the patient of the second
+        response = self.reschedule(self.patient.user, [
+            move(self.first, '14:00', '14:30'), move(self.second, '15:00', '15:30'),
+        ])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.reschedule(create_user(), [move(self.first, '14:00', '14:30')]).status_code, 403)
+        self.assertEqual(Appointment.objects.get(id=self.first.id).start_time, time(9))
+
+        staff = create_user(role='admin', is_staff=True)
+        self.assertEqual(self.reschedule(staff, [move(self.second, '15:00', '15:30')]).status_code, 200)
+
+    def test_malformed_moves_are_rejected(self):
+        for malformed in (
+            [7],
+            [{**move(self.first, '14:00', '14:30'), 'appointment_date': 20300107}],
+            [{**move(self.first, '14:00', '14:30'), 'start_time': 1400}],
+            [{**move(self.first, '14:00', '14:30'), 'appointment': [self.first.id]}],
+            [{**move(self.first, '14:00', '14:30'), 'appointment': True}],
+            [{**move(self.first, '14:00', '14:30'), 'appointment_date': '2030-01-07T09:00:00'}],
+        ):
+            with self.subTest(malformed=malformed):
+                self.assertEqual(self.reschedule(self.doctor.user, malformed).status_code, 400)
+        self.assertEqual(Appointment.objects.get(id=self.first.id).start_time, time(9))
+
+    def test_appointment_deleted_before_the_lock_is_not_found(self):
+        lock_doctor_days = reschedule.lock_doctor_days
+
+        @contextmanager
+        def delete_then_lock(doctor_days):
+            Appointment.objects.filter(id=self.second.id).delete()
+            with lock_doctor_days(doctor_days):
+                yield
+
+        with mock.patch.object(reschedule, 'lock_doctor_days', delete_then_lock):
+            response = self.reschedule(self.doctor.user, [
+                move(self.first, '14:00', '14:30'), move(self.second, '15:00', '15:30'),
+            ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.second.id), response.data['details'])
+        self.assertEqual(Appointment.objects.get(id=self.first.id).start_time, time(9))
@@ -0,0 +1,106 @@
+from datetime import date, time, timedelta
+
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.appointments import rollups
+
+from medicalpro.appointments.booking import bulk_book_appointments
+from medicalpro.appointments.models import DoctorAppointmentRollup, PatientAppointmentRollup
+from medicalpro.appointments.rollups import appointment_analytics, backfill_rollups, count_appointments
+from medicalpro.appointments.views import DoctorAppointmentAnalyticsView, PatientAppointmentAnalyticsView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+def rollup_rows():
+    return {
+        model.__name__: sorted(
+            (row for row in model.objects.values_list(subject, 'date', 'status_id', 'count') if row[-1]),
+        )
+        for model, subject in ((DoctorAppointmentRollup, 'doctor_id'), (PatientAppointmentRollup, 'patient_id'))
+    }
+
+
+class AppointmentRollupTests(TestCase):
+    def setUp(self):
+        self.statuses = create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+
+    def test_signals_keep_rollups_equal_to_a_backfill(self):
+        first = create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+        second = create_appointment(self.doctor, self.patient, DAY, time(10), time(10, 30))
+        third = create_appointment(self.doctor, create_patient(), DAY, time(11), time(11, 30))
+        first.status = self.statuses['Cancelled']
+        first.save()
+        second.appointment_date = DAY + timedelta(days=1)
+        second.save()
+        third.delete()
+        bulk_book_appointments([
+            {'patient': self.patient.id, 'doctor': self.doctor.id, 'appointment_date': DAY.isoformat(),
+             'start_time': '14:00', 'end_time': '14:30'},
+        ], create_user(role='admin', is_staff=True))
+
+        maintained = rollup_rows()
+        backfill_rollups()
+        self.assertEqual(maintained, rollup_rows())
+        self.assertEqual(count_appointments('doctor', self.doctor.id, DAY, DAY + timedelta(days=1)), 2)
+
+    def test_batched_deltas_match_a_backfill(self):
+        create_appointment(self.doctor, self.patient, DAY, time(8), time(8, 30))
+        other = create_doctor()
+        rows = [
+            {'patient': self.patient.id, 'doctor': doctor.id,
+             'appointment_date': (DAY + timedelta(days=day)).isoformat(),
+             'start_time': f'{hour:02}:00', 'end_time': f'{hour:02}:30'}
+            for doctor in (self.doctor, other) for day in range(6) for hour in (9, 10, 11)
+        ]
+        # Twelve doctor keys in chunks of three, including an existing row; the six patient keys stay per key
+        with mock.patch.object(rollups, 'DELTA_CHUNK_SIZE', 3), \
+                mock.patch.object(rollups, '_apply_batched', wraps=rollups._apply_batched) as batched:
+            bulk_book_appointments(rows, create_user(role='admin', is_staff=True))
+        self.assertEqual(batched.call_count, 4)
+
+        maintained = rollup_rows()
+        backfill_rollups()
+        self.assertEqual(maintained, rollup_rows())
+
+    def test_analytics_leave_out_cancelled_appointments(self):
+        create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+        create_appointment(self.doctor, self.patient, DAY, time(10), time(10, 30), status='Cancelled')
+        create_appointment(self.doctor, self.patient, DAY + timedelta(days=2), time(9), time(9, 30),
+                           status='Completed')
+
+        analytics = appointment_analytics('patient', self.patient.id, DAY, DAY + timedelta(days=6))
+        self.assertEqual(analytics['total'], 2)
+        self.assertEqual(analytics['by_status'], {'Scheduled': 1, 'Cancelled': 1, 'Completed': 1})
+        self.assertEqual(analytics['daily'], [
+            {'date': DAY.isoformat(), 'count': 1},
+            {'date': (DAY + timedelta(days=2)).isoformat(), 'count': 1},
+        ])
+
+    def test_analytics_are_only_shown_to_their_subject_and_staff(self):
+        create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30))
+
+        def get(view, user, **params):
+            request = APIRequestFactory().get('/', dict(params, start_date=DAY.isoformat(), end_date=DAY.isoformat()))
+            force_authenticate(request, user=user)
+            return view.as_view()(request)
+
+        response = get(PatientAppointmentAnalyticsView, self.patient.user, patient=self.patient.id)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(get(DoctorAppointmentAnalyticsView, self.doctor.user, doctor=self.doctor.id).status_code, 200)
+        staff = create_user(role='admin', is_staff=True)
+        self.assertEqual(get(PatientAppointmentAnalyticsView, staff, patient=self.patient.id).status_code, 200)
+
+        stranger = create_patient().user
+        self.assertEqual(get(PatientAppointmentAnalyticsView, stranger, patient=self.patient.id).status_code, 403)
+        self.assertEqual(get(DoctorAppointmentAnalyticsView, stranger, doctor=self.doctor.id).status_code, 403)
+        self.assertEqual(get(DoctorAppointmentAnalyticsView, self.doctor.user, doctor=-1).status_code, 404)
@@ -0,0 +1,73 @@
+from datetime import date, time
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.appointments.models import AppointmentSearchTerm
+from medicalpro.appointments import search
+from medicalpro.appointments.search import rebuild_index, search_appointments
+from medicalpro.appointments.views import AppointmentSearchView
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+
+DAY = date(2030, 1, 7)
+
+
+class AppointmentSearchTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor(first_name='Gregory')
+        self.patient = create_patient(first_name='Ana')
+        self.other = create_patient(first_name='Zoe')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.own = create_appointment(self.doctor, self.patient, DAY, time(9), time(9, 30),
+                                          reason='Migraine follow-up')
+            self.notes_only = create_appointment(self.doctor, self.patient, DAY, time(10), time(10, 30),
+                                                 notes='Mentions a migraine')
+            self.foreign = create_appointment(self.doctor, self.other, DAY, time(11), time(11, 30),
+                                              reason='Migraine')
+
+    def search(self, user, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=user)
+        return AppointmentSearchView.as_view()(request)
+
+    def test_ranked_prefix_search(self):
+        hits = search_appointments('migr greg', user=create_user(role='admin', is_staff=True))
+        self.assertEqual([appointment_id for appointment_id, score in hits],
+                         [self.foreign.id, self.own.id, self.notes_only.id])
+
+    def test_users_only_find_their_appointments(self):
+        response = self.search(self.patient.user, q='migraine')
+        self.assertEqual({result['id'] for result in response.data['results']}, {self.own.id, self.notes_only.id})
+        response = self.search(self.doctor.user, q='migraine')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(self.search(create_user(), q='migraine').data['results'], [])
+
+    def test_limit_is_clamped(self):
+        response = self.search(self.doctor.user, q='migraine', limit=-1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(self.search(self.doctor.user, q='migraine', limit='x').status_code, 400)
+
+    def test_common_terms_rank_a_capped_candidate_set(self):
+        staff = create_user(role='admin', is_staff=True)
+        expected = search_appointments('ana migr', user=staff)
+        with mock.patch.object(search, 'MAX_SEARCH_CANDIDATES', 2):
+            # Five matching entries, but the rarest term has two: the ranking is still exact
+            self.assertEqual(search_appointments('ana migr', user=staff), expected)
+            # Every term is too common, only the newest matches are ranked and the older own one is left out
+            self.assertEqual(search_appointments('migraine', user=staff, limit=5),
+                             [(self.foreign.id, 2), (self.notes_only.id, 1)])
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        terms = AppointmentSearchTerm.objects.count()
+        with mock.patch('medicalpro.appointments.search._terms_for', side_effect=[[], RuntimeError('boom')]), \
+                self.assertRaises(RuntimeError):
+            rebuild_index(chunk_size=1)
+        self.assertEqual(AppointmentSearchTerm.objects.count(), terms)
+        self.assertEqual(rebuild_index(chunk_size=2), 3)
+        self.assertEqual(AppointmentSearchTerm.objects.count(), terms)
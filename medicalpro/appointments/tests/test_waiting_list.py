@@ -0,0 +1,74 @@
+from datetime import date, datetime, time
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from medicalpro.appointments.cancellation import cancel_appointments, cancel_doctor_day
+from medicalpro.appointments.models import Appointment, WaitingList
+from medicalpro.appointments.waiting_list import handle_cancellation
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+from medicalpro.doctors.models import DoctorUnavailability
+
+DAY = date(2030, 1, 7)
+
+
+class WaitingListRefillTests(TestCase):
+    def setUp(self):
+        self.statuses = create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.appointment = create_appointment(self.doctor, create_patient(), DAY, time(10), time(10, 30))
+        self.waiting = create_patient()
+        self.entry = WaitingList.objects.create(patient=self.waiting, doctor=self.doctor, requested_date=DAY,
+                                                created_by=self.waiting.user)
+        self.staff = create_user(role='admin', is_staff=True)
+
+    def cancel(self, cancel=cancel_appointments):
+        with self.captureOnCommitCallbacks(execute=True):
+            if cancel is cancel_doctor_day:
+                cancel(self.doctor.id, DAY, self.staff, 'Sick')
+            else:
+                cancel([self.appointment.id], self.staff, 'Sick')
+        self.entry.refresh_from_db()
+        return Appointment.objects.filter(patient=self.waiting).first()
+
+    def test_cancelled_slot_goes_to_the_waiting_list(self):
+        booked = self.cancel()
+        self.assertEqual((booked.appointment_date, booked.start_time), (DAY, time(10)))
+        self.assertTrue(self.entry.is_fulfilled)
+        self.assertEqual(self.entry.fulfilled_by_appointment_id, booked.id)
+
+    def test_no_refill_when_the_doctor_stopped_taking_appointments(self):
+        self.doctor.is_available = False
+        self.doctor.save()
+        self.assertIsNone(self.cancel())
+        self.assertFalse(self.entry.is_fulfilled)
+
+    def test_no_refill_outside_the_active_schedule(self):
+        self.doctor.availability.update(is_active=False)
+        self.assertIsNone(self.cancel())
+        self.assertFalse(self.entry.is_fulfilled)
+
+    def test_no_refill_during_time_off(self):
+        DoctorUnavailability.objects.create(
+            doctor=self.doctor,
+            start_datetime=timezone.make_aware(datetime.combine(DAY, time(9))),
+            end_datetime=timezone.make_aware(datetime.combine(DAY, time(12)))
+        )
+        self.assertIsNone(self.cancel())
+        self.assertFalse(self.entry.is_fulfilled)
+
+    def test_cancelling_the_doctor_day_skips_the_waiting_list(self):
+        self.assertIsNone(self.cancel(cancel_doctor_day))
+        self.assertFalse(self.entry.is_fulfilled)
+        self.assertEqual(self.appointment.cancellation.reason, 'Sick')
+
+    def test_matcher_errors_are_logged_not_raised(self):
+        Appointment.objects.filter(id=self.appointment.id).update(status=self.statuses['Cancelled'])
+        with mock.patch('medicalpro.appointments.waiting_list.fill_cancelled_slot', side_effect=RuntimeError('down')), \
+                self.assertLogs('medicalpro.appointments.waiting_list', 'ERROR') as logs:
+            self.assertIsNone(handle_cancellation(self.appointment.id))
+        self.assertIn('down', logs.output[0])
@@ -9,6 +9,13 @@ urlpatterns = [
     path('create/', views.AppointmentCreateView.as_view(), name='appointment_create'),
     path('<int:pk>/update/', views.AppointmentUpdateView.as_view(), name='appointment_update'),
     path('<int:pk>/cancel/', views.AppointmentCancelView.as_view(), name='appointment_cancel'),
+    path('bulk/', views.BulkAppointmentCreateView.as_view(), name='appointment_bulk_create'),
+    path('reschedule/', views.RescheduleAppointmentsView.as_view(), name='appointment_reschedule'),
+    
+    # Slot holds
+    path('holds/', views.SlotHoldView.as_view(), name='slot_hold_create'),
+    path('holds/stats/', views.SlotHoldStatsView.as_view(), name='slot_hold_stats'),
+    path('holds/<str:token>/', views.SlotHoldDetailView.as_view(), name='slot_hold_detail'),
     
     # Appointment status
     path('statuses/', views.AppointmentStatusListView.as_view(), name='appointment_status_list'),
@@ -35,6 +42,13 @@ urlpatterns = [
     # Search and filter appointments
     path('search/', views.AppointmentSearchView.as_view(), name='appointment_search'),
     path('calendar/', views.AppointmentCalendarView.as_view(), name='appointment_calendar'),
+    path('calendar/stats/', views.CalendarTileStatsView.as_view(), name='appointment_calendar_stats'),
+    path('feeds/doctor/<int:subject_id>/<str:token>.ics', views.DoctorAppointmentFeedView.as_view(),
+         name='doctor_appointment_feed'),
+    path('feeds/patient/<int:subject_id>/<str:token>.ics', views.PatientAppointmentFeedView.as_view(),
+         name='patient_appointment_feed'),
+    path('feeds/<str:kind>/<int:subject_id>/link/', views.AppointmentFeedLinkView.as_view(),
+         name='appointment_feed_link'),
     
     # Appointment fulfillment (completing an appointment)
     path('<int:pk>/complete/', views.AppointmentCompleteView.as_view(), name='appointment_complete'),
@@ -42,4 +56,4 @@ urlpatterns = [
     # Analytics
     path('analytics/doctor/', views.DoctorAppointmentAnalyticsView.as_view(), name='doctor_appointment_analytics'),
     path('analytics/patient/', views.PatientAppointmentAnalyticsView.as_view(), name='patient_appointment_analytics'),
-] 
\ No newline at end of file
+] 
\ No newline at end of file
@@ -0,0 +1,397 @@
+from datetime import date, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from medicalpro.appointments.booking import book_requested_appointment, bulk_book_appointments
+from medicalpro.appointments.calendar_tiles import get_month_tile, tile_stats
+from medicalpro.appointments.cancellation import cancel_appointments
+from medicalpro.appointments.holds import hold_slot, hold_stats, release_hold
+from medicalpro.appointments.ics import (
+    FEED_SUBJECTS, check_feed_token, feed_owner, feed_state, feed_token, iter_calendar
+)
+from medicalpro.appointments.models import Appointment, AppointmentStatus
+from medicalpro.appointments.permissions import manages_appointments, visible_appointments
+from medicalpro.appointments.reschedule import reschedule_appointments
+from medicalpro.appointments.rollups import appointment_analytics
+from medicalpro.appointments.search import search_appointments
+from medicalpro.doctors.models import Doctor
+from medicalpro.doctors.slots import format_slot_time, parse_slot_time
+from medicalpro.patients.models import Patient
+
+# Longest range served by the analytics views
+MAX_ANALYTICS_RANGE_DAYS = 3 * 366
+
+# Largest page of search results
+MAX_SEARCH_RESULTS = 100
+
+# Largest number of appointments accepted in one bulk request
+MAX_BULK_APPOINTMENTS = 10000
+
+# Largest number of appointments moved in one reschedule request
+MAX_RESCHEDULE_MOVES = 1000
+
+# Longest slot hold a client may ask for, in seconds
+MAX_SLOT_HOLD_TTL = 15 * 60
+
+
+class AppointmentCreateView(APIView):
+    """
+    Book one appointment under its doctor-day lock.
+
+    Body: ``patient``, ``doctor``, ``appointment_date``, ``start_time``,
+    ``end_time`` and optional ``reason`` / ``notes``. Staff may book for
+    anyone; other users only as the patient or the doctor.
+    """
+
+    def post(self, request):
+        try:
+            appointment = book_requested_appointment(request.data, request.user)
+        except KeyError as e:
+            return Response({'error': f'Missing field: {e.args[0]}'}, status=status.HTTP_400_BAD_REQUEST)
+        except (TypeError, ValueError, Doctor.DoesNotExist, Patient.DoesNotExist) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response({'error': ' '.join(e.messages)}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'id': appointment.id,
+            'doctor': appointment.doctor_id,
+            'patient': appointment.patient_id,
+            'appointment_date': appointment.appointment_date.isoformat(),
+            'start_time': format_slot_time(appointment.start_time),
+            'end_time': format_slot_time(appointment.end_time),
+            'status': 'Scheduled',
+        }, status=status.HTTP_201_CREATED)
+
+
+class BulkAppointmentCreateView(APIView):
+    """
+    Book a whole campaign of appointments in one request.
+
+    Staff may book for anyone; other users only rows where they are the patient or the doctor.
+    """
+
+    def post(self, request):
+        rows = request.data.get('appointments')
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'appointments must be a non-empty list.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_BULK_APPOINTMENTS:
+            return Response({'error': f'At most {MAX_BULK_APPOINTMENTS} appointments per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = bulk_book_appointments(rows, request.user,
+                                             status_name=request.data.get('status', 'Scheduled'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except AppointmentStatus.DoesNotExist:
+            return Response({'error': 'Unknown appointment status.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        accepted = sum(1 for result in results if result['accepted'])
+        return Response({
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results,
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_200_OK)
+
+
+class AppointmentCancelView(APIView):
+    """Cancel one appointment. Body: ``reason`` (required). Staff may cancel any appointment, other users their own."""
+
+    def post(self, request, pk):
+        reason = (request.data.get('reason') or '').strip()
+        if not reason:
+            return Response({'error': 'reason is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Appointment.objects.filter(id=pk).exists():
+            return Response({'error': 'Appointment not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if not visible_appointments(Appointment.objects.filter(id=pk), request.user).exists():
+            return Response({'error': 'You may only cancel your own appointments.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if not cancel_appointments([pk], request.user, reason):
+            return Response({'error': 'The appointment is already cancelled.'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'id': pk, 'status': 'Cancelled'})
+
+
+class RescheduleAppointmentsView(APIView):
+    """
+    Move or swap several appointments atomically.
+
+    Body: ``{"moves": [{"appointment", "appointment_date", "start_time", "end_time"}, ...],
+    "reason": "..."}``. Only the final layout is validated, so two appointments
+    can trade slots in one request. Staff may move any appointment, other
+    users only their own.
+    """
+
+    def post(self, request):
+        moves = request.data.get('moves')
+        if not isinstance(moves, list) or not moves:
+            return Response({'error': 'moves must be a non-empty list.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(moves) > MAX_RESCHEDULE_MOVES:
+            return Response({'error': f'At most {MAX_RESCHEDULE_MOVES} appointments per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            moved = reschedule_appointments(moves, request.user, reason=request.data.get('reason'))
+        except ValidationError as e:
+            errors = e.message_dict if hasattr(e, 'error_dict') else e.messages
+            return Response({'error': 'The appointments could not be rescheduled.', 'details': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'rescheduled': [
+                {
+                    'id': appointment.id,
+                    'appointment_date': appointment.appointment_date.isoformat(),
+                    'start_time': appointment.start_time.strftime('%H:%M'),
+                    'end_time': appointment.end_time.strftime('%H:%M'),
+                }
+                for appointment in moved
+            ],
+        })
+
+
+class SlotHoldView(APIView):
+    """
+    Hold a slot while the user fills in the booking form.
+
+    Body: ``doctor``, ``appointment_date``, ``start_time``, ``end_time`` and an
+    optional ``ttl`` in seconds. The hold keeps the slot out of
+    ``available-slots/`` and away from other users' bookings until it expires.
+    A taken slot, or a user already holding ``SLOT_HOLD_MAX_PER_USER`` slots,
+    gets a 409.
+    """
+
+    def post(self, request):
+        try:
+            doctor_id = int(request.data['doctor'])
+            day = date.fromisoformat(request.data['appointment_date'])
+            start_time = time.fromisoformat(request.data['start_time'])
+            end_time = parse_slot_time(request.data['end_time'])
+            ttl = request.data.get('ttl')
+            ttl = min(int(ttl), MAX_SLOT_HOLD_TTL) if ttl else None
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'doctor, appointment_date (YYYY-MM-DD), start_time and end_time '
+                                      '(HH:MM) are required; ttl must be an integer.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start_time >= end_time or (ttl is not None and ttl <= 0):
+            return Response({'error': 'Start time must be before end time and ttl must be positive.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            hold = hold_slot(doctor_id, day, start_time, end_time, request.user.id, ttl=ttl)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'token': hold.token,
+            'doctor_id': hold.doctor_id,
+            'appointment_date': hold.date.isoformat(),
+            'start_time': format_slot_time(hold.start_time),
+            'end_time': format_slot_time(hold.end_time),
+            'expires_at': hold.expires_at.isoformat(),
+        }, status=status.HTTP_201_CREATED)
+
+
+class SlotHoldDetailView(APIView):
+    """Release a slot hold before it expires."""
+
+    def delete(self, request, token):
+        if not release_hold(token, user_id=request.user.id):
+            return Response({'error': 'Hold not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SlotHoldStatsView(APIView):
+    """Hold usage counters of this worker process."""
+
+    def get(self, request):
+        return Response(hold_stats.as_dict())
+
+
+class AppointmentCalendarView(APIView):
+    """
+    Month calendar tile of a doctor, served from the tile cache.
+
+    Query parameters: ``doctor`` (required) and ``month`` as ``YYYY-MM``
+    (defaults to the current month). Supports ``If-None-Match``.
+    """
+
+    def get(self, request):
+        try:
+            doctor_id = int(request.query_params['doctor'])
+            month = request.query_params.get('month') or timezone.localdate().strftime('%Y-%m')
+            year, month = (int(part) for part in month.split('-'))
+            tile, etag = get_month_tile(doctor_id, year, month)
+        except (KeyError, ValueError):
+            return Response({'error': 'doctor and a month in YYYY-MM format are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        etag = quote_etag(etag)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(tile)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class CalendarTileStatsView(APIView):
+    """Calendar tile cache hit ratio and rebuild latency of this worker process."""
+
+    def get(self, request):
+        return Response(tile_stats.as_dict())
+
+
+class AppointmentFeedView(APIView):
+    """
+    iCalendar feed of a doctor's or patient's appointments, streamed row by row.
+
+    Calendar clients cannot log in, so the secret token in the URL is the
+    credential; ``AppointmentFeedLinkView`` hands it to the feed's owner.
+    Supports ``If-None-Match`` and ``If-Modified-Since`` so polling calendar
+    clients get a 304 from a single aggregate query when nothing changed.
+    """
+    kind = None
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, subject_id, token):
+        if not check_feed_token(self.kind, subject_id, token):
+            raise Http404
+        etag, last_modified = feed_state(self.kind, subject_id)
+        etag = quote_etag(etag)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = StreamingHttpResponse(iter_calendar(self.kind, subject_id),
+                                             content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="{self.kind}-{subject_id}.ics"'
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class DoctorAppointmentFeedView(AppointmentFeedView):
+    kind = 'doctor'
+
+
+class PatientAppointmentFeedView(AppointmentFeedView):
+    kind = 'patient'
+
+
+class AppointmentFeedLinkView(APIView):
+    """Private calendar feed URL of a doctor or patient, for its owner or staff."""
+
+    def get(self, request, kind, subject_id):
+        owner_id = feed_owner(kind, subject_id) if kind in FEED_SUBJECTS else None
+        if owner_id is None:
+            return Response({'error': 'Feed not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if owner_id != request.user.id and not manages_appointments(request.user):
+            return Response({'error': 'You may only subscribe to your own calendar.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        path = reverse(f'{kind}_appointment_feed', kwargs={'subject_id': subject_id,
+                                                           'token': feed_token(kind, subject_id)})
+        return Response({'url': request.build_absolute_uri(path)})
+
+
+class AppointmentAnalyticsView(APIView):
+    """
+    Daily appointment counts of one doctor or patient, read from the rollup tables.
+
+    Only the doctor or patient themselves and staff managing appointments may
+    read them.
+    """
+    kind = None
+
+    def get(self, request):
+        try:
+            subject_id = int(request.query_params[self.kind])
+            end_date = date.fromisoformat(request.query_params.get('end_date') or timezone.localdate().isoformat())
+            start_date = date.fromisoformat(request.query_params.get('start_date')
+                                            or (end_date - timedelta(days=364)).isoformat())
+        except (KeyError, ValueError):
+            return Response({'error': f'{self.kind} is required and dates must use the YYYY-MM-DD format.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end_date < start_date or (end_date - start_date).days > MAX_ANALYTICS_RANGE_DAYS:
+            return Response({'error': f'The date range must span 0 to {MAX_ANALYTICS_RANGE_DAYS} days.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        owner_id = feed_owner(self.kind, subject_id)
+        if owner_id is None:
+            return Response({'error': f'{self.kind.capitalize()} not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if owner_id != request.user.id and not manages_appointments(request.user):
+            return Response({'error': 'You may only view your own appointment analytics.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        analytics = appointment_analytics(self.kind, subject_id, start_date, end_date)
+        analytics.update({
+            self.kind: subject_id,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+        })
+        return Response(analytics)
+
+
+class DoctorAppointmentAnalyticsView(AppointmentAnalyticsView):
+    kind = 'doctor'
+
+
+class PatientAppointmentAnalyticsView(AppointmentAnalyticsView):
+    kind = 'patient'
+
+
+class AppointmentSearchView(APIView):
+    """
+    Ranked prefix search over appointment reasons, notes and participant names.
+
+    Query parameters: ``q`` (required), ``limit`` and ``offset``. Only
+    staff see every appointment; other users search their own.
+    """
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), MAX_SEARCH_RESULTS))
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        hits = search_appointments(query, limit=limit, offset=offset, user=request.user)
+        appointments = Appointment.objects.in_bulk([appointment_id for appointment_id, score in hits])
+        return Response({
+            'query': query,
+            'results': [
+                {
+                    'id': appointment.id,
+                    'patient_id': appointment.patient_id,
+                    'doctor_id': appointment.doctor_id,
+                    'appointment_date': appointment.appointment_date.isoformat(),
+                    'start_time': appointment.start_time.strftime('%H:%M'),
+                    'end_time': appointment.end_time.strftime('%H:%M'),
+                    'status_id': appointment.status_id,
+                    'reason': appointment.reason,
+                    'score': score,
+                }
+                for appointment_id, score in hits
+                if (appointment := appointments.get(appointment_id)) is not None
+            ],
+        })
@@ -0,0 +1,293 @@
+import heapq
+import logging
+import threading
+from bisect import insort
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from medicalpro.appointments.booking import lock_doctor_days
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES
+from medicalpro.appointments.models import Appointment, WaitingList
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.availability import is_doctor_available
+from medicalpro.doctors.models import Doctor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'appointments:waiting_index:{doctor_id}'
+
+# Date ranges longer than this are not spread over per-day buckets
+MAX_BUCKET_RANGE_DAYS = 62
+
+# Start-time windows for the usual WaitingList.time_preference values
+TIME_PREFERENCES = {
+    'morning': (time(0), time(12)),
+    'afternoon': (time(12), time(17)),
+    'evening': (time(17), time.max),
+}
+
+WaitingEntry = namedtuple('WaitingEntry', [
+    'sort_key', 'id', 'patient_id', 'patient_user_id', 'created_by_id',
+    'first_date', 'last_date', 'time_window',
+])
+
+
+def _make_entry(row):
+    (pk, patient_id, patient_user_id, created_by_id, priority, created_at,
+     requested_date, date_range_start, date_range_end, time_preference) = row
+    if requested_date:
+        first_date = last_date = requested_date
+    else:
+        first_date, last_date = date_range_start, date_range_end
+    time_window = TIME_PREFERENCES.get((time_preference or '').strip().lower())
+    # Same order as WaitingList.Meta.ordering: highest priority, then oldest
+    return WaitingEntry((-priority, created_at, pk), pk, patient_id, patient_user_id, created_by_id,
+                        first_date, last_date, time_window)
+
+
+class DoctorWaitingIndex:
+    """
+    Open waiting-list entries of one doctor, bucketed by date.
+
+    Entries tied to a date or a short date range are listed in each matching
+    day's bucket; entries without dates or with long ranges go to ``wide``.
+    Every list is kept sorted by priority so a match only reads the heads.
+    """
+
+    def __init__(self, entries, version):
+        self.version = version
+        self.buckets = {}
+        self.wide = []
+        for entry in sorted(entries):
+            self.add(entry)
+
+    def _days(self, entry):
+        if entry.first_date is None or entry.last_date is None:
+            return None
+        span = (entry.last_date - entry.first_date).days
+        if span < 0 or span > MAX_BUCKET_RANGE_DAYS:
+            return None
+        return [entry.first_date + timedelta(days=offset) for offset in range(span + 1)]
+
+    def add(self, entry):
+        days = self._days(entry)
+        if days is None:
+            insort(self.wide, entry)
+        else:
+            for day in days:
+                insort(self.buckets.setdefault(day, []), entry)
+
+    def remove(self, entry_id):
+        for day in list(self.buckets):
+            self.buckets[day] = [entry for entry in self.buckets[day] if entry.id != entry_id]
+            if not self.buckets[day]:
+                del self.buckets[day]
+        self.wide = [entry for entry in self.wide if entry.id != entry_id]
+
+    def best_match(self, day, start_time, exclude_ids=(), exclude_patients=()):
+        """Return the highest-priority entry compatible with the slot, or None."""
+        for entry in heapq.merge(self.buckets.get(day, ()), self.wide):
+            if entry.id in exclude_ids or entry.patient_id in exclude_patients:
+                continue
+            if entry.first_date and day < entry.first_date:
+                continue
+            if entry.last_date and day > entry.last_date:
+                continue
+            if entry.time_window and not entry.time_window[0] <= start_time < entry.time_window[1]:
+                continue
+            return entry
+        return None
+
+
+class WaitingListIndex:
+    """
+    Process-local index of open waiting-list entries per doctor.
+
+    Loaded lazily per doctor and kept current by WaitingList signals; a
+    version counter in the shared cache invalidates other workers' copies.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'WAITING_LIST_INDEX_SIZE', 2000)
+        self._indexes = {}
+        self._lock = threading.RLock()
+
+    def _bump_version(self, doctor_id):
+        key = VERSION_KEY.format(doctor_id=doctor_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+            return cache.get(key, 1)
+
+    def get(self, doctor_id):
+        version = cache.get(VERSION_KEY.format(doctor_id=doctor_id), 0)
+        with self._lock:
+            index = self._indexes.get(doctor_id)
+            if index is not None and index.version == version:
+                return index
+
+        rows = WaitingList.objects.filter(doctor_id=doctor_id, is_fulfilled=False).values_list(
+            'id', 'patient_id', 'patient__user_id', 'created_by_id', 'priority', 'created_at',
+            'requested_date', 'date_range_start', 'date_range_end', 'time_preference'
+        )
+        index = DoctorWaitingIndex([_make_entry(row) for row in rows], version)
+        with self._lock:
+            if len(self._indexes) >= self.max_size:
+                self._indexes.pop(next(iter(self._indexes)))
+            self._indexes[doctor_id] = index
+        return index
+
+    def best_match(self, doctor_id, day, start_time, exclude_ids=(), exclude_patients=()):
+        return self.get(doctor_id).best_match(day, start_time, exclude_ids, exclude_patients)
+
+    def invalidate(self, doctor_id):
+        """Drop the doctor's index here and in every other worker."""
+        self._bump_version(doctor_id)
+        with self._lock:
+            self._indexes.pop(doctor_id, None)
+
+    def forget(self, doctor_id, entry_id):
+        """Remove a fulfilled or deleted entry."""
+        version = self._bump_version(doctor_id)
+        with self._lock:
+            index = self._indexes.get(doctor_id)
+            if index is None:
+                return
+            if index.version == version - 1:
+                index.remove(entry_id)
+                index.version = version
+            else:
+                self._indexes.pop(doctor_id, None)
+
+
+waiting_index = WaitingListIndex()
+
+
+class _AlreadyFulfilled(Exception):
+    pass
+
+
+_paused = threading.local()
+
+
+@contextmanager
+def waiting_list_paused():
+    """Don't offer the slots cancelled in this block to the waiting list, e.g. when the doctor is out."""
+    previous = getattr(_paused, 'active', False)
+    _paused.active = True
+    try:
+        yield
+    finally:
+        _paused.active = previous
+
+
+def is_waiting_list_paused():
+    return getattr(_paused, 'active', False)
+
+
+def _doctor_can_take(appointment):
+    if not Doctor.objects.filter(id=appointment.doctor_id, is_available=True).exists():
+        return False
+    return is_doctor_available(appointment.doctor_id, appointment.appointment_date,
+                               appointment.start_time, appointment.end_time)
+
+
+def fill_cancelled_slot(appointment):
+    """
+    Offer a freed appointment slot to the best matching waiting-list entry.
+
+    The entry is claimed with a conditional UPDATE and the replacement
+    appointment is created in the same transaction, under the doctor-day
+    lock, so two workers handling the same cancellation cannot both fulfil
+    one entry or book the slot twice. Nothing is booked unless the doctor is
+    still taking appointments and the slot is within their active schedule
+    and clear of their time off.
+
+    Args:
+        appointment (Appointment): The cancelled appointment
+
+    Returns:
+        Appointment: The appointment booked from the waiting list, or None
+    """
+    from medicalpro.core.utils import send_notification
+
+    if appointment.appointment_date < timezone.localdate():
+        return None
+
+    tried = set()
+    while True:
+        entry = waiting_index.best_match(appointment.doctor_id, appointment.appointment_date,
+                                         appointment.start_time, exclude_ids=tried,
+                                         exclude_patients={appointment.patient_id})
+        if entry is None:
+            return None
+        tried.add(entry.id)
+
+        try:
+            with lock_doctor_days([(appointment.doctor_id, appointment.appointment_date)]):
+                if not _doctor_can_take(appointment):
+                    return None
+                claimed = WaitingList.objects.filter(
+                    id=entry.id, doctor_id=appointment.doctor_id, is_fulfilled=False
+                ).update(
+                    is_fulfilled=True, updated_at=timezone.now()
+                )
+                if not claimed:
+                    raise _AlreadyFulfilled()
+                booked = Appointment(
+                    patient_id=entry.patient_id,
+                    doctor_id=appointment.doctor_id,
+                    appointment_date=appointment.appointment_date,
+                    start_time=appointment.start_time,
+                    end_time=appointment.end_time,
+                    status=appointment_statuses.get_by_name('Scheduled'),
+                    reason=appointment.reason,
+                    created_by_id=entry.created_by_id,
+                )
+                booked.save()
+                WaitingList.objects.filter(id=entry.id).update(fulfilled_by_appointment=booked)
+        except _AlreadyFulfilled:
+            waiting_index.forget(appointment.doctor_id, entry.id)
+            continue
+        except ValidationError:
+            # The slot was taken again before the waiting list got it
+            return None
+
+        waiting_index.forget(appointment.doctor_id, entry.id)
+        send_notification(
+            entry.patient_user_id,
+            'Appointment Scheduled',
+            f'A slot opened up on {booked.appointment_date:%B %d, %Y} at {booked.start_time:%I:%M %p} '
+            'and has been booked for you from the waiting list.',
+            notification_type='appointment',
+            related_entity='appointments',
+            related_id=booked.id
+        )
+        return booked
+
+
+def handle_cancellation(appointment_id):
+    """
+    Run the waiting-list matcher for a cancelled appointment once it is committed.
+
+    Runs from ``on_commit`` after the cancelling request's own work is done,
+    so errors are logged rather than raised at the caller.
+    """
+    try:
+        appointment = Appointment.objects.get(id=appointment_id)
+        if appointment.status_id in appointment_statuses.ids(ACTIVE_STATUSES):
+            logger.warning(f"Appointment {appointment_id} has a cancellation but still holds its slot")
+            return None
+        return fill_cancelled_slot(appointment)
+    except Appointment.DoesNotExist:
+        return None
+    except Exception as e:
+        logger.error(f"Failed to offer the slot of appointment {appointment_id} to the waiting list: {str(e)}")
+        return None
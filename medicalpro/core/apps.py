@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'medicalpro.core'
+    label = 'core'
+
+    def ready(self):
+        # Register system checks and signal handlers
+        from medicalpro.core import checks, signals  # noqa: F401
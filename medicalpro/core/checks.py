@@ -0,0 +1,56 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connections
+
+# Backends whose data is not seen by the other worker processes
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """The version counters, holds and counters kept in the default cache must reach every worker."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is local to one process.',
+            hint='Use a cache shared by all worker processes, such as Redis or the database cache.',
+            id='core.E001',
+        )]
+    return []
+
+
+@register()
+def check_booking_locks(app_configs, **kwargs):
+    """Without row locks, bookings from several worker processes rely on SQLite taking its write lock up front."""
+    messages = []
+    for alias in connections:
+        connection = connections[alias]
+        if connection.features.has_select_for_update or connection.vendor != 'sqlite':
+            continue
+        if connection.settings_dict.get('OPTIONS', {}).get('transaction_mode') != 'IMMEDIATE':
+            messages.append(Warning(
+                f"Bookings on database '{alias}' are only serialized within one process.",
+                hint="Set 'transaction_mode': 'IMMEDIATE' in its OPTIONS, or concurrent bookings from "
+                     "several worker processes may fail with \"database is locked\".",
+                id='core.W001',
+            ))
+    return messages
+
+
+@register()
+def check_notification_streams(app_configs, **kwargs):
+    """SSE and long-poll clients only hear of notifications sent through a channel layer every process shares."""
+    backend = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND')
+    if backend != 'channels.layers.InMemoryChannelLayer' or not apps.is_installed('medicalpro.accounts'):
+        return []
+    return [Warning(
+        'The notification stream and long-poll endpoints use the in-memory channel layer, local to one process.',
+        hint='Notifications created by other worker processes, the reminder dispatcher or management commands '
+             'only reach those clients on their next request. Set CHANNEL_LAYER_DB, or configure another '
+             'channel layer shared by all processes.',
+        id='core.W002',
+    )]
@@ -1,12 +1,27 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from medicalpro.accounts.notifications import (
+    MAX_MARK_READ_BATCH, aget_unread_count, amark_notification_read, amark_notifications_read, parse_before
+)
+
 User = get_user_model()
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes notifications and unread counts to a user's websocket.
+
+    Notifications arriving within ``NOTIFICATION_BURST_WINDOW`` seconds of
+    each other (0.05 by default, 0 disables it) are coalesced into one
+    ``notification_batch`` frame followed by a single ``unread_count``
+    update. At most ``NOTIFICATION_BURST_MAX_SIZE`` notifications are
+    buffered; a full buffer is sent at once.
+    """
+    
     async def connect(self):
         self.user = self.scope["user"]
         
@@ -14,6 +29,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
+        self.burst_window = getattr(settings, 'NOTIFICATION_BURST_WINDOW', 0.05)
+        self.burst_max_size = getattr(settings, 'NOTIFICATION_BURST_MAX_SIZE', 100)
+        self.pending_notifications = []
+        self.flush_task = None
         self.room_group_name = f'user_{self.user.id}_notifications'
         
         # Join room group
@@ -32,6 +51,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         }))
     
     async def disconnect(self, close_code):
+        if getattr(self, 'flush_task', None):
+            self.flush_task.cancel()
         # Leave room group
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
@@ -46,36 +67,104 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         
         if message_type == 'mark_read':
             notification_id = text_data_json.get('notification_id')
+            count = None
             if notification_id:
-                success = await self.mark_notification_read(notification_id)
+                success, count = await self.mark_notification_read(notification_id)
                 await self.send(text_data=json.dumps({
                     'type': 'mark_read_response',
                     'success': success,
                     'notification_id': notification_id
                 }))
-            
-            # Send updated unread count
-            count = await self.get_unread_count()
+            await self.send_unread_count(count)
+        
+        elif message_type == 'mark_read_batch':
+            notification_ids = text_data_json.get('notification_ids')
+            try:
+                if not isinstance(notification_ids, list) or len(notification_ids) > MAX_MARK_READ_BATCH:
+                    raise ValueError
+                notification_ids = [int(notification_id) for notification_id in notification_ids]
+            except (TypeError, ValueError):
+                await self.send_error(f'notification_ids must be a list of at most {MAX_MARK_READ_BATCH} ids.')
+                return
+            marked, count = await self.mark_notifications_read(notification_ids=notification_ids)
             await self.send(text_data=json.dumps({
-                'type': 'unread_count',
-                'count': count
+                'type': 'mark_read_batch_response',
+                'marked': marked,
+                'notification_ids': notification_ids
             }))
+            await self.send_unread_count(count)
+        
+        elif message_type == 'mark_all_read':
+            try:
+                before = parse_before(text_data_json.get('before'))
+            except ValueError as e:
+                await self.send_error(str(e))
+                return
+            marked, count = await self.mark_notifications_read(before=before)
+            await self.send(text_data=json.dumps({
+                'type': 'mark_all_read_response',
+                'marked': marked
+            }))
+            await self.send_unread_count(count)
+    
+    async def send_unread_count(self, count=None):
+        if count is None:
+            count = await self.get_unread_count()
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'count': count
+        }))
+    
+    async def send_error(self, message):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'message': message
+        }))
     
     # Receive message from room group
     async def notification_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps(event))
+        if not self.burst_window:
+            await self.send(text_data=json.dumps(event))
+            return
+        self.pending_notifications.append(event['message'])
+        if len(self.pending_notifications) >= self.burst_max_size:
+            if self.flush_task:
+                self.flush_task.cancel()
+                self.flush_task = None
+            await self.flush_notifications()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_notifications_later())
+    
+    async def flush_notifications_later(self):
+        await asyncio.sleep(self.burst_window)
+        self.flush_task = None
+        await self.flush_notifications()
     
-    @database_sync_to_async
-    def get_unread_count(self):
-        return self.user.notifications.filter(is_read=False).count()
+    async def flush_notifications(self):
+        """Send the buffered notifications, as a single frame plus one count update when there are several."""
+        messages, self.pending_notifications = self.pending_notifications, []
+        if len(messages) == 1:
+            await self.send(text_data=json.dumps({
+                'type': 'notification_message',
+                'message': messages[0]
+            }))
+        elif messages:
+            await self.send(text_data=json.dumps({
+                'type': 'notification_batch',
+                'messages': messages
+            }))
+            await self.send_unread_count()
+    
+    # Database helpers, bounded by NOTIFICATION_DB_CONCURRENCY
+    async def get_unread_count(self):
+        # Denormalized counter, batched with other sockets' lookups
+        return await aget_unread_count(self.user.id)
     
-    @database_sync_to_async
-    def mark_notification_read(self, notification_id):
+    async def mark_notification_read(self, notification_id):
         try:
-            notification = self.user.notifications.get(id=notification_id)
-            notification.is_read = True
-            notification.save()
-            return True
+            return await amark_notification_read(self.user.id, notification_id)
         except Exception:
-            return False 
\ No newline at end of file
+            return False, None
+    
+    async def mark_notifications_read(self, notification_ids=None, before=None):
+        return await amark_notifications_read(self.user.id, notification_ids=notification_ids, before=before) 
\ No newline at end of file
@@ -0,0 +1,440 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS messages ('
+    'id INTEGER PRIMARY KEY, channel TEXT NOT NULL, process TEXT, payload BLOB NOT NULL, expires REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel, id)',
+    'CREATE INDEX IF NOT EXISTS messages_process ON messages (process, id)',
+    'CREATE INDEX IF NOT EXISTS messages_expires ON messages (expires)',
+    'CREATE TABLE IF NOT EXISTS group_members ('
+    'group_name TEXT NOT NULL, channel TEXT NOT NULL, process TEXT, joined REAL NOT NULL, '
+    'PRIMARY KEY (group_name, channel))',
+    'CREATE INDEX IF NOT EXISTS group_members_channel ON group_members (channel)',
+)
+
+# Stay well below SQLite's limit on bound parameters per statement
+MAX_PARAMS = 900
+
+
+def _process(channel):
+    """Process token of a specific channel (``prefix.<process>!<id>``), None for shared channels."""
+    if '!' not in channel:
+        return None
+    return channel[:channel.index('!')].rsplit('.', 1)[-1]
+
+
+def _serialize(message):
+    # msgpack like channels_redis: the file is shared, so payloads must not be able to run code when loaded
+    return msgpack.packb(message, use_bin_type=True)
+
+
+def _deserialize(payload):
+    return msgpack.unpackb(payload, raw=False)
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Channel layer shared by the ASGI worker processes of one host through a SQLite file.
+
+    Every process opens the same database (in WAL mode) and runs all its
+    queries on one dedicated thread. Messages for the specific channels of a
+    process (those of its websocket consumers) are tagged with the process
+    token, so a single poller per process fetches them all in one query and
+    hands them to the waiting consumers. The poller only queries when
+    ``PRAGMA data_version`` shows another process has written, or when this
+    process sent to one of its own channels, so an idle layer costs a
+    pragma every ``poll_interval`` seconds.
+
+    Supports the ``groups`` and ``flush`` extensions with the same capacity,
+    message expiry and group expiry semantics as the in-memory layer: sends
+    to a channel holding ``capacity`` messages raise ChannelFull, and a
+    channel whose message expires unread, in the file or in the buffer of
+    its process, leaves all its groups. Messages are serialized with
+    msgpack, so like with channels_redis they may only hold msgpack types.
+
+    Use it by setting ``CHANNEL_LAYER_DB`` to a path on a local disk; the
+    file must not be on a network share.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 poll_interval=0.005, cleanup_interval=1.0, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._pid = None
+
+    def _ensure_process(self):
+        """(Re)create the per-process state, also after the layer was inherited through fork()."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='channel-layer')
+        self._db = None
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._data_version = None
+        self._next_cleanup = 0
+        self._next_prune = 0
+        self._buffers = defaultdict(deque)
+        self._events = {}
+        self._waiting = defaultdict(int)
+        self._poller = None
+        self._poller_loop = None
+        self._wake = None
+
+    # Database access, always on the layer thread
+
+    def _connection(self):
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._db = db
+        return self._db
+
+    @contextmanager
+    def _write(self):
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            # A failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+
+    async def _run(self, function, *args):
+        self._ensure_process()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _run_write(self, function, *args):
+        """
+        Run ``function(db, *args)`` on the layer thread in a shared transaction.
+
+        Writes queued while the layer thread is busy are committed together,
+        so concurrent sends of one process cost a single commit.
+        """
+        self._ensure_process()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._pending_lock:
+            self._pending.append((function, args, loop, future))
+            first = len(self._pending) == 1
+        if first:
+            self._executor.submit(self._commit_pending)
+        return await future
+
+    def _commit_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        outcomes = []
+        try:
+            with self._write() as db:
+                for function, args, loop, future in pending:
+                    db.execute('SAVEPOINT layer_write')
+                    try:
+                        outcomes.append((function(db, *args), None))
+                        db.execute('RELEASE layer_write')
+                    except sqlite3.Error as e:
+                        db.execute('ROLLBACK TO layer_write')
+                        db.execute('RELEASE layer_write')
+                        outcomes.append((None, e))
+        except sqlite3.Error as e:
+            outcomes = [(None, e)] * len(pending)
+        for (function, args, loop, future), (result, error) in zip(pending, outcomes):
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def _insert(self, db, channels, payload, expires):
+        """Queue ``payload`` on every channel with room left, returning the channels that are full."""
+        now = time.time()
+        counts = {}
+        for start in range(0, len(channels), MAX_PARAMS):
+            chunk = channels[start:start + MAX_PARAMS]
+            counts.update(db.execute(
+                f'SELECT channel, COUNT(*) FROM messages WHERE channel IN ({",".join("?" * len(chunk))}) '
+                f'AND expires > ? GROUP BY channel', [*chunk, now]
+            ))
+        full = [channel for channel in channels if counts.get(channel, 0) >= self.get_capacity(channel)]
+        skipped = set(full)
+        db.executemany(
+            'INSERT INTO messages (channel, process, payload, expires) VALUES (?, ?, ?, ?)',
+            [(channel, _process(channel), payload, expires) for channel in channels if channel not in skipped]
+        )
+        return full
+
+    def _db_send(self, db, channel, payload, expires):
+        return self._insert(db, [channel], payload, expires)
+
+    def _db_group_send(self, db, group, payload, expires):
+        """Queue ``payload`` on every live member of a group, returning whether one belongs to this process."""
+        now = time.time()
+        if self.channel_capacity:
+            channels = [channel for channel, in db.execute(
+                'SELECT channel FROM group_members WHERE group_name = ? AND joined > ?',
+                (group, now - self.group_expiry)
+            )]
+            self._insert(db, channels, payload, expires)
+        else:
+            # Same capacity everywhere: fan out with a single statement
+            db.execute(
+                'INSERT INTO messages (channel, process, payload, expires) '
+                'SELECT g.channel, g.process, ?, ? FROM group_members g '
+                'WHERE g.group_name = ? AND g.joined > ? AND ('
+                'SELECT COUNT(*) FROM messages m WHERE m.channel = g.channel AND m.expires > ?) < ?',
+                (payload, expires, group, now - self.group_expiry, now, self.capacity)
+            )
+        return db.execute('SELECT 1 FROM group_members WHERE group_name = ? AND process = ?',
+                          (group, self.client_prefix)).fetchone() is not None
+
+    def _db_take(self, channel):
+        """Pop the oldest unexpired message of a shared channel."""
+        db = self._connection()
+        query = 'SELECT id, payload FROM messages WHERE channel = ? AND expires > ? ORDER BY id LIMIT 1'
+        if db.execute(query, (channel, time.time())).fetchone() is None:
+            return None
+        with self._write() as db:
+            row = db.execute(query, (channel, time.time())).fetchone()
+            if row:
+                db.execute('DELETE FROM messages WHERE id = ?', (row[0],))
+        return row and row[1]
+
+    def _db_take_local(self, force):
+        """Pop every message queued for this process's channels, if anything may have changed."""
+        db = self._connection()
+        now = time.time()
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + self.cleanup_interval
+            with self._write() as db:
+                # Channels whose messages expired unread are gone; drop them from their groups
+                db.execute(
+                    'DELETE FROM group_members WHERE joined < ? '
+                    'OR channel IN (SELECT channel FROM messages WHERE expires < ?)',
+                    (now - self.group_expiry, now)
+                )
+                db.execute('DELETE FROM messages WHERE expires < ?', (now,))
+            force = True
+        version = db.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._data_version and not force:
+            return []
+        self._data_version = version
+        # Only this process consumes these rows, so read them without the write lock
+        rows = db.execute(
+            'SELECT id, channel, payload, expires FROM messages WHERE process = ? ORDER BY id',
+            (self.client_prefix,)
+        ).fetchall()
+        if rows:
+            with self._write() as db:
+                db.execute('DELETE FROM messages WHERE process = ? AND id <= ?', (self.client_prefix, rows[-1][0]))
+        return rows
+
+    def _db_group_add(self, db, group, channel):
+        db.execute('INSERT OR REPLACE INTO group_members (group_name, channel, process, joined) '
+                   'VALUES (?, ?, ?, ?)', (group, channel, _process(channel), time.time()))
+
+    def _db_group_discard(self, db, group, channel):
+        db.execute('DELETE FROM group_members WHERE group_name = ? AND channel = ?', (group, channel))
+
+    def _db_leave_groups(self, db, channels):
+        for start in range(0, len(channels), MAX_PARAMS):
+            chunk = channels[start:start + MAX_PARAMS]
+            db.execute(f'DELETE FROM group_members WHERE channel IN ({",".join("?" * len(chunk))})', chunk)
+
+    def _db_flush(self):
+        with self._write() as db:
+            db.execute('DELETE FROM messages')
+            db.execute('DELETE FROM group_members')
+
+    def _db_close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # Local delivery
+
+    def _start_poller(self):
+        if self._poller is None or self._poller.done():
+            self._poller_loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._poller = self._poller_loop.create_task(self._poll())
+
+    def _wake_poller(self):
+        """Make the poller look now, after this process sent to one of its own channels."""
+        loop = self._poller_loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake.set()
+        else:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    async def _prune_buffers(self):
+        """
+        Drop the buffered messages that expired unread, every ``cleanup_interval`` seconds.
+
+        They were already taken from the file, so the file cleanup cannot see
+        them: channels nobody receives on any more, e.g. of a consumer that
+        disconnected without leaving its groups, are removed from their groups here.
+        """
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.cleanup_interval
+        expired = []
+        for channel, buffer in list(self._buffers.items()):
+            if buffer and buffer[0][0] <= now:
+                while buffer and buffer[0][0] <= now:
+                    buffer.popleft()
+                if channel not in self._waiting:
+                    expired.append(channel)
+            if not buffer and channel not in self._waiting:
+                del self._buffers[channel]
+        if expired:
+            try:
+                await self._run_write(self._db_leave_groups, expired)
+            except sqlite3.Error as e:
+                logger.error(f"Channel layer cleanup failed: {str(e)}")
+
+    async def _poll(self):
+        force = True
+        while self._waiting:
+            self._wake.clear()
+            await self._prune_buffers()
+            try:
+                rows = await self._run(self._db_take_local, force)
+            except sqlite3.Error as e:
+                logger.error(f"Channel layer poll failed: {str(e)}")
+                rows = []
+            for pk, channel, payload, expires in rows:
+                buffer = self._buffers[channel]
+                if len(buffer) >= self.get_capacity(channel):
+                    logger.warning(f"Channel layer dropped a message for {channel}: buffer full")
+                    continue
+                buffer.append((expires, _deserialize(payload)))
+                event = self._events.pop(channel, None)
+                if event is not None:
+                    event.set()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                force = False
+            else:
+                force = True
+
+    async def _receive_local(self, channel):
+        self._ensure_process()
+        self._waiting[channel] += 1
+        try:
+            while True:
+                buffer = self._buffers[channel]
+                while buffer:
+                    expires, message = buffer.popleft()
+                    if expires > time.time():
+                        return message
+                self._start_poller()
+                await self._events.setdefault(channel, asyncio.Event()).wait()
+        finally:
+            self._waiting[channel] -= 1
+            if not self._waiting[channel]:
+                del self._waiting[channel]
+                self._events.pop(channel, None)
+                if not self._buffers[channel]:
+                    del self._buffers[channel]
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        """Send a message onto a (general or specific) channel."""
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        if await self._run_write(self._db_send, channel, _serialize(message), time.time() + self.expiry):
+            raise ChannelFull(channel)
+        if _process(channel) == self.client_prefix:
+            self._wake_poller()
+
+    async def receive(self, channel):
+        """Receive the first message that arrives on the channel."""
+        self.require_valid_channel_name(channel)
+        if '!' in channel:
+            return await self._receive_local(channel)
+        delay = 0.001
+        while True:
+            payload = await self._run(self._db_take, channel)
+            if payload is not None:
+                return _deserialize(payload)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    async def new_channel(self, prefix='specific'):
+        """Return a new channel name that can be used by something in this process."""
+        self._ensure_process()
+        return f'{prefix}.{self.client_prefix}!{uuid.uuid4().hex}'
+
+    async def flush(self):
+        await self._run(self._db_flush)
+        self._buffers.clear()
+
+    async def close(self):
+        if self._pid != os.getpid():
+            return
+        if self._poller is not None:
+            self._poller.cancel()
+        await self._run(self._db_close)
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        """Add the channel name to a group."""
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run_write(self._db_group_add, group, channel)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        await self._run_write(self._db_group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        """Send a message to every channel of a group in one transaction; full channels are skipped."""
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.require_valid_group_name(group)
+        if await self._run_write(self._db_group_send, group, _serialize(message), time.time() + self.expiry):
+            self._wake_poller()
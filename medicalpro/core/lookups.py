@@ -0,0 +1,127 @@
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'core:lookup_version:{label}'
+
+
+class LookupTable:
+    """
+    Process-local copy of a small, rarely changing table.
+
+    Rows are loaded once per process and exposed as name -> id and
+    id -> object maps. Saving or deleting a row bumps a version counter in
+    the shared cache; every process compares its copy against that counter
+    at most once per ``LOOKUP_CACHE_CHECK_INTERVAL`` seconds and reloads
+    when it changed. A lookup that misses reloads the table before giving
+    up, so a row another process just added is found within that interval
+    too; those reloads happen at most once per
+    ``LOOKUP_MISS_RELOAD_INTERVAL`` seconds, so repeated lookups of unknown
+    names or ids cannot turn into a full table load each.
+    """
+
+    def __init__(self, model_label, key_field='name'):
+        self.model_label = model_label
+        self.key_field = key_field
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._miss_reloaded_at = None
+        self._by_id = {}
+        self._ids_by_key = {}
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def version_key(self):
+        return VERSION_KEY.format(label=self.model_label.lower())
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        interval = getattr(settings, 'LOOKUP_CACHE_CHECK_INTERVAL', 5)
+        if not force and self._version is not None and now - self._checked_at < interval:
+            return
+        version = cache.get(self.version_key, 0)
+        with self._lock:
+            self._checked_at = now
+            if not force and version == self._version:
+                return
+            objects = list(self.model.objects.all())
+            self._by_id = {obj.pk: obj for obj in objects}
+            self._ids_by_key = {getattr(obj, self.key_field): obj.pk for obj in objects}
+            self._version = version
+
+    def _reload_on_miss(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'LOOKUP_MISS_RELOAD_INTERVAL', 1)
+        with self._lock:
+            if self._miss_reloaded_at is not None and now - self._miss_reloaded_at < interval:
+                return
+            self._miss_reloaded_at = now
+        self._refresh(force=True)
+
+    def reset_miss_throttle(self):
+        """Let the next miss of this process reload the table at once."""
+        with self._lock:
+            self._miss_reloaded_at = None
+
+    def invalidate(self):
+        """Force every process to reload the table on its next version check."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, 1, timeout=None)
+        with self._lock:
+            self._version = None
+            self._miss_reloaded_at = None
+
+    def get(self, pk):
+        """Return the row with the given id, raising ``DoesNotExist`` if unknown."""
+        self._refresh()
+        if pk not in self._by_id:
+            self._reload_on_miss()
+        try:
+            return self._by_id[pk]
+        except KeyError:
+            raise self.model.DoesNotExist(f'{self.model_label} {pk} does not exist')
+
+    def get_by_name(self, name):
+        return self.get(self.id_for(name))
+
+    def id_for(self, name):
+        """Return the id of the row named ``name``, raising ``DoesNotExist`` if unknown."""
+        self._refresh()
+        if name not in self._ids_by_key:
+            self._reload_on_miss()
+        try:
+            return self._ids_by_key[name]
+        except KeyError:
+            raise self.model.DoesNotExist(f'{self.model_label} {name!r} does not exist')
+
+    def ids(self, names):
+        """Return the ids of the known rows among ``names``, for ``<fk>_id__in`` filters."""
+        names = list(names)
+        self._refresh()
+        if any(name not in self._ids_by_key for name in names):
+            self._reload_on_miss()
+        return [self._ids_by_key[name] for name in names if name in self._ids_by_key]
+
+    def name_for(self, pk):
+        return getattr(self.get(pk), self.key_field)
+
+    def all(self):
+        self._refresh()
+        return list(self._by_id.values())
+
+
+appointment_statuses = LookupTable('appointments.AppointmentStatus')
+specialties = LookupTable('doctors.Specialty')
+roles = LookupTable('accounts.Role')
+permissions = LookupTable('accounts.Permission')
+
+LOOKUP_TABLES = [appointment_statuses, specialties, roles, permissions]
@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from medicalpro.core.layers import SQLiteChannelLayer
+
+GROUP = 'benchmark'
+
+# Seconds any process waits for the others before giving up
+TIMEOUT = 120
+
+
+async def _run_worker(path, index, workers, messages, fanout, channels, peers, barrier, results):
+    layer = SQLiteChannelLayer(path, capacity=messages + fanout)
+    channel = await layer.new_channel('benchmark')
+    await layer.group_add(GROUP, channel)
+    channels.put((index, channel))
+    target = peers.get(timeout=TIMEOUT)[(index + 1) % workers]
+
+    async def send_all():
+        for number in range(messages):
+            await layer.send(target, {'type': 'benchmark.message', 'number': number})
+
+    # Point to point: every worker sends to the next one and receives from the previous one
+    barrier.wait(TIMEOUT)
+    started = time.perf_counter()
+    sender = asyncio.ensure_future(send_all())
+    for _ in range(messages):
+        await asyncio.wait_for(layer.receive(channel), TIMEOUT)
+    await sender
+    elapsed = time.perf_counter() - started
+
+    # Fan-out: the parent sends to the group the workers joined
+    barrier.wait(TIMEOUT)
+    latencies = []
+    for _ in range(fanout):
+        message = await asyncio.wait_for(layer.receive(channel), TIMEOUT)
+        latencies.append((time.time() - message['sent']) * 1000)
+    await layer.close()
+    results.put((elapsed, latencies))
+
+
+def _worker(*args):
+    asyncio.run(_run_worker(*args))
+
+
+async def _fan_out(path, fanout, interval):
+    layer = SQLiteChannelLayer(path)
+    for number in range(fanout):
+        await layer.group_send(GROUP, {'type': 'benchmark.message', 'number': number, 'sent': time.time()})
+        await asyncio.sleep(interval)
+    await layer.close()
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput and group fan-out latency of SQLiteChannelLayer across worker processes '
+            'sharing one database file')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes')
+        parser.add_argument('--messages', type=int, default=2000, help='Messages each worker sends and receives')
+        parser.add_argument('--fanout', type=int, default=200, help='Group messages sent to every worker')
+        parser.add_argument('--interval', type=float, default=0.005, help='Seconds between group messages')
+
+    def handle(self, *args, **options):
+        workers, messages, fanout = options['workers'], options['messages'], options['fanout']
+        # spawn, as the layer's worker thread and sqlite connections must not be inherited
+        context = multiprocessing.get_context('spawn')
+        channels, peers, results = context.Queue(), context.Queue(), context.Queue()
+        barrier = context.Barrier(workers + 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'layer.db')
+            processes = [
+                context.Process(target=_worker, args=(path, index, workers, messages, fanout, channels, peers,
+                                                      barrier, results))
+                for index in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            try:
+                members = dict(channels.get(timeout=TIMEOUT) for _ in range(workers))
+                for _ in range(workers):
+                    peers.put(members)
+                barrier.wait(TIMEOUT)
+                barrier.wait(TIMEOUT)
+                asyncio.run(_fan_out(path, fanout, options['interval']))
+                outcomes = [results.get(timeout=TIMEOUT) for _ in range(workers)]
+            finally:
+                for process in processes:
+                    process.join(5)
+                    if process.is_alive():
+                        process.terminate()
+
+        slowest = max(elapsed for elapsed, _ in outcomes)
+        latencies = [latency for _, worker_latencies in outcomes for latency in worker_latencies]
+        self.stdout.write(f'{workers} worker processes, {messages} messages each, {fanout} group messages')
+        self.stdout.write(f'point to point {workers * messages / slowest:9.0f} messages/s '
+                          f'({workers * messages} messages in {slowest * 1000:.0f} ms)')
+        self.stdout.write(f'fan-out latency  median {statistics.median(latencies):6.2f} ms  '
+                          f'p95 {_percentile(latencies, 0.95):6.2f} ms  max {max(latencies):6.2f} ms')
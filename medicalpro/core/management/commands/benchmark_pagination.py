@@ -0,0 +1,73 @@
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.pagination import KeysetPagination
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches, timed
+
+# Same ordering as Appointment.Meta.ordering, with the id tiebreaker KeysetPagination appends
+ORDERING = ('-appointment_date', '-start_time', '-id')
+
+
+class Command(BaseCommand):
+    help = ('Compare the latency of deep pages served with OFFSET and with KeysetPagination, '
+            'on synthetic appointments rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=100000, help='Appointments to paginate')
+        parser.add_argument('--page-size', type=int, default=50, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests timed per page and path')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['appointments'], options['page_size'], options['repeat'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, total, page_size, repeat):
+        create_statuses()
+        reset_process_caches()
+        doctor = create_doctor()
+        patient = create_patient()
+        scheduled = appointment_statuses.id_for('Scheduled')
+        first_day = date(2030, 1, 7)
+        # Four appointments share each start time, so the id tiebreaker matters
+        Appointment.objects.bulk_create([
+            Appointment(doctor=doctor, patient=patient, appointment_date=first_day + timedelta(days=number // 128),
+                        start_time=time(8 + number % 128 // 16, number % 16 // 4 * 15),
+                        end_time=time(8 + number % 128 // 16, number % 16 // 4 * 15 + 14),
+                        status_id=scheduled, created_by_id=patient.user_id)
+            for number in range(total)
+        ], batch_size=1000)
+
+        appointments = Appointment.objects.all()
+        factory = APIRequestFactory()
+        paginator = KeysetPagination()
+        self.stdout.write(f'{total} appointments, {page_size} rows per page, {repeat} requests per page and path')
+        self.stdout.write(f'{"page":>8} {"OFFSET":>12} {"keyset":>12}')
+        pages = sorted({0, 10, 100, 1000, total // page_size // 2, total // page_size - 1})
+        for page in pages:
+            offset = page * page_size
+            if offset >= total:
+                continue
+
+            def offset_page():
+                list(appointments.order_by(*ORDERING)[offset:offset + page_size])
+
+            cursor = None
+            if offset:
+                # The cursor the previous page's next link carries
+                previous = appointments.order_by(*ORDERING)[offset - 1]
+                cursor = paginator.encode_cursor([previous.appointment_date, previous.start_time, previous.id])
+            request = Request(factory.get('/', {'page_size': page_size, 'cursor': cursor} if cursor
+                                          else {'page_size': page_size}))
+
+            def keyset_page():
+                KeysetPagination().paginate_queryset(appointments, request)
+
+            self.stdout.write(f'{page:>8} {timed(offset_page, repeat):9.2f} ms {timed(keyset_page, repeat):9.2f} ms')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from medicalpro.core.outbox import OUTBOX_BATCH_SIZE, run_outbox_workers
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification emails with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of worker threads, each with its own mail connection per batch')
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE,
+                            help='Maximum number of emails sent over one mail connection')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before checking an empty outbox again')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the outbox has no due emails left')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Sending outbox emails...')
+        try:
+            sent, failed = run_outbox_workers(
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                once=options['once'],
+                poll_interval=options['poll_interval']
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Outbox workers stopped.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
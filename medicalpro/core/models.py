@@ -45,6 +45,9 @@ class APILog(models.Model):
     class Meta:
         db_table = 'api_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_log_keyset_idx'),
+        ]
 
 
 class ErrorLog(models.Model):
@@ -151,4 +154,36 @@ class ContactMessage(models.Model):
     
     class Meta:
         db_table = 'contact_messages'
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at'] 
+
+
+class OutboxEmail(models.Model):
+    EMAIL_STATUS_CHOICES = (
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    )
+    
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=255, blank=True, null=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} - {self.status}"
+    
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
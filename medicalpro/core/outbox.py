@@ -0,0 +1,216 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from medicalpro.core.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 50
+
+
+def enqueue_email(recipient, subject, body, html_body=None, from_email=None):
+    """
+    Store an email for the outbox workers instead of sending it in the request.
+
+    The row is written in the caller's transaction, so an email about a change
+    that is rolled back is never sent.
+
+    Returns:
+        OutboxEmail: The queued email
+    """
+    return OutboxEmail.objects.create(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL
+    )
+
+
+def _due(now):
+    return OutboxEmail.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        status='Pending',
+        next_attempt_at__lte=now
+    )
+
+
+def claim_batch(worker_id, size=OUTBOX_BATCH_SIZE):
+    """
+    Lock up to ``size`` due emails for one worker.
+
+    The candidates are claimed with a conditional UPDATE, so concurrent
+    workers never get the same row. A claim expires after
+    ``EMAIL_OUTBOX_LOCK_TIMEOUT`` seconds (300), letting another worker pick
+    up the emails of one that died mid-batch; ``deliver_batch`` renews it
+    before each email.
+
+    Returns:
+        list: The claimed OutboxEmail rows, oldest first
+    """
+    now = timezone.now()
+    ids = list(_due(now).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:size])
+    if not ids:
+        return []
+    claim = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    _due(now).filter(id__in=ids).update(claimed_by=claim, locked_until=_lock_expiry(now))
+    return list(OutboxEmail.objects.filter(claimed_by=claim, status='Pending').order_by('id'))
+
+
+def _lock_expiry(now):
+    return now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LOCK_TIMEOUT', 300))
+
+
+def _claimed(email):
+    """The row of ``email`` as long as this worker's claim on it still holds."""
+    return OutboxEmail.objects.filter(id=email.id, claimed_by=email.claimed_by, status='Pending')
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'EMAIL_RETRY_BASE_DELAY', 30)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'EMAIL_RETRY_MAX_DELAY', 60 * 60))
+
+
+def _record_failure(email, error):
+    attempts = email.attempts + 1
+    exhausted = attempts >= getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+    _claimed(email).update(
+        status='Failed' if exhausted else 'Pending',
+        attempts=attempts,
+        next_attempt_at=timezone.now() + timedelta(seconds=_retry_delay(attempts)),
+        claimed_by=None,
+        locked_until=None,
+        last_error=str(error)
+    )
+    if exhausted:
+        logger.error(f"Giving up on email {email.id} to {email.recipient} after {attempts} attempts: {error}")
+
+
+def deliver_batch(emails):
+    """
+    Send claimed emails over a single mail backend connection.
+
+    The claim on each email is renewed just before it is sent, and the email
+    is marked sent right after, so a slow batch neither outlives its claim
+    nor gets re-sent from the start by a worker reclaiming it. Emails whose
+    claim was lost to another worker are skipped, and every update is
+    conditional on the claim. A failed email is retried after
+    ``EMAIL_RETRY_BASE_DELAY`` seconds (30), doubling per attempt up to
+    ``EMAIL_RETRY_MAX_DELAY`` (an hour), and marked failed after
+    ``EMAIL_MAX_ATTEMPTS`` (5) attempts. The connection is reopened after an
+    error so one broken session does not fail the rest of the batch.
+
+    Returns:
+        tuple: ``(sent, failed)`` counts
+    """
+    mail_connection = get_connection()
+    sent, failed = 0, 0
+    try:
+        mail_connection.open()
+    except Exception as e:
+        logger.error(f"Failed to open mail connection: {str(e)}")
+        for email in emails:
+            _record_failure(email, e)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            if not _claimed(email).update(locked_until=_lock_expiry(timezone.now())):
+                logger.warning(f"Skipping email {email.id}: its claim expired and another worker took it")
+                continue
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=[email.recipient],
+                connection=mail_connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                logger.error(f"Failed to send email {email.id}: {str(e)}")
+                _record_failure(email, e)
+                failed += 1
+                mail_connection.close()
+            else:
+                _claimed(email).update(status='Sent', sent_at=timezone.now(), claimed_by=None, locked_until=None)
+                sent += 1
+    finally:
+        mail_connection.close()
+    return sent, failed
+
+
+class OutboxWorker(threading.Thread):
+    """Thread claiming and delivering batches of outbox emails until stopped or, with ``once``, drained."""
+
+    def __init__(self, worker_id, batch_size, once, poll_interval, stop_event):
+        super().__init__(name=worker_id, daemon=True)
+        self.worker_id = worker_id
+        self.batch_size = batch_size
+        self.once = once
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event
+        self.sent = 0
+        self.failed = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    emails = claim_batch(self.worker_id, self.batch_size)
+                    if emails:
+                        sent, failed = deliver_batch(emails)
+                        self.sent += sent
+                        self.failed += failed
+                        continue
+                except Exception as e:
+                    logger.error(f"Outbox worker {self.worker_id} error: {str(e)}")
+                if self.once:
+                    break
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+
+def run_outbox_workers(workers=4, batch_size=OUTBOX_BATCH_SIZE, once=False, poll_interval=1.0, stop_event=None):
+    """
+    Drain the email outbox with a pool of worker threads.
+
+    Each worker claims up to ``batch_size`` due emails at a time and sends
+    them over one mail connection, so an SMTP session is set up per batch
+    rather than per email. Workers poll every ``poll_interval`` seconds when
+    the outbox is empty; with ``once`` they return as soon as it is.
+
+    Returns:
+        tuple: ``(sent, failed)`` counts over all workers
+    """
+    stop_event = stop_event or threading.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    pool = [
+        OutboxWorker(f'{prefix}:{number}', batch_size, once, poll_interval, stop_event)
+        for number in range(workers)
+    ]
+    for worker in pool:
+        worker.start()
+    try:
+        for worker in pool:
+            while worker.is_alive():
+                worker.join(0.5)
+    finally:
+        stop_event.set()
+        for worker in pool:
+            worker.join()
+    return sum(worker.sent for worker in pool), sum(worker.failed for worker in pool)
@@ -0,0 +1,159 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a multi-column ordering.
+
+    Pages are selected with ``WHERE (a, b, id) < (:a, :b, :id)``-style
+    conditions instead of ``OFFSET``, and no ``COUNT(*)`` is run, so deep
+    pages cost the same as the first one. The ordering comes from
+    ``ordering`` on the paginator, then ``ordering`` on the view, then the
+    model's ``Meta.ordering``; ``pk`` in it stands for the concrete primary
+    key, which is appended as a tiebreaker in the direction of the last
+    column when missing. Cursors are opaque, URL-safe tokens.
+
+    Select it per view with ``pagination_class = KeysetPagination``.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, queryset, view):
+        ordering = list(self.ordering or getattr(view, 'ordering', None) or queryset.model._meta.ordering)
+        pk_name = queryset.model._meta.pk.name
+        # The cursor values are parsed with get_field(), which does not know the pk alias
+        ordering = [field.replace('pk', pk_name) if field.lstrip('-') == 'pk' else field for field in ordering]
+        if not any(field.lstrip('-') == pk_name for field in ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f"-{pk_name}" if descending else pk_name)
+        return ordering
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, request, model, ordering):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            raw_values = payload['v']
+            if len(raw_values) != len(ordering):
+                raise ValueError('Cursor does not match the ordering')
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, raw_values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    @staticmethod
+    def seek_condition(ordering, values, reverse=False):
+        """
+        Build the filter selecting rows strictly after ``values`` in ``ordering``.
+
+        The OR of the per-column conditions is ANDed with an inclusive bound
+        on the first column, which it implies, so the database can start an
+        index range scan at the cursor instead of filtering every row before it.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= equal & Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+            equal &= Q(**{name: value})
+        name = ordering[0].lstrip('-')
+        descending = ordering[0].startswith('-') != reverse
+        return Q(**{f'{name}__lte' if descending else f'{name}__gte': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        values, reverse = self.decode_cursor(request, queryset.model, self.ordering)
+
+        order_by = self.ordering
+        if reverse:
+            order_by = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        if values is not None:
+            queryset = queryset.filter(self.seek_condition(self.ordering, values, reverse))
+
+        rows = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking backwards, "more" rows lie before the page; otherwise after it
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        self.first_values = self._values(rows[0]) if rows else None
+        self.last_values = self._values(rows[-1]) if rows else None
+        return rows
+
+    def _values(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_values))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.first_values is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.first_values, reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
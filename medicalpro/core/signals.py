@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from medicalpro.core.lookups import LOOKUP_TABLES
+
+
+def _invalidator(table):
+    def invalidate_lookup_table(sender, instance, **kwargs):
+        # Rows written by this process are found by its next miss, even before the commit
+        table.reset_miss_throttle()
+        transaction.on_commit(table.invalidate)
+    return invalidate_lookup_table
+
+
+for lookup_table in LOOKUP_TABLES:
+    handler = _invalidator(lookup_table)
+    post_save.connect(handler, sender=lookup_table.model_label, weak=False)
+    post_delete.connect(handler, sender=lookup_table.model_label, weak=False)
@@ -0,0 +1,96 @@
+"""
+Builders for the rows most tests and benchmark commands need, and helpers they share.
+
+The builders write through the ORM, so the signal handlers keeping the
+indexes, rollups and caches in sync run as they do in production.
+"""
+import itertools
+import time as clock
+from datetime import time
+
+from medicalpro.accounts.models import Role, User, UserProfile
+
+# Seeded by medical_seed_data.sql
+APPOINTMENT_STATUSES = (
+    'Scheduled', 'Confirmed', 'In Progress', 'Completed', 'Cancelled', 'No-show', 'Rescheduled', 'Waiting',
+    'Declined',
+)
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+
+_sequence = itertools.count(1)
+
+
+def create_statuses():
+    from medicalpro.appointments.models import AppointmentStatus
+
+    return {
+        name: AppointmentStatus.objects.get_or_create(name=name)[0]
+        for name in APPOINTMENT_STATUSES
+    }
+
+
+def create_user(role='patient', first_name='Test', last_name=None, **extra_fields):
+    number = next(_sequence)
+    role = Role.objects.get_or_create(name=role)[0]
+    # No password: hashing one dominates the setup of the benchmark commands
+    user = User.objects.create_user(email=f'user{number}@example.com', role=role, **extra_fields)
+    UserProfile.objects.create(user=user, first_name=first_name, last_name=last_name or f'User{number}')
+    return user
+
+
+def create_doctor(specialty='Cardiology', days=WEEKDAYS, start=time(9), end=time(17), **profile):
+    """A doctor working ``start`` to ``end`` on each of ``days``."""
+    from medicalpro.doctors.models import Doctor, DoctorAvailability, Specialty
+
+    user = create_user(role='doctor', **profile)
+    doctor = Doctor.objects.create(
+        user=user,
+        specialty=Specialty.objects.get_or_create(name=specialty)[0],
+        license_number=f'LIC-{user.id}',
+        consultation_fee=50
+    )
+    DoctorAvailability.objects.bulk_create([
+        DoctorAvailability(doctor=doctor, day_of_week=day, start_time=start, end_time=end)
+        for day in days
+    ])
+    return doctor
+
+
+def create_patient(**profile):
+    from medicalpro.patients.models import Patient
+
+    return Patient.objects.create(user=create_user(role='patient', **profile))
+
+
+def create_appointment(doctor, patient, date, start, end, status='Scheduled', **fields):
+    from medicalpro.appointments.models import Appointment
+    from medicalpro.core.lookups import appointment_statuses
+
+    fields.setdefault('created_by_id', patient.user_id)
+    return Appointment.objects.create(
+        doctor=doctor,
+        patient=patient,
+        appointment_date=date,
+        start_time=start,
+        end_time=end,
+        status_id=appointment_statuses.id_for(status),
+        **fields
+    )
+
+
+def reset_process_caches():
+    """Forget the per-process copies of rows a previous test rolled back."""
+    from medicalpro.appointments.conflicts import conflict_index
+    from medicalpro.core.lookups import LOOKUP_TABLES
+
+    conflict_index.clear()
+    for table in LOOKUP_TABLES:
+        table.invalidate()
+
+
+def timed(function, repeat=1):
+    """Average wall time of ``repeat`` calls of ``function``, in milliseconds."""
+    started = clock.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (clock.perf_counter() - started) * 1000 / repeat
@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase, override_settings
+
+from medicalpro.core.checks import check_notification_streams
+
+IN_MEMORY = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+SQLITE = {'default': {'BACKEND': 'medicalpro.core.layers.SQLiteChannelLayer', 'CONFIG': {'path': 'layer.db'}}}
+
+
+class NotificationStreamCheckTests(SimpleTestCase):
+    @override_settings(CHANNEL_LAYERS=IN_MEMORY)
+    def test_warns_about_the_in_memory_layer(self):
+        self.assertEqual([message.id for message in check_notification_streams(None)], ['core.W002'])
+
+    @override_settings(CHANNEL_LAYERS=SQLITE)
+    def test_shared_layers_pass(self):
+        self.assertEqual(check_notification_streams(None), [])
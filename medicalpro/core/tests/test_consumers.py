@@ -0,0 +1,55 @@
+import asyncio
+import json
+from unittest import IsolatedAsyncioTestCase, mock
+
+from medicalpro.core.consumers import NotificationConsumer
+
+
+def event(number):
+    return {'type': 'notification_message', 'message': {'id': number, 'title': f'Notice {number}'}}
+
+
+class NotificationBurstTests(IsolatedAsyncioTestCase):
+    def consumer(self, window=0.02, max_size=3):
+        consumer = NotificationConsumer()
+        consumer.burst_window = window
+        consumer.burst_max_size = max_size
+        consumer.pending_notifications = []
+        consumer.flush_task = None
+        consumer.send = mock.AsyncMock()
+        consumer.get_unread_count = mock.AsyncMock(return_value=5)
+        return consumer
+
+    def frames(self, consumer):
+        return [json.loads(call.kwargs['text_data']) for call in consumer.send.call_args_list]
+
+    async def test_a_lone_notification_keeps_its_frame(self):
+        consumer = self.consumer()
+        await consumer.notification_message(event(1))
+        self.assertEqual(self.frames(consumer), [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.frames(consumer), [{'type': 'notification_message', 'message': event(1)['message']}])
+
+    async def test_a_burst_becomes_one_batch_and_one_count(self):
+        consumer = self.consumer()
+        await consumer.notification_message(event(1))
+        await consumer.notification_message(event(2))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.frames(consumer), [
+            {'type': 'notification_batch', 'messages': [event(1)['message'], event(2)['message']]},
+            {'type': 'unread_count', 'count': 5},
+        ])
+
+    async def test_a_full_buffer_is_sent_at_once(self):
+        consumer = self.consumer(window=10)
+        for number in range(3):
+            await consumer.notification_message(event(number))
+        self.assertEqual(len(self.frames(consumer)[0]['messages']), 3)
+        self.assertIsNone(consumer.flush_task)
+
+    async def test_no_window_sends_every_event(self):
+        consumer = self.consumer(window=0)
+        await consumer.notification_message(event(1))
+        await consumer.notification_message(event(2))
+        self.assertEqual(self.frames(consumer), [event(1), event(2)])
+        consumer.get_unread_count.assert_not_called()
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import msgpack
+from channels.exceptions import ChannelFull
+
+from medicalpro.core.layers import SQLiteChannelLayer
+
+
+class FailingCommitConnection:
+    """sqlite3 connection whose next COMMIT fails like a busy database."""
+
+    def __init__(self, db):
+        self.db = db
+        self.fail_commit = True
+
+    @property
+    def in_transaction(self):
+        return self.db.in_transaction
+
+    def execute(self, sql, *args):
+        if sql == 'COMMIT' and self.fail_commit:
+            self.fail_commit = False
+            raise sqlite3.OperationalError('database is locked')
+        return self.db.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+class SQLiteChannelLayerTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'layer.db')
+
+    def layer(self, **config):
+        layer = SQLiteChannelLayer(self.path, **config)
+        self.addAsyncCleanup(layer.close)
+        return layer
+
+    def stored_payloads(self):
+        with sqlite3.connect(self.path) as db:
+            return [payload for payload, in db.execute('SELECT payload FROM messages')]
+
+    async def test_messages_are_stored_as_msgpack(self):
+        layer = self.layer()
+        await layer.send('shared', {'type': 'test.message', 'text': 'hello', 'ids': [1, 2]})
+        self.assertEqual(msgpack.unpackb(self.stored_payloads()[0], raw=False),
+                         {'type': 'test.message', 'text': 'hello', 'ids': [1, 2]})
+        self.assertEqual(await layer.receive('shared'), {'type': 'test.message', 'text': 'hello', 'ids': [1, 2]})
+
+    async def test_group_messages_reach_specific_channels(self):
+        sender, receiver = self.layer(), self.layer()
+        channel = await receiver.new_channel()
+        await receiver.group_add('notifications', channel)
+        await sender.group_send('notifications', {'type': 'notification.message', 'id': 7})
+        message = await asyncio.wait_for(receiver.receive(channel), 5)
+        self.assertEqual(message, {'type': 'notification.message', 'id': 7})
+
+    async def test_layers_of_two_processes_deliver_group_messages_to_each_other(self):
+        first, second = self.layer(), self.layer()
+        first_channel, second_channel = await first.new_channel(), await second.new_channel()
+        self.assertNotEqual(first.client_prefix, second.client_prefix)
+        await first.group_add('notifications', first_channel)
+        await second.group_add('notifications', second_channel)
+
+        await first.group_send('notifications', {'type': 'notification.message', 'id': 1})
+        await second.group_send('notifications', {'type': 'notification.message', 'id': 2})
+        for layer, channel in ((first, first_channel), (second, second_channel)):
+            received = [await asyncio.wait_for(layer.receive(channel), 5) for _ in range(2)]
+            self.assertEqual([message['id'] for message in received], [1, 2])
+        self.assertEqual(self.stored_payloads(), [])
+
+    async def test_send_to_a_full_channel_raises(self):
+        layer = self.layer(capacity=2)
+        await layer.send('shared', {'type': 'first'})
+        await layer.send('shared', {'type': 'second'})
+        with self.assertRaises(ChannelFull):
+            await layer.send('shared', {'type': 'third'})
+        self.assertEqual(len(self.stored_payloads()), 2)
+
+        await layer.receive('shared')
+        await layer.send('shared', {'type': 'third'})
+
+    async def test_group_membership_expires(self):
+        layer = self.layer(group_expiry=0.05)
+        await layer.group_add('notifications', 'stale')
+        await asyncio.sleep(0.1)
+        await layer.group_add('notifications', 'fresh')
+
+        await layer.group_send('notifications', {'type': 'notification.message'})
+        with sqlite3.connect(self.path) as db:
+            self.assertEqual([channel for channel, in db.execute('SELECT channel FROM messages')], ['fresh'])
+
+    async def test_group_send_honours_per_channel_capacity(self):
+        layer = self.layer(capacity=3, channel_capacity={'limited*': 1})
+        for channel in ('limited', 'roomy'):
+            await layer.group_add('notifications', channel)
+
+        # Full channels are skipped without failing the group send
+        for number in range(4):
+            await layer.group_send('notifications', {'type': 'notification.message', 'number': number})
+        with sqlite3.connect(self.path) as db:
+            counts = dict(db.execute('SELECT channel, COUNT(*) FROM messages GROUP BY channel'))
+        self.assertEqual(counts, {'limited': 1, 'roomy': 3})
+        self.assertEqual((await layer.receive('limited'))['number'], 0)
+
+    async def test_unreceived_buffers_expire_and_leave_their_groups(self):
+        layer = self.layer(expiry=0.05, cleanup_interval=0.02)
+        gone, alive = await layer.new_channel(), await layer.new_channel()
+        await layer.group_add('notifications', gone)
+        waiter = asyncio.ensure_future(layer.receive(alive))
+        self.addCleanup(waiter.cancel)
+
+        # Nobody receives on ``gone`` any more; the poller still buffers its messages
+        await layer.group_send('notifications', {'type': 'notification.message'})
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if gone not in layer._buffers:
+                break
+        self.assertNotIn(gone, layer._buffers)
+        with sqlite3.connect(self.path) as db:
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM group_members').fetchone()[0], 0)
+
+    async def test_failed_commit_is_rolled_back(self):
+        layer = self.layer()
+        await layer.send('shared', {'type': 'first'})
+        layer._db = FailingCommitConnection(layer._db)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            await layer.send('shared', {'type': 'lost'})
+        self.assertFalse(layer._db.in_transaction)
+        await layer.send('shared', {'type': 'second'})
+        self.assertEqual([await layer.receive('shared') for _ in range(2)], [{'type': 'first'}, {'type': 'second'}])
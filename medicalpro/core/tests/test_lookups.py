@@ -0,0 +1,55 @@
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from medicalpro.appointments.models import AppointmentStatus
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import create_statuses, reset_process_caches
+
+
+@override_settings(LOOKUP_CACHE_CHECK_INTERVAL=3600, LOOKUP_MISS_RELOAD_INTERVAL=60)
+class LookupTableTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        appointment_statuses.all()
+
+    def add_behind_the_cache(self, name):
+        # bulk_create skips the signal bumping the version, like a row another process added
+        # before this one next checks the version
+        return AppointmentStatus.objects.bulk_create([AppointmentStatus(name=name)])[0]
+
+    def test_a_miss_reloads_the_table_once(self):
+        status = self.add_behind_the_cache('Pending Review')
+        self.assertEqual(appointment_statuses.id_for('Pending Review'), status.id)
+        self.assertEqual(appointment_statuses.name_for(status.id), 'Pending Review')
+
+    def test_a_miss_by_id_reloads_the_table(self):
+        status = self.add_behind_the_cache('Pending Review')
+        self.assertEqual(appointment_statuses.get(status.id).name, 'Pending Review')
+
+    def test_ids_reload_on_a_miss(self):
+        status = self.add_behind_the_cache('Pending Review')
+        self.assertEqual(appointment_statuses.ids(['Pending Review', 'Nonexistent']), [status.id])
+
+    def test_unknown_rows_still_raise(self):
+        with self.assertRaises(AppointmentStatus.DoesNotExist):
+            appointment_statuses.id_for('Nonexistent')
+        with self.assertRaises(AppointmentStatus.DoesNotExist):
+            appointment_statuses.get(-1)
+
+    def test_misses_reload_at_most_once_per_interval(self):
+        appointment_statuses.ids(['Nonexistent'])
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                appointment_statuses.ids(['Nonexistent'])
+                with self.assertRaises(AppointmentStatus.DoesNotExist):
+                    appointment_statuses.get(-1)
+
+        status = self.add_behind_the_cache('Pending Review')
+        with self.assertRaises(AppointmentStatus.DoesNotExist):
+            appointment_statuses.id_for('Pending Review')
+        later = time.monotonic() + 61
+        with mock.patch('medicalpro.core.lookups.time.monotonic', return_value=later):
+            self.assertEqual(appointment_statuses.id_for('Pending Review'), status.id)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.test import TestCase
+from django.utils import timezone
+
+from medicalpro.core.models import OutboxEmail
+from medicalpro.core.outbox import _record_failure, claim_batch, deliver_batch, enqueue_email
+
+
+class OutboxDeliveryTests(TestCase):
+    def setUp(self):
+        self.emails = [enqueue_email(f'patient{number}@example.com', 'Reminder', 'See you') for number in range(3)]
+
+    def statuses(self):
+        return list(OutboxEmail.objects.order_by('id').values_list('status', 'claimed_by'))
+
+    def expire_claims(self):
+        OutboxEmail.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_claimed_emails_are_sent_once(self):
+        claimed = claim_batch('worker-a')
+        self.assertEqual(claim_batch('worker-b'), [])
+        self.assertEqual(deliver_batch(claimed), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(self.statuses(), [('Sent', None)] * 3)
+
+    def test_each_email_is_marked_sent_as_it_goes(self):
+        send = EmailMultiAlternatives.send
+        seen = []
+
+        def send_and_look(message, *args, **kwargs):
+            seen.append(self.statuses())
+            return send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMultiAlternatives, 'send', send_and_look):
+            deliver_batch(claim_batch('worker-a'))
+        # What a worker reclaiming the batch after a crash would find before each send
+        self.assertEqual([[status for status, claimed_by in statuses] for statuses in seen], [
+            ['Pending', 'Pending', 'Pending'], ['Sent', 'Pending', 'Pending'], ['Sent', 'Sent', 'Pending'],
+        ])
+
+    def test_a_stale_worker_leaves_reclaimed_emails_alone(self):
+        stale = claim_batch('worker-a')
+        self.expire_claims()
+        fresh = claim_batch('worker-b')
+
+        self.assertEqual(deliver_batch(stale), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        # A failure recorded by the stale worker does not release the new owner's claim either
+        _record_failure(stale[0], OSError('connection reset'))
+        self.assertEqual({claimed_by for status, claimed_by in self.statuses()}, {fresh[0].claimed_by})
+
+        self.assertEqual(deliver_batch(fresh), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failures_are_retried_later(self):
+        with mock.patch.object(EmailMultiAlternatives, 'send', side_effect=[1, OSError('bounced'), 1]):
+            self.assertEqual(deliver_batch(claim_batch('worker-a')), (2, 1))
+        failed = OutboxEmail.objects.get(id=self.emails[1].id)
+        self.assertEqual((failed.status, failed.attempts, failed.claimed_by), ('Pending', 1, None))
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(claim_batch('worker-a'), [])
@@ -0,0 +1,77 @@
+from datetime import date, time
+from urllib.parse import parse_qs, urlparse
+
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.pagination import KeysetPagination
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, reset_process_caches
+)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        patient = create_patient()
+        # Many rows share a date and a start time, so the id tiebreaker decides their order
+        for doctor in [create_doctor() for _ in range(3)]:
+            for day in (7, 8):
+                for hour in (9, 10, 11, 12):
+                    create_appointment(doctor, patient, date(2030, 1, day), time(hour), time(hour, 30))
+        self.expected = list(Appointment.objects.order_by('-appointment_date', '-start_time', '-id')
+                             .values_list('id', flat=True))
+
+    def page(self, cursor=None, page_size=5, ordering=None):
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        paginator = KeysetPagination()
+        paginator.ordering = ordering
+        rows = paginator.paginate_queryset(Appointment.objects.all(), Request(APIRequestFactory().get('/', params)))
+        return [row.id for row in rows], paginator
+
+    @staticmethod
+    def cursor(link):
+        return parse_qs(urlparse(link).query)['cursor'][0] if link else None
+
+    def test_walks_every_row_forwards_and_back(self):
+        pages, cursor = [], None
+        while True:
+            ids, paginator = self.page(cursor)
+            pages.append(ids)
+            cursor = self.cursor(paginator.get_next_link())
+            if cursor is None:
+                break
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertEqual([len(ids) for ids in pages], [5, 5, 5, 5, 4])
+
+        back = [pages[-1]]
+        cursor = self.cursor(paginator.get_previous_link())
+        while cursor is not None:
+            ids, paginator = self.page(cursor)
+            back.append(ids)
+            cursor = self.cursor(paginator.get_previous_link())
+        self.assertEqual(back, pages[::-1])
+        self.assertIsNone(paginator.get_previous_link())
+
+    def test_pk_in_the_ordering_means_the_primary_key(self):
+        expected = list(Appointment.objects.order_by('appointment_date', '-pk').values_list('id', flat=True))
+        ids, cursor = [], None
+        while True:
+            page, paginator = self.page(cursor, ordering=['appointment_date', '-pk'])
+            ids.extend(page)
+            cursor = self.cursor(paginator.get_next_link())
+            if cursor is None:
+                break
+        self.assertEqual(ids, expected)
+        self.assertEqual(paginator.ordering, ['appointment_date', '-id'])
+
+    def test_invalid_cursors_are_not_found(self):
+        for cursor in ('garbage', 'eyJ2IjpbMV19', 'eyJ2IjpbIngiLCJ5IiwieiJdfQ'):
+            with self.assertRaises(NotFound):
+                self.page(cursor)
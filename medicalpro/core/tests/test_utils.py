@@ -0,0 +1,26 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from medicalpro.accounts.models import Notification
+from medicalpro.core.testing import create_user
+from medicalpro.core.utils import send_notifications_bulk
+
+
+class SendNotificationsBulkTests(TestCase):
+    def test_identical_notifications_get_their_own_ids_without_returned_rows(self):
+        user = create_user()
+        notification = {'user_id': user.id, 'title': 'Reminder', 'message': 'Tomorrow at 9:00'}
+        # Same user, title and creation time: nothing but the batch key tells the rows apart
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False), \
+                mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+            results = send_notifications_bulk([notification, dict(notification, message='Bring your card')],
+                                              chunk_size=1)
+
+        stored = [result['notification'] for result in results]
+        self.assertEqual(len({item.id for item in stored}), 2)
+        for item in stored:
+            self.assertEqual(Notification.objects.get(id=item.id).message, item.message)
@@ -1,17 +1,43 @@
+import asyncio
 import json
 import logging
+import uuid
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import connection, transaction
 from django.template.loader import render_to_string
 from django.utils import timezone
 
 from medicalpro.accounts.models import Notification, User
+from medicalpro.accounts.notifications import count_new_notifications
 
 logger = logging.getLogger(__name__)
 channel_layer = get_channel_layer()
 
+NOTIFICATION_BULK_CHUNK_SIZE = 500
+
+
+def notification_group(user_id):
+    return f'user_{user_id}_notifications'
+
+
+def notification_event(notification):
+    """Channel layer event pushing a stored notification to the user's sockets."""
+    return {
+        'type': 'notification_message',
+        'message': {
+            'id': notification.id,
+            'title': notification.title,
+            'message': notification.message,
+            'type': notification.type,
+            'related_entity': notification.related_entity,
+            'related_id': notification.related_id,
+            'created_at': notification.created_at.isoformat()
+        }
+    }
+
 
 def send_notification(user_id, title, message, notification_type=None, related_entity=None, related_id=None):
     """
@@ -38,27 +64,13 @@ def send_notification(user_id, title, message, notification_type=None, related_e
             related_entity=related_entity,
             related_id=related_id
         )
+        count_new_notifications([notification])
         
         # Send WebSocket notification
-        notification_data = {
-            'type': 'notification_message',
-            'message': {
-                'id': notification.id,
-                'title': title,
-                'message': message,
-                'type': notification_type,
-                'related_entity': related_entity,
-                'related_id': related_id,
-                'created_at': notification.created_at.isoformat()
-            }
-        }
-        
-        room_group_name = f'user_{user_id}_notifications'
-        
         try:
             async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                notification_data
+                notification_group(user_id),
+                notification_event(notification)
             )
         except Exception as e:
             logger.error(f"WebSocket notification error: {str(e)}")
@@ -69,10 +81,107 @@ def send_notification(user_id, title, message, notification_type=None, related_e
         return None
 
 
+def _fill_missing_ids(notifications, batch):
+    """
+    Look up the ids of bulk-inserted rows on backends that do not return them (MySQL).
+
+    Each row was inserted with the ``batch_key`` ``'<batch>:<position>'``, so
+    identical notifications created in the same instant still get their own id.
+    """
+    ids = dict(Notification.objects.filter(
+        batch_key__startswith=f'{batch}:'
+    ).values_list('batch_key', 'id'))
+    for notification in notifications:
+        notification.id = ids.get(notification.batch_key)
+
+
+async def _push_notifications(notifications):
+    """Send every notification event concurrently, returning one exception or None per notification."""
+    semaphore = asyncio.Semaphore(getattr(settings, 'NOTIFICATION_PUSH_CONCURRENCY', 100))
+
+    async def push(notification):
+        async with semaphore:
+            await channel_layer.group_send(notification_group(notification.user_id),
+                                           notification_event(notification))
+
+    return await asyncio.gather(*(push(notification) for notification in notifications),
+                                return_exceptions=True)
+
+
+def send_notifications_bulk(notifications, chunk_size=NOTIFICATION_BULK_CHUNK_SIZE):
+    """
+    Send many notifications with a few INSERTs and one event loop for the WebSocket pushes.
+
+    Rows are written with ``bulk_create`` in chunks of ``chunk_size``, then
+    every channel layer send runs concurrently (at most
+    ``NOTIFICATION_PUSH_CONCURRENCY`` at a time) from a single
+    ``async_to_sync`` call instead of one round trip per user.
+
+    Args:
+        notifications (iterable): Dicts with ``user_id``, ``title``, ``message`` and optional
+            ``notification_type``, ``related_entity`` and ``related_id``, as for send_notification
+        chunk_size (int): Number of rows per INSERT statement
+
+    Returns:
+        list: One ``{'user_id', 'notification', 'pushed'}`` dict per requested notification, in order.
+            ``notification`` is None when the row could not be stored.
+    """
+    requested = list(notifications)
+    results = [{'user_id': item['user_id'], 'notification': None, 'pushed': False} for item in requested]
+
+    stored = []
+    returns_ids = connection.features.can_return_rows_from_bulk_insert
+    for start in range(0, len(requested), chunk_size):
+        batch = None if returns_ids else uuid.uuid4().hex
+        chunk = [
+            Notification(
+                user_id=item['user_id'],
+                title=item['title'],
+                message=item['message'],
+                type=item.get('notification_type'),
+                related_entity=item.get('related_entity'),
+                related_id=item.get('related_id'),
+                batch_key=batch and f'{batch}:{offset}'
+            )
+            for offset, item in enumerate(requested[start:start + chunk_size])
+        ]
+        try:
+            with transaction.atomic():
+                Notification.objects.bulk_create(chunk)
+                count_new_notifications(chunk)
+            if batch:
+                _fill_missing_ids(chunk, batch)
+        except Exception as e:
+            logger.error(f"Failed to store {len(chunk)} notifications: {str(e)}")
+            continue
+        for offset, notification in enumerate(chunk):
+            results[start + offset]['notification'] = notification
+            stored.append((start + offset, notification))
+
+    if stored:
+        try:
+            outcomes = async_to_sync(_push_notifications)([notification for index, notification in stored])
+        except Exception as e:
+            logger.error(f"WebSocket notification error: {str(e)}")
+            outcomes = [e] * len(stored)
+        failures = 0
+        for (index, notification), outcome in zip(stored, outcomes):
+            results[index]['pushed'] = outcome is None
+            failures += outcome is not None
+        if failures:
+            logger.error(f"WebSocket notification error: {failures} of {len(stored)} pushes failed")
+
+    return results
+
+
 def send_email_notification(user_email, subject, template_name, context=None):
     """
     Send an email notification to a user.
     
+    The email is rendered here and queued in the outbox, which the
+    ``send_outbox_emails`` workers deliver in batches; with
+    ``EMAIL_OUTBOX_ENABLED`` off it is sent synchronously instead.
+    
     Args:
         user_email (str): The recipient's email address
         subject (str): The email subject
@@ -80,7 +189,7 @@ def send_email_notification(user_email, subject, template_name, context=None):
         context (dict, optional): Context data for the template
     
     Returns:
-        bool: True if the email was sent successfully, False otherwise
+        bool: True if the email was queued or sent successfully, False otherwise
     """
     if not context:
         context = {}
@@ -91,6 +200,12 @@ def send_email_notification(user_email, subject, template_name, context=None):
         
         from_email = settings.DEFAULT_FROM_EMAIL
         
+        if getattr(settings, 'EMAIL_OUTBOX_ENABLED', True):
+            from medicalpro.core.outbox import enqueue_email
+            
+            enqueue_email(user_email, subject, plain_message, html_body=html_message, from_email=from_email)
+            return True
+        
         send_mail(
             subject=subject,
             message=plain_message,
@@ -229,4 +344,4 @@ def set_system_setting(key, value, description=None):
         return setting
     except Exception as e:
         logger.error(f"Error setting system setting {key}: {str(e)}")
-        return None 
\ No newline at end of file
+        return None 
\ No newline at end of file
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.appointments.rollups import UNCOUNTED_STATUSES
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import DoctorAvailability, DoctorUnavailability
+from medicalpro.doctors.slots import WEEKDAYS
+
+
+def _covers_schedule(schedules, day_of_week, start_time, end_time):
+    return any(
+        day == day_of_week and available_from <= start_time and available_to >= end_time
+        for day, available_from, available_to in schedules
+    )
+
+
+def _overlaps_time_off(periods, start, end):
+    # Inclusive on both ends, as in the SQL function
+    return any(
+        (off_from <= start and off_to >= start)
+        or (off_from <= end and off_to >= end)
+        or (off_from >= start and off_to <= end)
+        for off_from, off_to in periods
+    )
+
+
+def _overlaps_appointment(appointments, start_time, end_time):
+    return any(
+        (booked_from <= start_time and booked_to > start_time)
+        or (booked_from < end_time and booked_to >= end_time)
+        or (booked_from >= start_time and booked_to <= end_time)
+        for booked_from, booked_to in appointments
+    )
+
+
+def check_availability(candidates, exclude_ids=()):
+    """
+    Batch equivalent of the ``IsDoctorAvailable`` SQL function.
+
+    Runs one query per table for the whole batch, then checks every
+    candidate in memory with the same conditions as the SQL function: an
+    active weekly schedule row must cover the slot, no time off may touch it
+    (bounds inclusive) and no appointment outside the cancelled, declined and
+    no-show statuses may overlap it.
+
+    Args:
+        candidates (iterable): ``(doctor_id, date, start_time, end_time)`` tuples
+        exclude_ids (iterable, optional): Appointments to ignore, e.g. the ones being moved
+
+    Returns:
+        list: One boolean per candidate, in the same order
+    """
+    candidates = list(candidates)
+    if not candidates:
+        return []
+    doctor_ids = {doctor_id for doctor_id, day, start_time, end_time in candidates}
+    days = {day for doctor_id, day, start_time, end_time in candidates}
+
+    schedules = defaultdict(list)
+    for doctor_id, day_of_week, start_time, end_time in DoctorAvailability.objects.filter(
+        doctor_id__in=doctor_ids, is_active=True
+    ).values_list('doctor_id', 'day_of_week', 'start_time', 'end_time'):
+        schedules[doctor_id].append((day_of_week, start_time, end_time))
+
+    # Candidate bounds as moments in the current time zone, like TIMESTAMP(date, time)
+    current_tz = timezone.get_current_timezone()
+    moments = [
+        (timezone.make_aware(datetime.combine(day, start_time), current_tz),
+         timezone.make_aware(datetime.combine(day, end_time), current_tz))
+        for doctor_id, day, start_time, end_time in candidates
+    ]
+    earliest = min(min(start, end) for start, end in moments)
+    latest = max(max(start, end) for start, end in moments)
+    time_off = defaultdict(list)
+    for doctor_id, start_datetime, end_datetime in DoctorUnavailability.objects.filter(
+        doctor_id__in=doctor_ids, start_datetime__lte=latest, end_datetime__gte=earliest
+    ).values_list('doctor_id', 'start_datetime', 'end_datetime'):
+        time_off[doctor_id].append((start_datetime, end_datetime))
+
+    booked = defaultdict(list)
+    for doctor_id, appointment_date, start_time, end_time in Appointment.objects.filter(
+        doctor_id__in=doctor_ids, appointment_date__in=days
+    ).exclude(
+        status_id__in=appointment_statuses.ids(UNCOUNTED_STATUSES)
+    ).exclude(
+        id__in=list(exclude_ids)
+    ).values_list('doctor_id', 'appointment_date', 'start_time', 'end_time'):
+        booked[(doctor_id, appointment_date)].append((start_time, end_time))
+
+    return [
+        _covers_schedule(schedules[doctor_id], WEEKDAYS[day.weekday()], start_time, end_time)
+        and not _overlaps_time_off(time_off[doctor_id], start, end)
+        and not _overlaps_appointment(booked[(doctor_id, day)], start_time, end_time)
+        for (doctor_id, day, start_time, end_time), (start, end) in zip(candidates, moments)
+    ]
+
+
+def is_doctor_available(doctor_id, date, start_time, end_time):
+    """Python equivalent of ``IsDoctorAvailable`` for a single slot."""
+    return check_availability([(doctor_id, date, start_time, end_time)])[0]
+
+
+def is_doctor_available_query(doctor_id, date, start_time, end_time, exclude_ids=()):
+    """
+    Slot-by-slot ORM translation of ``IsDoctorAvailable``, with the conditions evaluated by the database.
+
+    Runs up to three queries per slot. It is the reference ``check_availability``
+    is tested and benchmarked against; use ``check_availability`` in new code.
+    """
+    if not DoctorAvailability.objects.filter(
+        doctor_id=doctor_id, day_of_week=WEEKDAYS[date.weekday()], start_time__lte=start_time,
+        end_time__gte=end_time, is_active=True
+    ).exists():
+        return False
+
+    current_tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date, start_time), current_tz)
+    end = timezone.make_aware(datetime.combine(date, end_time), current_tz)
+    if DoctorUnavailability.objects.filter(
+        Q(start_datetime__lte=start, end_datetime__gte=start)
+        | Q(start_datetime__lte=end, end_datetime__gte=end)
+        | Q(start_datetime__gte=start, end_datetime__lte=end),
+        doctor_id=doctor_id
+    ).exists():
+        return False
+
+    return not Appointment.objects.filter(
+        Q(start_time__lte=start_time, end_time__gt=start_time)
+        | Q(start_time__lt=end_time, end_time__gte=end_time)
+        | Q(start_time__gte=start_time, end_time__lte=end_time),
+        doctor_id=doctor_id, appointment_date=date
+    ).exclude(
+        status__name__in=UNCOUNTED_STATUSES
+    ).exclude(
+        id__in=list(exclude_ids)
+    ).exists()
@@ -0,0 +1,70 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches, timed
+from medicalpro.doctors import slots
+from medicalpro.doctors.availability import check_availability, is_doctor_available_query
+from medicalpro.doctors.models import DoctorUnavailability
+
+
+class Command(BaseCommand):
+    help = ('Time check_availability against the slot-by-slot translation of IsDoctorAvailable, '
+            'on synthetic data rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--days', type=int, default=20)
+        parser.add_argument('--candidates', type=int, default=2000, help='Slots checked per path')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['doctors'], options['days'], options['candidates'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, doctor_count, day_count, candidate_count):
+        create_statuses()
+        reset_process_caches()
+        patient = create_patient()
+        doctors = [create_doctor() for _ in range(doctor_count)]
+        start_date = date(2030, 1, 7)
+        scheduled = appointment_statuses.id_for('Scheduled')
+
+        rng = random.Random(0)
+        appointments, time_off = [], []
+        for doctor in doctors:
+            for offset in range(day_count):
+                day = start_date + timedelta(days=offset)
+                for start in rng.sample(range(9 * 60, 17 * 60, 30), 8):
+                    appointments.append(Appointment(
+                        doctor=doctor, patient=patient, appointment_date=day,
+                        start_time=slots._minute_to_time(start), end_time=slots._minute_to_time(start + 30),
+                        status_id=scheduled, created_by_id=patient.user_id
+                    ))
+            moment = timezone.make_aware(datetime.combine(start_date, time(12)) + timedelta(
+                days=rng.randrange(day_count)))
+            time_off.append(DoctorUnavailability(doctor=doctor, start_datetime=moment,
+                                                 end_datetime=moment + timedelta(hours=26)))
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+        DoctorUnavailability.objects.bulk_create(time_off)
+
+        candidates = []
+        for _ in range(candidate_count):
+            start = rng.randrange(8 * 60, 18 * 60, 15)
+            candidates.append((rng.choice(doctors).id, start_date + timedelta(days=rng.randrange(day_count)),
+                               slots._minute_to_time(start), slots._minute_to_time(start + 30)))
+
+        self.stdout.write(f'{doctor_count} doctors x {day_count} days, {len(appointments)} appointments, '
+                          f'{candidate_count} candidate slots')
+        batch, per_slot = [], []
+        batch_ms = timed(lambda: batch.append(check_availability(candidates)))
+        per_slot_ms = timed(lambda: per_slot.append([is_doctor_available_query(*slot) for slot in candidates]))
+        self.stdout.write(f'check_availability: {batch_ms:10.1f} ms, {sum(batch[0])} available')
+        self.stdout.write(f'slot by slot:       {per_slot_ms:10.1f} ms, {per_slot_ms / batch_ms:.0f}x slower, '
+                          f'same answers: {batch[0] == per_slot[0]}')
@@ -0,0 +1,116 @@
+import random
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches, timed
+from medicalpro.doctors import slots
+from medicalpro.doctors.models import DoctorAvailability, DoctorUnavailability
+
+
+def row_by_row_slots(doctor_ids, start_date, end_date, duration):
+    """Free slots computed one doctor-day at a time, three queries each, as a per-slot check would."""
+    found = []
+    active = appointment_statuses.ids(slots.ACTIVE_STATUSES)
+    day = start_date
+    while day <= end_date:
+        for doctor_id in doctor_ids:
+            periods = DoctorAvailability.objects.filter(
+                doctor_id=doctor_id, day_of_week=slots.WEEKDAYS[day.weekday()], is_active=True
+            ).values_list('start_time', 'end_time')
+            day_start = timezone.make_aware(datetime.combine(day, time.min))
+            time_off = list(DoctorUnavailability.objects.filter(
+                doctor_id=doctor_id, start_datetime__lt=day_start + timedelta(days=1), end_datetime__gt=day_start
+            ).values_list('start_datetime', 'end_datetime'))
+            booked = list(Appointment.objects.filter(
+                doctor_id=doctor_id, appointment_date=day, status_id__in=active
+            ).values_list('start_time', 'end_time'))
+            for period_start, period_end in periods:
+                start = datetime.combine(day, period_start)
+                while start + timedelta(minutes=duration) <= datetime.combine(day, period_end):
+                    end = start + timedelta(minutes=duration)
+                    aware_start, aware_end = timezone.make_aware(start), timezone.make_aware(end)
+                    if not any(b_start < end.time() and b_end > start.time() for b_start, b_end in booked) and \
+                            not any(o_start < aware_end and o_end > aware_start for o_start, o_end in time_off):
+                        found.append((doctor_id, day, start.time(), end.time()))
+                    start = end
+        day += timedelta(days=1)
+    return found
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Time the slot engine against a row-by-row computation on synthetic data rolled back at the end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--days', type=int, default=60)
+        parser.add_argument('--duration', type=int, default=30, help='Slot length in minutes')
+        parser.add_argument('--skip-row-by-row', action='store_true',
+                            help='Only time the slot engine, for large runs')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['doctors'], options['days'], options['duration'], options['skip_row_by_row'])
+            transaction.set_rollback(True)
+        reset_process_caches()
+
+    def run(self, doctor_count, day_count, duration, skip_row_by_row):
+        create_statuses()
+        reset_process_caches()
+        patient = create_patient()
+        doctors = [create_doctor() for _ in range(doctor_count)]
+        doctor_ids = [doctor.id for doctor in doctors]
+        start_date = date(2030, 1, 7)
+        end_date = start_date + timedelta(days=day_count - 1)
+        scheduled = appointment_statuses.id_for('Scheduled')
+
+        rng = random.Random(0)
+        appointments, time_off = [], []
+        for doctor in doctors:
+            for offset in range(day_count):
+                day = start_date + timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                for start in rng.sample(range(9 * 60, 17 * 60, 30), 8):
+                    appointments.append(Appointment(
+                        doctor=doctor, patient=patient, appointment_date=day,
+                        start_time=slots._minute_to_time(start), end_time=slots._minute_to_time(start + 30),
+                        status_id=scheduled, created_by_id=patient.user_id
+                    ))
+            moment = timezone.make_aware(datetime.combine(start_date, time(12)) + timedelta(
+                days=rng.randrange(day_count)))
+            time_off.append(DoctorUnavailability(doctor=doctor, start_datetime=moment,
+                                                 end_datetime=moment + timedelta(hours=26)))
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+        DoctorUnavailability.objects.bulk_create(time_off)
+
+        self.stdout.write(f'{doctor_count} doctors x {day_count} days, {len(appointments)} appointments, '
+                          f'{duration}-minute slots')
+        found = []
+        engine_ms = timed(lambda: found.append(slots.find_available_slots(
+            doctor_ids, start_date, end_date, duration=duration)))
+        self.stdout.write(f'slot engine:      {engine_ms:10.0f} ms, {len(found[0])} slots')
+        chunked_mb = peak_memory(lambda: slots.find_available_slots(doctor_ids, start_date, end_date,
+                                                                    duration=duration))
+        single_mb = peak_memory(lambda: slots.build_slot_grid(doctor_ids, start_date, end_date).slots(duration))
+        self.stdout.write(f'  peak memory {chunked_mb:.0f} MB in grids of up to {slots.MAX_GRID_ROWS} doctor-days, '
+                          f'{single_mb:.0f} MB as one grid')
+        if not skip_row_by_row:
+            expected = []
+            row_ms = timed(lambda: expected.append(row_by_row_slots(doctor_ids, start_date, end_date, duration)))
+            self.stdout.write(f'row by row:       {row_ms:10.0f} ms, {len(expected[0])} slots, '
+                              f'{row_ms / engine_ms:.0f}x slower, same slots: {sorted(expected[0]) == sorted(found[0])}')
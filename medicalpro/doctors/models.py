@@ -157,4 +157,4 @@ class Review(models.Model):
     class Meta:
         db_table = 'reviews'
         ordering = ['-created_at']
-        unique_together = ('doctor', 'patient', 'appointment') 
\ No newline at end of file
+        unique_together = ('doctor', 'patient', 'appointment') 
\ No newline at end of file
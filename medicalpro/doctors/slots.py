@@ -0,0 +1,288 @@
+import heapq
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from medicalpro.appointments.conflicts import ACTIVE_STATUSES
+from medicalpro.appointments.holds import held_intervals
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.lookups import appointment_statuses
+from medicalpro.doctors.models import DoctorAvailability, DoctorUnavailability
+
+MINUTES_PER_DAY = 24 * 60
+
+# Largest number of days loaded at once per doctor by the earliest-slot search
+MAX_SEARCH_WINDOW_DAYS = 14
+
+# Most doctor-day rows in one bitmap, about 6 MB of minutes plus 24 MB of int32 temporaries;
+# larger requests are built in chunks of doctors
+MAX_GRID_ROWS = 4096
+
+# A slot or working period ending at midnight ends at time.max, TimeField has no 24:00
+END_OF_DAY = time.max
+
+# Heap entry kinds, a pending window sorts before real slots of the same minute
+_NEEDS_LOAD = 0
+_SLOT = 1
+
+# DoctorAvailability.day_of_week values indexed by date.weekday()
+WEEKDAYS = [day for day, label in DoctorAvailability.DAY_CHOICES]
+
+
+def _minute_floor(value):
+    return value.hour * 60 + value.minute
+
+
+def _minute_ceil(value):
+    minutes = value.hour * 60 + value.minute
+    if value.second or value.microsecond:
+        minutes += 1
+    return minutes
+
+
+def _minute_to_time(minute):
+    if minute >= MINUTES_PER_DAY:
+        return END_OF_DAY
+    return time(minute // 60, minute % 60)
+
+
+def format_slot_time(value):
+    """``HH:MM`` form of a slot boundary, ``24:00`` for ``END_OF_DAY``."""
+    return '24:00' if value == END_OF_DAY else value.strftime('%H:%M')
+
+
+def parse_slot_time(value):
+    """Parse an ``HH:MM`` slot boundary, accepting the ``24:00`` returned for slots ending at midnight."""
+    if value == '24:00':
+        return END_OF_DAY
+    return time.fromisoformat(value)
+
+
+def _end_minute(value):
+    """Last minute of a working period, up to midnight for periods ending at 23:59:59 or later."""
+    if value >= time(23, 59, 59):
+        return MINUTES_PER_DAY
+    return _minute_floor(value)
+
+
+class SlotGrid:
+    """
+    Minute-resolution occupancy bitmap for a set of doctor-days.
+
+    Row ``i`` of ``free`` describes the doctor-day ``keys[i]``; column ``m`` is
+    True when the doctor works at minute ``m`` and nothing blocks it.
+    """
+
+    def __init__(self, keys, free):
+        self.keys = keys
+        self.free = free
+
+    def slots(self, duration, step=None):
+        """
+        Return every free slot of ``duration`` minutes, one batched pass for all rows.
+
+        Args:
+            duration (int): Slot length in minutes
+            step (int, optional): Slot start granularity in minutes, defaults to ``duration``
+
+        Returns:
+            list: ``(doctor_id, date, start_time, end_time)`` tuples ordered by doctor-day;
+                a slot ending at midnight ends at ``END_OF_DAY``
+        """
+        step = step or duration
+        if not self.keys or duration <= 0 or duration > MINUTES_PER_DAY:
+            return []
+
+        # Free minutes in [m, m + duration) == duration  <=>  the slot is free
+        totals = np.zeros((len(self.keys), MINUTES_PER_DAY + 1), dtype=np.int32)
+        np.cumsum(self.free, axis=1, out=totals[:, 1:])
+        windows = totals[:, duration:] - totals[:, :-duration]
+        fits = windows == duration
+        fits[:, np.arange(fits.shape[1]) % step != 0] = False
+
+        rows, starts = np.nonzero(fits)
+        return [
+            (self.keys[row][0], self.keys[row][1], _minute_to_time(start), _minute_to_time(start + duration))
+            for row, start in zip(rows.tolist(), starts.tolist())
+        ]
+
+
+def _paint(bitmap, rows, starts, ends):
+    """Set ``bitmap[row, start:end]`` for every segment using a difference array."""
+    if not rows:
+        return
+    diff = np.zeros((bitmap.shape[0], MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.add.at(diff, (np.asarray(rows), np.asarray(starts)), 1)
+    np.add.at(diff, (np.asarray(rows), np.asarray(ends)), -1)
+    bitmap |= np.cumsum(diff, axis=1)[:, :MINUTES_PER_DAY] > 0
+
+
+def build_slot_grid(doctor_ids, start_date, end_date, holder_id=None):
+    """
+    Build the free-minute bitmap of several doctors over a date range.
+
+    Runs one query per source table whatever the number of doctors and days.
+    The bitmap takes several bytes per minute of every doctor-day, so large
+    requests go through ``iter_slot_grids`` instead.
+
+    Args:
+        doctor_ids (iterable): IDs of the doctors to include
+        start_date (date): First day of the range
+        end_date (date): Last day of the range (inclusive)
+        holder_id (int, optional): User whose own slot holds stay free
+
+    Returns:
+        SlotGrid: The bitmap with one row per doctor-day
+    """
+    doctor_ids = list(doctor_ids)
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    keys = [(doctor_id, day) for doctor_id in doctor_ids for day in days]
+    row_of = {key: row for row, key in enumerate(keys)}
+    days_by_weekday = {}
+    for day in days:
+        days_by_weekday.setdefault(WEEKDAYS[day.weekday()], []).append(day)
+
+    # Working hours
+    rows, starts, ends = [], [], []
+    availability = DoctorAvailability.objects.filter(
+        doctor_id__in=doctor_ids, is_active=True
+    ).values_list('doctor_id', 'day_of_week', 'start_time', 'end_time')
+    for doctor_id, day_of_week, start_time, end_time in availability:
+        for day in days_by_weekday.get(day_of_week, ()):
+            rows.append(row_of[(doctor_id, day)])
+            starts.append(_minute_ceil(start_time))
+            ends.append(_end_minute(end_time))
+    available = np.zeros((len(keys), MINUTES_PER_DAY), dtype=bool)
+    _paint(available, rows, starts, ends)
+
+    # Time off and booked appointments
+    rows, starts, ends = [], [], []
+    current_tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(start_date, time.min), current_tz)
+    range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), current_tz)
+    unavailability = DoctorUnavailability.objects.filter(
+        doctor_id__in=doctor_ids, start_datetime__lt=range_end, end_datetime__gt=range_start
+    ).values_list('doctor_id', 'start_datetime', 'end_datetime')
+    for doctor_id, start_datetime, end_datetime in unavailability:
+        start_local = timezone.localtime(max(start_datetime, range_start), current_tz)
+        end_local = timezone.localtime(min(end_datetime, range_end), current_tz)
+        day = start_local.date()
+        while day <= end_local.date() and day <= end_date:
+            first = _minute_floor(start_local) if day == start_local.date() else 0
+            last = _minute_ceil(end_local) if day == end_local.date() else MINUTES_PER_DAY
+            if last > first:
+                rows.append(row_of[(doctor_id, day)])
+                starts.append(first)
+                ends.append(last)
+            day += timedelta(days=1)
+
+    appointments = Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        appointment_date__range=(start_date, end_date),
+        status_id__in=appointment_statuses.ids(ACTIVE_STATUSES)
+    ).values_list('doctor_id', 'appointment_date', 'start_time', 'end_time')
+    for doctor_id, appointment_date, start_time, end_time in appointments:
+        rows.append(row_of[(doctor_id, appointment_date)])
+        starts.append(_minute_floor(start_time))
+        ends.append(_minute_ceil(end_time))
+    for key, intervals in held_intervals(keys, exclude_user_id=holder_id).items():
+        for start_time, end_time in intervals:
+            rows.append(row_of[key])
+            starts.append(_minute_floor(start_time))
+            ends.append(_minute_ceil(end_time))
+    blocked = np.zeros((len(keys), MINUTES_PER_DAY), dtype=bool)
+    _paint(blocked, rows, starts, ends)
+
+    return SlotGrid(keys, available & ~blocked)
+
+
+def iter_slot_grids(doctor_ids, start_date, end_date, holder_id=None):
+    """Yield the slot grids of the given doctors in chunks of at most ``MAX_GRID_ROWS`` doctor-days."""
+    doctor_ids = list(doctor_ids)
+    doctors_per_grid = max(MAX_GRID_ROWS // ((end_date - start_date).days + 1), 1)
+    for start in range(0, len(doctor_ids), doctors_per_grid):
+        yield build_slot_grid(doctor_ids[start:start + doctors_per_grid], start_date, end_date,
+                              holder_id=holder_id)
+
+
+def find_available_slots(doctor_ids, start_date, end_date, duration=30, step=None, holder_id=None, limit=None):
+    """
+    Return the free ``(doctor_id, date, start_time, end_time)`` slots of the given doctors.
+
+    With ``limit``, at most that many slots are returned and no grid is built
+    once they are found.
+    """
+    slots = []
+    for grid in iter_slot_grids(doctor_ids, start_date, end_date, holder_id=holder_id):
+        slots.extend(grid.slots(duration, step))
+        if limit is not None and len(slots) >= limit:
+            return slots[:limit]
+    return slots
+
+
+def find_earliest_slots(specialty_id, count=5, duration=30, step=None, after=None, max_days=90, holder_id=None):
+    """
+    Find the first ``count`` free slots with any available doctor of a specialty.
+
+    Doctors are walked through a priority queue keyed by each doctor's next
+    candidate slot. A doctor whose loaded days are exhausted is pushed back
+    with the start of its next window as key, and windows are only loaded
+    once that key reaches the top of the queue, so the search stops as soon
+    as enough slots are known instead of computing every doctor's calendar.
+    Windows grow geometrically (1, 1, 2, 4, ... days) up to
+    ``MAX_SEARCH_WINDOW_DAYS``, and doctors waiting on the same window are
+    loaded in one batched pass.
+
+    Args:
+        specialty_id (int): The specialty to search
+        count (int): Number of slots wanted
+        duration (int): Slot length in minutes
+        step (int, optional): Slot start granularity in minutes
+        after (datetime, optional): Ignore slots starting before this moment, defaults to now
+        max_days (int): How far ahead to search
+        holder_id (int, optional): User whose own slot holds stay free
+
+    Returns:
+        tuple: ``(slots, doctor_days_scanned)`` where ``slots`` holds
+            ``(doctor_id, date, start_time, end_time)`` tuples in chronological order
+    """
+    after = timezone.localtime(after or timezone.now())
+    first_day = after.date()
+    last_day = first_day + timedelta(days=max_days - 1)
+
+    doctor_ids = DoctorAvailability.objects.filter(
+        doctor__specialty_id=specialty_id,
+        doctor__is_available=True,
+        is_active=True
+    ).order_by().values_list('doctor_id', flat=True).distinct()
+    heap = [(first_day, time.min, _NEEDS_LOAD, doctor_id, None) for doctor_id in doctor_ids]
+    heapq.heapify(heap)
+
+    results = []
+    doctor_days_scanned = 0
+    while heap and len(results) < count:
+        slot_date, start_time, kind, doctor_id, end_time = heapq.heappop(heap)
+        if kind == _SLOT:
+            results.append((doctor_id, slot_date, start_time, end_time))
+            continue
+        if slot_date > last_day:
+            continue
+
+        waiting = [doctor_id]
+        while heap and heap[0][2] == _NEEDS_LOAD and heap[0][0] == slot_date:
+            waiting.append(heapq.heappop(heap)[3])
+
+        window_days = min(max((slot_date - first_day).days, 1), MAX_SEARCH_WINDOW_DAYS)
+        window_end = min(slot_date + timedelta(days=window_days - 1), last_day)
+        for grid in iter_slot_grids(waiting, slot_date, window_end, holder_id=holder_id):
+            doctor_days_scanned += len(grid.keys)
+            for slot_doctor_id, day, slot_start, slot_end in grid.slots(duration, step):
+                if day == first_day and slot_start < after.time():
+                    continue
+                heapq.heappush(heap, (day, slot_start, _SLOT, slot_doctor_id, slot_end))
+        next_day = window_end + timedelta(days=1)
+        for waiting_doctor_id in waiting:
+            heapq.heappush(heap, (next_day, time.min, _NEEDS_LOAD, waiting_doctor_id, None))
+
+    return results, doctor_days_scanned
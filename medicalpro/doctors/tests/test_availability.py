@@ -0,0 +1,104 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from medicalpro.appointments.models import Appointment
+from medicalpro.core.testing import create_doctor, create_patient, create_statuses, reset_process_caches
+from medicalpro.doctors.availability import check_availability, is_doctor_available_query
+from medicalpro.doctors.models import DoctorAvailability, DoctorUnavailability
+from medicalpro.doctors.slots import WEEKDAYS
+
+DAY = date(2030, 1, 7)
+
+STATUSES = ('Scheduled', 'Confirmed', 'Completed', 'Cancelled', 'Declined', 'No-show')
+
+
+def quarter(minute):
+    return time(minute // 60, minute % 60)
+
+
+class CheckAvailabilityEquivalenceTests(TestCase):
+    """``check_availability`` against the slot-by-slot translation of the SQL function, on random data."""
+
+    def setUp(self):
+        self.statuses = create_statuses()
+        reset_process_caches()
+        self.rng = random.Random(14)
+        patient = create_patient()
+        self.doctors = [create_doctor(days=()) for _ in range(4)]
+        rng = self.rng
+        appointments = []
+        for doctor in self.doctors:
+            for day_of_week in rng.sample(WEEKDAYS, 4):
+                start = rng.randrange(7 * 4, 12 * 4) * 15
+                DoctorAvailability.objects.create(
+                    doctor=doctor, day_of_week=day_of_week, start_time=quarter(start),
+                    end_time=quarter(start + rng.randrange(4, 24) * 15), is_active=rng.random() > 0.2
+                )
+            for _ in range(3):
+                moment = timezone.make_aware(datetime.combine(DAY, time()) + timedelta(
+                    days=rng.randrange(7), minutes=rng.randrange(7 * 4, 19 * 4) * 15))
+                DoctorUnavailability.objects.create(
+                    doctor=doctor, start_datetime=moment,
+                    end_datetime=moment + timedelta(minutes=rng.randrange(1, 40) * 15)
+                )
+            # Bulk created, since save() refuses the overlapping bookings the SQL function must still handle
+            for _ in range(20):
+                start = rng.randrange(7 * 4, 19 * 4) * 15
+                appointments.append(Appointment(
+                    doctor=doctor, patient=patient, appointment_date=DAY + timedelta(days=rng.randrange(7)),
+                    start_time=quarter(start), end_time=quarter(start + rng.randrange(1, 5) * 15),
+                    status=self.statuses[rng.choice(STATUSES)], created_by=patient.user
+                ))
+        Appointment.objects.bulk_create(appointments)
+
+    def random_candidates(self, count):
+        # On the quarter-hour grid, so many candidates touch a schedule, time-off or appointment bound
+        candidates = []
+        for _ in range(count):
+            start = self.rng.randrange(6 * 4, 20 * 4) * 15
+            candidates.append((
+                self.rng.choice(self.doctors).id, DAY + timedelta(days=self.rng.randrange(7)),
+                quarter(start), quarter(start + self.rng.randrange(1, 9) * 15)
+            ))
+        return candidates
+
+    def assert_matches_reference(self, candidates, exclude_ids=()):
+        expected = [is_doctor_available_query(*candidate, exclude_ids=exclude_ids) for candidate in candidates]
+        self.assertEqual(check_availability(candidates, exclude_ids=exclude_ids), expected)
+        return expected
+
+    def test_matches_the_sql_function(self):
+        expected = self.assert_matches_reference(self.random_candidates(400))
+        # Both outcomes are well represented, so the comparison is not vacuous
+        self.assertGreater(expected.count(True), 20)
+        self.assertGreater(expected.count(False), 40)
+
+    def test_matches_with_excluded_appointments(self):
+        excluded = self.rng.sample(list(Appointment.objects.values_list('id', flat=True)), 30)
+        self.assert_matches_reference(self.random_candidates(200), exclude_ids=excluded)
+
+    def test_bounds_that_touch(self):
+        doctor = self.doctors[0]
+        DoctorAvailability.objects.filter(doctor=doctor).delete()
+        DoctorUnavailability.objects.filter(doctor=doctor).delete()
+        Appointment.objects.filter(doctor=doctor).delete()
+        DoctorAvailability.objects.create(doctor=doctor, day_of_week='Monday', start_time=time(9), end_time=time(12))
+        DoctorUnavailability.objects.create(
+            doctor=doctor, start_datetime=timezone.make_aware(datetime.combine(DAY, time(11))),
+            end_datetime=timezone.make_aware(datetime.combine(DAY, time(11, 30)))
+        )
+        Appointment.objects.create(doctor=doctor, patient=create_patient(), appointment_date=DAY,
+                                   start_time=time(10), end_time=time(10, 30),
+                                   status=self.statuses['Scheduled'], created_by=doctor.user)
+
+        candidates = [
+            (doctor.id, DAY, time(9), time(10)),  # ends where the appointment starts
+            (doctor.id, DAY, time(10, 30), time(11)),  # ends where the time off starts
+            (doctor.id, DAY, time(11, 30), time(12)),  # starts where the time off ends
+            (doctor.id, DAY, time(8, 30), time(9)),  # before the schedule
+            (doctor.id, DAY + timedelta(days=1), time(9), time(10)),  # no Tuesday schedule
+        ]
+        self.assertEqual(self.assert_matches_reference(candidates), [True, False, False, False, False])
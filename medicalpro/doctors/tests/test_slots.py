@@ -0,0 +1,222 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medicalpro.core.testing import (
+    create_appointment, create_doctor, create_patient, create_statuses, create_user, reset_process_caches
+)
+from medicalpro.doctors import slots
+from medicalpro.doctors.models import DoctorAvailability, DoctorUnavailability
+from medicalpro.appointments.holds import hold_slot
+from medicalpro.doctors.slots import END_OF_DAY, build_slot_grid, find_available_slots, find_earliest_slots
+from medicalpro.doctors.views import AvailableSlotsView, EarliestAvailableSlotsView
+
+MONDAY = date(2030, 1, 7)
+
+
+def reference_slots(doctor, day, duration, step):
+    """Free slots of one doctor-day, worked out minute by minute."""
+    weekday = slots.WEEKDAYS[day.weekday()]
+    free = set()
+    for period in doctor.availability.filter(day_of_week=weekday, is_active=True):
+        free.update(range(slots._minute_ceil(period.start_time), slots._end_minute(period.end_time)))
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    time_off = list(doctor.unavailability.values_list('start_datetime', 'end_datetime'))
+    for minute in list(free):
+        moment = day_start + timedelta(minutes=minute)
+        if any(start < moment + timedelta(minutes=1) and end > moment for start, end in time_off):
+            free.discard(minute)
+    for appointment in doctor.appointments.filter(appointment_date=day, status__name='Scheduled'):
+        free.difference_update(range(slots._minute_floor(appointment.start_time),
+                                     slots._minute_ceil(appointment.end_time)))
+    return [
+        (doctor.id, day, slots._minute_to_time(start), slots._minute_to_time(start + duration))
+        for start in range(0, slots.MINUTES_PER_DAY - duration + 1, step)
+        if all(minute in free for minute in range(start, start + duration))
+    ]
+
+
+class SlotEngineTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.patient = create_patient()
+
+    def test_booked_intervals_are_subtracted(self):
+        doctor = create_doctor(start=time(9), end=time(12))
+        create_appointment(doctor, self.patient, MONDAY, time(10), time(10, 30))
+        self.assertEqual(
+            [start for _, _, start, _ in find_available_slots([doctor.id], MONDAY, MONDAY, duration=30)],
+            [time(9), time(9, 30), time(10, 30), time(11), time(11, 30)]
+        )
+
+    def test_time_off_across_midnight(self):
+        doctor = create_doctor(start=time(9), end=time(17))
+        DoctorUnavailability.objects.create(
+            doctor=doctor,
+            start_datetime=timezone.make_aware(datetime.combine(MONDAY, time(16))),
+            end_datetime=timezone.make_aware(datetime.combine(MONDAY + timedelta(days=1), time(10)))
+        )
+        found = find_available_slots([doctor.id], MONDAY, MONDAY + timedelta(days=1), duration=60)
+        self.assertEqual(found[-1][1:3], (MONDAY + timedelta(days=1), time(16)))
+        self.assertNotIn((doctor.id, MONDAY, time(16), time(17)), found)
+        self.assertEqual(found[7][1:3], (MONDAY + timedelta(days=1), time(10)))
+
+    def test_slot_ending_at_midnight(self):
+        doctor = create_doctor(start=time(22), end=END_OF_DAY)
+        found = find_available_slots([doctor.id], MONDAY, MONDAY, duration=30)
+        self.assertEqual(len(found), 4)
+        self.assertEqual(found[-1], (doctor.id, MONDAY, time(23, 30), END_OF_DAY))
+
+        request = APIRequestFactory().get('/', {'doctor': doctor.id, 'start_date': MONDAY.isoformat()})
+        force_authenticate(request, user=self.patient.user)
+        response = AvailableSlotsView.as_view()(request)
+        self.assertEqual(response.data[-1]['end_time'], '24:00')
+
+    def test_large_requests_are_built_in_chunks(self):
+        doctors = [create_doctor() for _ in range(5)]
+        create_appointment(doctors[3], self.patient, MONDAY + timedelta(days=1), time(9), time(13))
+        doctor_ids = [doctor.id for doctor in doctors]
+        end_date = MONDAY + timedelta(days=2)
+        expected = build_slot_grid(doctor_ids, MONDAY, end_date).slots(45, 15)
+        with mock.patch.object(slots, 'MAX_GRID_ROWS', 6), \
+                mock.patch.object(slots, 'build_slot_grid', wraps=build_slot_grid) as build:
+            self.assertEqual(find_available_slots(doctor_ids, MONDAY, end_date, duration=45, step=15), expected)
+        self.assertEqual([len(call.args[0]) for call in build.call_args_list], [2, 2, 1])
+
+    def test_limit_stops_building_grids(self):
+        doctors = [create_doctor() for _ in range(5)]
+        doctor_ids = [doctor.id for doctor in doctors]
+        with mock.patch.object(slots, 'MAX_GRID_ROWS', 2), \
+                mock.patch.object(slots, 'build_slot_grid', wraps=build_slot_grid) as build:
+            found = find_available_slots(doctor_ids, MONDAY, MONDAY, duration=60, limit=10)
+        self.assertEqual(found, find_available_slots(doctor_ids, MONDAY, MONDAY, duration=60)[:10])
+        self.assertEqual(build.call_count, 1)
+
+    def test_matches_minute_by_minute_reference(self):
+        rng = random.Random(2)
+        doctors = []
+        for _ in range(4):
+            start = rng.randrange(6 * 60, 12 * 60, 5)
+            end = rng.randrange(13 * 60, 24 * 60, 5)
+            doctor = create_doctor(start=slots._minute_to_time(start), end=slots._minute_to_time(end))
+            DoctorAvailability.objects.create(doctor=doctor, day_of_week='Saturday', start_time=time(8, 7),
+                                              end_time=time(11, 58, 30))
+            for _ in range(3):
+                moment = timezone.make_aware(datetime.combine(MONDAY, time()) + timedelta(
+                    minutes=rng.randrange(0, 6 * 24 * 60)))
+                DoctorUnavailability.objects.create(doctor=doctor, start_datetime=moment,
+                                                    end_datetime=moment + timedelta(minutes=rng.randrange(1, 600)))
+            for offset in range(6):
+                for _ in range(4):
+                    first = rng.randrange(7 * 60, 20 * 60, 5)
+                    try:
+                        create_appointment(doctor, self.patient, MONDAY + timedelta(days=offset),
+                                           slots._minute_to_time(first),
+                                           slots._minute_to_time(first + rng.randrange(5, 90, 5)))
+                    except ValidationError:
+                        # Overlaps an earlier one
+                        pass
+            doctors.append(doctor)
+
+        end_date = MONDAY + timedelta(days=5)
+        for duration, step in ((30, 30), (20, 5), (60, 15)):
+            expected = [
+                slot
+                for doctor in doctors
+                for offset in range(6)
+                for slot in reference_slots(doctor, MONDAY + timedelta(days=offset), duration, step)
+            ]
+            found = find_available_slots([doctor.id for doctor in doctors], MONDAY, end_date,
+                                         duration=duration, step=step)
+            self.assertEqual(found, expected)
+
+
+class EarliestSlotTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.patient = create_patient()
+        self.after = timezone.make_aware(datetime.combine(MONDAY, time(7)))
+
+    def earliest(self, count=3, **kwargs):
+        specialty_id = self.doctors[0].specialty_id
+        return find_earliest_slots(specialty_id, count=count, duration=60, after=self.after, **kwargs)
+
+    def test_walks_doctors_in_slot_order(self):
+        self.doctors = [create_doctor(start=time(10), end=time(12)), create_doctor(start=time(9), end=time(11))]
+        create_appointment(self.doctors[1], self.patient, MONDAY, time(9), time(10))
+        found, scanned = self.earliest()
+        self.assertEqual(found, [
+            (self.doctors[0].id, MONDAY, time(10), time(11)),
+            (self.doctors[1].id, MONDAY, time(10), time(11)),
+            (self.doctors[0].id, MONDAY, time(11), time(12)),
+        ])
+        self.assertEqual(scanned, 2)
+
+    def test_skips_unavailable_doctors_and_periods(self):
+        self.doctors = [create_doctor(start=time(8), end=time(9)) for _ in range(3)]
+        self.doctors[0].is_available = False
+        self.doctors[0].save()
+        self.doctors[1].availability.update(is_active=False)
+        DoctorUnavailability.objects.create(
+            doctor=self.doctors[2],
+            start_datetime=self.after,
+            end_datetime=self.after + timedelta(days=2)
+        )
+        found, scanned = self.earliest(count=1)
+        self.assertEqual(found, [(self.doctors[2].id, MONDAY + timedelta(days=2), time(8), time(9))])
+        # Only the third doctor is loaded, over windows of one, one and two days
+        self.assertEqual(scanned, 4)
+
+    def test_own_holds_stay_visible(self):
+        self.doctors = [create_doctor(start=time(8), end=time(9))]
+        hold_slot(self.doctors[0].id, MONDAY, time(8), time(9), self.patient.user_id)
+        self.assertEqual(self.earliest(count=1, holder_id=self.patient.user_id)[0][0][1], MONDAY)
+        self.assertEqual(self.earliest(count=1)[0][0][1], MONDAY + timedelta(days=1))
+
+        request = APIRequestFactory().get('/', {'specialty': self.doctors[0].specialty_id, 'count': 1,
+                                                'duration': 60})
+        force_authenticate(request, user=create_user())
+        with mock.patch('django.utils.timezone.now', return_value=self.after):
+            response = EarliestAvailableSlotsView.as_view()(request)
+        self.assertEqual(response.data['results'][0]['date'], (MONDAY + timedelta(days=1)).isoformat())
+
+
+class AvailableSlotsViewTests(TestCase):
+    def setUp(self):
+        create_statuses()
+        reset_process_caches()
+        self.doctor = create_doctor()
+        self.user = create_user()
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        return AvailableSlotsView.as_view()(request)
+
+    def test_identifiers_must_be_integers(self):
+        self.assertEqual(self.get(doctor='abc', start_date=MONDAY.isoformat()).status_code, 400)
+        self.assertEqual(self.get(specialty='1 OR 1=1', start_date=MONDAY.isoformat()).status_code, 400)
+        self.assertEqual(self.get(limit='0', start_date=MONDAY.isoformat()).status_code, 400)
+
+    def test_output_is_capped(self):
+        response = self.get(doctor=self.doctor.id, start_date=MONDAY.isoformat(), duration=15, limit=5)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response['X-Slots-Truncated'], 'true')
+
+        response = self.get(doctor=self.doctor.id, start_date=MONDAY.isoformat(), duration=60, limit=8)
+        self.assertEqual(len(response.data), 8)
+        self.assertFalse(response.has_header('X-Slots-Truncated'))
+
+    def test_start_date_defaults_to_the_local_date(self):
+        # Still Sunday in UTC, already Monday in Auckland
+        now = datetime(2030, 1, 6, 20, 0, tzinfo=dt_timezone.utc)
+        with self.settings(TIME_ZONE='Pacific/Auckland'), mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.get(doctor=self.doctor.id)
+        self.assertEqual(response.data[0]['date'], MONDAY.isoformat())
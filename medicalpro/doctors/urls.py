@@ -13,6 +13,7 @@ urlpatterns = [
     path('availability/', views.DoctorAvailabilityListView.as_view(), name='doctor_availability_list'),
     path('availability/<int:pk>/', views.DoctorAvailabilityDetailView.as_view(), name='doctor_availability_detail'),
     path('availability/create/', views.DoctorAvailabilityCreateView.as_view(), name='doctor_availability_create'),
+    path('availability/check/', views.AvailabilityCheckView.as_view(), name='doctor_availability_check'),
     
     # Doctor unavailability (time off, vacations, etc.)
     path('unavailability/', views.DoctorUnavailabilityListView.as_view(), name='doctor_unavailability_list'),
@@ -35,4 +36,5 @@ urlpatterns = [
     
     # Available time slots
     path('available-slots/', views.AvailableSlotsView.as_view(), name='available_slots'),
-] 
\ No newline at end of file
+    path('available-slots/earliest/', views.EarliestAvailableSlotsView.as_view(), name='earliest_available_slots'),
+] 
\ No newline at end of file
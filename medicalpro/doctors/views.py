@@ -0,0 +1,168 @@
+from datetime import date, time, timedelta
+
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from medicalpro.doctors.availability import check_availability
+from medicalpro.doctors.models import Doctor
+from medicalpro.doctors.slots import find_available_slots, find_earliest_slots, format_slot_time
+
+# Longest range the slot engine will compute in one request
+MAX_SLOT_RANGE_DAYS = 92
+
+# Most slots returned by one available-slots request
+MAX_AVAILABLE_SLOTS = 1000
+
+# Most slots returned by one earliest-slot search
+MAX_EARLIEST_SLOTS = 50
+
+# Most candidate slots checked in one availability request
+MAX_AVAILABILITY_CANDIDATES = 5000
+
+
+def parse_date_param(value, default=None):
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class AvailableSlotsView(APIView):
+    """
+    Free appointment slots for one doctor, a specialty or every available doctor.
+
+    Query parameters: ``doctor``, ``specialty``, ``start_date`` (defaults to
+    today in the current time zone), ``end_date`` (inclusive, defaults to
+    ``start_date``), ``duration`` and ``step`` in minutes, and ``limit``.
+
+    At most ``limit`` slots (default and maximum ``MAX_AVAILABLE_SLOTS``) are
+    returned, ordered by doctor-day; the ``X-Slots-Truncated`` header is set
+    when more exist, so clients narrow the range or the doctors to see them.
+    """
+
+    def get(self, request):
+        start_date = parse_date_param(request.query_params.get('start_date'), timezone.localdate())
+        end_date = parse_date_param(request.query_params.get('end_date'), start_date)
+        if start_date is None or end_date is None:
+            return Response({'error': 'Dates must use the YYYY-MM-DD format.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end_date < start_date or end_date - start_date > timedelta(days=MAX_SLOT_RANGE_DAYS):
+            return Response({'error': f'The date range must span 0 to {MAX_SLOT_RANGE_DAYS} days.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            doctor_id = int(request.query_params['doctor']) if request.query_params.get('doctor') else None
+            specialty_id = int(request.query_params['specialty']) if request.query_params.get('specialty') else None
+            duration = int(request.query_params.get('duration', 30))
+            step = int(request.query_params.get('step', duration))
+            limit = int(request.query_params.get('limit', MAX_AVAILABLE_SLOTS))
+        except ValueError:
+            return Response({'error': 'doctor, specialty, duration, step and limit must be integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if duration <= 0 or step <= 0 or not 0 < limit <= MAX_AVAILABLE_SLOTS:
+            return Response({'error': f'duration and step must be positive; limit must be between 1 and '
+                                      f'{MAX_AVAILABLE_SLOTS}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        doctors = Doctor.objects.filter(is_available=True)
+        if doctor_id is not None:
+            doctors = doctors.filter(id=doctor_id)
+        if specialty_id is not None:
+            doctors = doctors.filter(specialty_id=specialty_id)
+
+        slots = find_available_slots(doctors.values_list('id', flat=True), start_date, end_date,
+                                     duration=duration, step=step, holder_id=request.user.id, limit=limit + 1)
+        response = Response([
+            {
+                'doctor_id': doctor_id,
+                'date': slot_date.isoformat(),
+                'start_time': format_slot_time(start_time),
+                'end_time': format_slot_time(end_time),
+            }
+            for doctor_id, slot_date, start_time, end_time in slots[:limit]
+        ])
+        if len(slots) > limit:
+            response['X-Slots-Truncated'] = 'true'
+        return response
+
+
+class EarliestAvailableSlotsView(APIView):
+    """
+    First free slots with any available doctor of a specialty.
+
+    Query parameters: ``specialty`` (required), ``count``, ``duration`` and ``step`` in minutes.
+    """
+
+    def get(self, request):
+        specialty_id = request.query_params.get('specialty')
+        if not specialty_id:
+            return Response({'error': 'specialty is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            specialty_id = int(specialty_id)
+            count = int(request.query_params.get('count', 5))
+            duration = int(request.query_params.get('duration', 30))
+            step = int(request.query_params.get('step', duration))
+        except ValueError:
+            return Response({'error': 'specialty, count, duration and step must be integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < count <= MAX_EARLIEST_SLOTS or duration <= 0 or step <= 0:
+            return Response({'error': f'count must be between 1 and {MAX_EARLIEST_SLOTS}; '
+                                      'duration and step must be positive.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        slots, doctor_days_scanned = find_earliest_slots(specialty_id, count=count, duration=duration,
+                                                         step=step, holder_id=request.user.id)
+        return Response({
+            'doctor_days_scanned': doctor_days_scanned,
+            'results': [
+                {
+                    'doctor_id': doctor_id,
+                    'date': slot_date.isoformat(),
+                    'start_time': format_slot_time(start_time),
+                    'end_time': format_slot_time(end_time),
+                }
+                for doctor_id, slot_date, start_time, end_time in slots
+            ],
+        })
+
+
+class AvailabilityCheckView(APIView):
+    """
+    Check many candidate slots at once, with the semantics of ``IsDoctorAvailable``.
+
+    Body: ``{"candidates": [{"doctor_id", "date", "start_time", "end_time"}, ...]}``
+    with dates as ``YYYY-MM-DD`` and times as ``HH:MM``.
+    """
+
+    def post(self, request):
+        rows = request.data.get('candidates')
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'candidates must be a non-empty list.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_AVAILABILITY_CANDIDATES:
+            return Response({'error': f'At most {MAX_AVAILABILITY_CANDIDATES} candidates per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            candidates = [
+                (int(row['doctor_id']), date.fromisoformat(row['date']),
+                 time.fromisoformat(row['start_time']), time.fromisoformat(row['end_time']))
+                for row in rows
+            ]
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Each candidate needs doctor_id, date (YYYY-MM-DD), '
+                                      'start_time and end_time (HH:MM).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': [
+                dict(row, available=available)
+                for row, available in zip(rows, check_availability(candidates))
+            ],
+        })
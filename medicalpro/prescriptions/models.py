@@ -35,6 +35,9 @@ class Prescription(models.Model):
     class Meta:
         db_table = 'prescriptions'
         ordering = ['-prescription_date']
+        indexes = [
+            models.Index(fields=['-prescription_date', '-id'], name='prescription_keyset_idx'),
+        ]
 
 
 class PrescriptionMedication(models.Model):
@@ -127,4 +130,4 @@ class MedicationInteraction(models.Model):
     
     class Meta:
         db_table = 'medication_interactions'
-        unique_together = [['medication1', 'medication2']] 
\ No newline at end of file
+        unique_together = [['medication1', 'medication2']] 
\ No newline at end of file
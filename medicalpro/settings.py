@@ -147,21 +147,62 @@ REST_FRAMEWORK = {
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache
+# Conflict index and lookup table versions, slot holds, calendar tiles and unread
+# counters are shared between worker processes through the default cache, so it
+# must not be process-local (see medicalpro.core.checks). Set REDIS_URL to use
+# Redis; otherwise the database cache table is used, created with
+# ``manage.py createcachetable``.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_table',
+        },
+    }
+
 # Channels configuration
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Set CHANNEL_LAYER_DB to a SQLite file on local disk to share the layer between
+# several ASGI worker processes on one host; the in-memory layer is per process.
+# The websocket, SSE (notifications/stream/) and long-poll (notifications/poll/)
+# endpoints are only live with a shared layer: with the in-memory one they miss
+# notifications created by other processes (system check core.W002).
+if os.getenv('CHANNEL_LAYER_DB'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'medicalpro.core.layers.SQLiteChannelLayer',
+            'CONFIG': {
+                'path': os.getenv('CHANNEL_LAYER_DB'),
+                'capacity': int(os.getenv('CHANNEL_LAYER_CAPACITY', '100')),
+                'expiry': int(os.getenv('CHANNEL_LAYER_EXPIRY', '60')),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@medicalpro.com')
+# Queue notification emails for the send_outbox_emails workers instead of sending them in the request
+EMAIL_OUTBOX_ENABLED = os.getenv('EMAIL_OUTBOX_ENABLED', 'True') == 'True'
 
 # Logging configuration
 LOGGING = {
@@ -202,4 +243,4 @@ LOGGING = {
             'propagate': True,
         },
     },
-} 
\ No newline at end of file
+} 
\ No newline at end of file